@@ -11,6 +11,7 @@ from .sub_agents.publisher_agent.agent import publisher_agent
 from .sub_agents.thinker_agent.agent import thinker_agent
 from .sub_agents.writer_agent.agent import writer_agent
 from . import tools
+from . import chapter_workers, workflow
 
 # Create the root customer service agent
 ai_book_adk = Agent(
@@ -28,14 +29,27 @@ ai_book_adk = Agent(
     - Creating illustrations with the illustrator agent
     - Compiling and publishing final books with the publisher agent
     
-    You can handle the complete book creation workflow:
+    When the user wants a complete book without reviewing it chapter by chapter, call
+    run_book_workflow() once. It plans the book, writes every chapter, renders the illustrations,
+    syncs the metadata and compiles the book on its own, so do not call the individual steps
+    yourself. Pass book_title instead of a topic to finish a book that was interrupted, then report
+    the step results to the user.
+    
+    To have the chapters of a planned book written by the distributed chapter workers (machines running
+    "python -m Ai-book-adk.chapter_workers work"), use enqueue_book_chapters().
+    
+    For the interactive, step-by-step workflow:
     1. Use book_pipeline() to plan a book structure
     2. Use write_next_chapter() to write chapters sequentially
     3. Coordinate sub-agents for specialized tasks
     
     Always guide users through the book creation process step by step.
-    After every chapter of a book generated, before proceeding to the next chapter, call the Thinker agent
-    to ensure that book meta data was uploaded to mongoDb database.
+    Book metadata is synced to the MongoDB database automatically in the background after every
+    chapter, so you do not need to call the Thinker agent for it between chapters.
+    Chapter illustrations are rendered in the background after each chapter is saved. If some are
+    still missing (for example after a failed render), use backfill_illustrations() before compiling.
+    When speculative prefetch is enabled, the next chapter is drafted in the background while the user
+    reviews the current one, so write_next_chapter() may return almost immediately.
     
     If users have questions about Editor House, services, or need general guidance, 
     delegate to the House Manager agent who can provide comprehensive information.
@@ -44,6 +58,10 @@ ai_book_adk = Agent(
     tools=[
         tools.book_pipeline,
         tools.write_next_chapter,
+        tools.backfill_illustrations,
+        tools.get_scheduler_status,
+        workflow.run_book_workflow,
+        chapter_workers.enqueue_book_chapters,
         AgentTool(agent = editor_agent),
         AgentTool(agent = house_manager_agent),
         AgentTool(agent = illustrator_agent),
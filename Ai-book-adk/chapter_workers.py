@@ -0,0 +1,459 @@
+"""Distributed chapter workers coordinated through MongoDB.
+
+Chapter tasks are documents in ``BooksMeta.ChapterTasks``. Any number of
+machines running this package against the same MongoDB and the same shared
+``books`` folder can drain the backlog together:
+
+- a worker claims a task atomically with ``find_one_and_update``, which sets a
+  lease owned by that worker;
+- while the chapter is written the worker renews the lease with a heartbeat;
+- a task whose lease expired (the worker crashed or lost its connection) is
+  claimed again by the next worker that asks;
+- chapter N+1 of a book becomes claimable only once chapter N is done, so the
+  story memory and chapter order stay consistent;
+- a chapter that failed all its attempts holds back the rest of its book until
+  ``retry-failed`` requeues it.
+
+Illustrations of a finished chapter may still be rendering on one machine
+while the next chapter is written on another. Both update the book's metadata
+under an exclusive file lock, so the shared ``books`` folder must be on a
+filesystem that supports POSIX locks (a local disk, NFSv4 or SMB).
+
+Usage:
+    python -m Ai-book-adk.chapter_workers enqueue "Book Title" --priority 5
+    python -m Ai-book-adk.chapter_workers work --threads 4
+    python -m Ai-book-adk.chapter_workers status
+    python -m Ai-book-adk.chapter_workers retry-failed --book "Book Title"
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from .sub_agents.illustrator_agent.render_queue import get_render_queue
+from .sub_agents.thinker_agent.scheduler import scheduling_lane
+from .sub_agents.thinker_agent.tools import DB_NAME, BookMetadata, _get_mongodb_client, create_safe_title
+from .sub_agents.writer_agent.story_memory import StoryMemory
+from .tools import _write_next_chapter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+CHAPTER_TASKS_COLLECTION = os.getenv('CHAPTER_TASKS_COLLECTION', 'ChapterTasks')
+# Seconds a claimed chapter stays leased to its worker without a heartbeat
+CHAPTER_LEASE_SECONDS = float(os.getenv('CHAPTER_LEASE_SECONDS', '300'))
+CHAPTER_HEARTBEAT_SECONDS = float(os.getenv('CHAPTER_HEARTBEAT_SECONDS', '60'))
+CHAPTER_MAX_ATTEMPTS = int(os.getenv('CHAPTER_MAX_ATTEMPTS', '3'))
+CHAPTER_RETRY_BASE = float(os.getenv('CHAPTER_RETRY_BASE', '30'))
+CHAPTER_POLL_INTERVAL = float(os.getenv('CHAPTER_POLL_INTERVAL', '5'))
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def task_id(book_title: str, chapter_index: int) -> str:
+    """Document id of a chapter task"""
+    return f"{create_safe_title(book_title)}:{chapter_index:03d}"
+
+
+class ChapterTaskBoard:
+    """Chapter tasks stored in MongoDB and claimed under heartbeat leases"""
+
+    def __init__(self, collection, lease_seconds: float = CHAPTER_LEASE_SECONDS,
+                 retry_base: float = CHAPTER_RETRY_BASE):
+        """
+        Args:
+            collection: MongoDB collection holding the tasks
+            lease_seconds: Seconds a claim stays valid without a heartbeat
+            retry_base: Base delay in seconds for exponential retry backoff
+        """
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.retry_base = retry_base
+        self.collection.create_index([("ready", ASCENDING), ("status", ASCENDING), ("priority", DESCENDING)])
+        self.collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        self.collection.create_index([("safe_title", ASCENDING), ("chapter_index", ASCENDING)])
+
+    def enqueue_book(self, book_title: str, chapter_indices: List[int], priority: int = 0,
+                     max_attempts: int = CHAPTER_MAX_ATTEMPTS) -> int:
+        """
+        Create the tasks for the given chapters of a book.
+
+        Only the first chapter is claimable straight away; each following one
+        becomes claimable when the chapter before it is done. Existing tasks
+        are left untouched, so enqueuing a book twice is harmless; failed
+        tasks are requeued with retry_failed.
+
+        Args:
+            book_title: The title of the book
+            chapter_indices: Indices of the chapters to write, in order
+            priority: Higher priorities are claimed first (default: 0)
+            max_attempts: Attempts before a chapter is marked failed
+
+        Returns:
+            Number of tasks created
+        """
+        now = _now()
+        created = 0
+        for position, chapter_index in enumerate(sorted(chapter_indices)):
+            result = self.collection.update_one(
+                {"_id": task_id(book_title, chapter_index)},
+                {"$setOnInsert": {
+                    "book_title": book_title,
+                    "safe_title": create_safe_title(book_title),
+                    "chapter_index": chapter_index,
+                    "ready": position == 0,
+                    "status": "queued",
+                    "priority": priority,
+                    "attempts": 0,
+                    "max_attempts": max_attempts,
+                    "available_at": now,
+                    "lease_owner": None,
+                    "lease_token": None,
+                    "lease_expires_at": None,
+                    "heartbeat_at": None,
+                    "last_error": None,
+                    "created_at": now,
+                    "finished_at": None,
+                }},
+                upsert=True
+            )
+            created += 1 if result.upserted_id is not None else 0
+        return created
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically lease the highest-priority ready chapter, including chapters whose lease expired.
+
+        Args:
+            worker: Name of the claiming worker
+
+        Returns:
+            The claimed task document, or None if nothing is ready
+        """
+        now = _now()
+        return self.collection.find_one_and_update(
+            {
+                "ready": True,
+                "$or": [
+                    {"status": "queued", "available_at": {"$lte": now}},
+                    {"status": "leased", "lease_expires_at": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "leased",
+                    "lease_owner": worker,
+                    "lease_token": uuid.uuid4().hex,
+                    "lease_expires_at": now + datetime.timedelta(seconds=self.lease_seconds),
+                    "heartbeat_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", DESCENDING), ("created_at", ASCENDING), ("chapter_index", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def heartbeat(self, task: Dict[str, Any]) -> bool:
+        """
+        Renew the lease of a claimed chapter.
+
+        Returns:
+            False if the lease was lost to another worker
+        """
+        now = _now()
+        result = self.collection.update_one(
+            {"_id": task["_id"], "lease_token": task["lease_token"], "status": "leased"},
+            {"$set": {
+                "heartbeat_at": now,
+                "lease_expires_at": now + datetime.timedelta(seconds=self.lease_seconds),
+            }}
+        )
+        return result.modified_count == 1
+
+    def complete(self, task: Dict[str, Any]) -> bool:
+        """
+        Mark a chapter done and make the book's next chapter claimable.
+
+        Returns:
+            False if the lease was lost to another worker
+        """
+        result = self.collection.update_one(
+            {"_id": task["_id"], "lease_token": task["lease_token"]},
+            {"$set": {"status": "done", "finished_at": _now(), "lease_token": None, "last_error": None}}
+        )
+        if result.modified_count != 1:
+            logger.warning(f"Lease on chapter task '{task['_id']}' was lost; not marking it done")
+            return False
+
+        next_task = self.collection.find_one(
+            {"safe_title": task["safe_title"], "chapter_index": {"$gt": task["chapter_index"]}},
+            sort=[("chapter_index", ASCENDING)]
+        )
+        if next_task is not None:
+            self.collection.update_one({"_id": next_task["_id"]}, {"$set": {"ready": True}})
+        return True
+
+    def fail(self, task: Dict[str, Any], error: str) -> None:
+        """Record a failed attempt; the chapter is retried with backoff until it runs out of attempts"""
+        if task["attempts"] >= task["max_attempts"]:
+            update = {"status": "failed", "finished_at": _now(), "lease_token": None, "last_error": error}
+            logger.error(f"Chapter task '{task['_id']}' failed after {task['attempts']} attempts: {error}")
+        else:
+            delay = self.retry_base * (2 ** (task["attempts"] - 1))
+            update = {
+                "status": "queued",
+                "available_at": _now() + datetime.timedelta(seconds=delay),
+                "lease_token": None,
+                "last_error": error,
+            }
+            logger.warning(f"Chapter task '{task['_id']}' attempt {task['attempts']} failed, retrying in {delay:.0f}s: {error}")
+        self.collection.update_one({"_id": task["_id"], "lease_token": task["lease_token"]}, {"$set": update})
+
+    def retry_failed(self, book_title: Optional[str] = None) -> int:
+        """
+        Requeue failed chapters with a fresh set of attempts, so their books can continue.
+
+        Args:
+            book_title: Only requeue the chapters of this book (default: all books)
+
+        Returns:
+            Number of chapters requeued
+        """
+        query: Dict[str, Any] = {"status": "failed"}
+        if book_title:
+            query["safe_title"] = create_safe_title(book_title)
+        result = self.collection.update_many(query, {"$set": {
+            "status": "queued",
+            "attempts": 0,
+            "available_at": _now(),
+            "lease_owner": None,
+            "lease_token": None,
+            "lease_expires_at": None,
+            "finished_at": None,
+        }})
+        return result.modified_count
+
+    def status(self) -> Dict[str, Any]:
+        """Task counts by status, the number of claimable chapters and the active workers"""
+        now = _now()
+        counts = {
+            row["_id"]: row["count"]
+            for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+        }
+        claimable = self.collection.count_documents({"ready": True, "status": "queued", "available_at": {"$lte": now}})
+        workers = self.collection.distinct("lease_owner", {"status": "leased", "lease_expires_at": {"$gte": now}})
+        expired = self.collection.count_documents({"status": "leased", "lease_expires_at": {"$lt": now}})
+        return {
+            "tasks": {status: counts.get(status, 0) for status in ("queued", "leased", "done", "failed")},
+            "claimable": claimable,
+            "expired_leases": expired,
+            "active_workers": sorted(workers),
+        }
+
+
+def get_task_board() -> Optional[ChapterTaskBoard]:
+    """Get the chapter task board on the shared MongoDB, or None if MongoDB is unreachable"""
+    mongo_client = _get_mongodb_client()
+    if mongo_client is None:
+        return None
+    return ChapterTaskBoard(mongo_client[DB_NAME][CHAPTER_TASKS_COLLECTION])
+
+
+def run_chapter_task(board: ChapterTaskBoard, task: Dict[str, Any], worker: str,
+                     heartbeat_seconds: float = CHAPTER_HEARTBEAT_SECONDS) -> bool:
+    """
+    Write the chapter of a claimed task while keeping its lease alive.
+
+    Once the lease is lost (another worker may already have reclaimed the
+    task) the chapter is dropped before anything is saved, so two workers
+    never save the same chapter or fold it into the story memory twice.
+
+    Args:
+        board: The task board
+        task: The claimed task
+        worker: Name of this worker
+        heartbeat_seconds: Seconds between lease renewals
+
+    Returns:
+        True if the chapter was written (or already had been)
+    """
+    book_title = task["book_title"]
+    chapter_index = task["chapter_index"]
+    finished = threading.Event()
+    lease_lost = threading.Event()
+
+    def renew() -> bool:
+        try:
+            if not board.heartbeat(task):
+                logger.warning(f"[{worker}] Lost the lease on chapter task '{task['_id']}'")
+                lease_lost.set()
+        except PyMongoError as e:
+            logger.warning(f"[{worker}] Heartbeat for '{task['_id']}' failed: {e}")
+        return not lease_lost.is_set()
+
+    def beat() -> None:
+        while not finished.wait(heartbeat_seconds) and renew():
+            pass
+
+    def may_save() -> bool:
+        # Renewing right before the save leaves the whole lease for it
+        return not lease_lost.is_set() and renew()
+
+    heart = threading.Thread(target=beat, name=f"heartbeat-{task['_id']}", daemon=True)
+    heart.start()
+    try:
+        next_index = BookMetadata("books", book_title).get_next_chapter_index()
+        if next_index is not None and next_index < chapter_index:
+            raise RuntimeError(f"chapter index {next_index} has not been written yet")
+        # A crashed worker may have saved the chapter before losing its lease
+        if next_index == chapter_index:
+            with scheduling_lane("bulk"):
+                chapter_file = _write_next_chapter(book_title, may_save)
+            if lease_lost.is_set():
+                finished.set()
+                logger.warning(f"[{worker}] Dropped chapter index {chapter_index} of '{book_title}' after losing its lease")
+                return False
+            if not chapter_file:
+                raise RuntimeError("write_next_chapter did not produce a chapter")
+            # The next chapter may run on another node, so the story memory must be saved first
+            StoryMemory(book_title).wait_for_update()
+    except Exception as e:
+        finished.set()
+        board.fail(task, str(e))
+        return False
+    finished.set()
+
+    if board.complete(task):
+        logger.info(f"[{worker}] Chapter index {chapter_index} of '{book_title}' done")
+    return True
+
+
+def chapter_worker_loop(board: ChapterTaskBoard, worker: str, stop: threading.Event,
+                        poll_interval: float = CHAPTER_POLL_INTERVAL) -> None:
+    """
+    Claim and write chapters until stopped.
+
+    Args:
+        board: The task board
+        worker: Name of this worker
+        stop: Event that ends the loop when set
+        poll_interval: Seconds to wait when no chapter is claimable
+    """
+    logger.info(f"[{worker}] Chapter worker started")
+    while not stop.is_set():
+        try:
+            task = board.claim(worker)
+        except PyMongoError as e:
+            logger.error(f"[{worker}] Could not claim a chapter: {e}")
+            task = None
+
+        if task is None:
+            stop.wait(poll_interval)
+            continue
+
+        if task["attempts"] > task["max_attempts"]:
+            # Reclaimed after its worker died on the last allowed attempt
+            board.fail(task, "lease expired on the last attempt")
+            continue
+
+        logger.info(f"[{worker}] Claimed '{task['_id']}' (attempt {task['attempts']})")
+        run_chapter_task(board, task, worker)
+    logger.info(f"[{worker}] Chapter worker stopped")
+
+
+def enqueue_book_chapters(book_title: str, priority: int = 0) -> str:
+    """
+    Hand the unwritten chapters of a planned book to the distributed chapter workers.
+
+    Args:
+        book_title: The title of the book
+        priority: Higher priorities are written first (default: 0)
+
+    Returns:
+        JSON string with the number of chapter tasks created
+    """
+    metadata = BookMetadata("books", book_title).load()
+    if not metadata:
+        logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
+        return json.dumps({"error": f"Book '{book_title}' not found"})
+
+    board = get_task_board()
+    if board is None:
+        return json.dumps({"error": "Cannot connect to MongoDB"})
+
+    chapter_indices = [index for index, chapter in enumerate(metadata["chapters"]) if chapter["status"] == "planned"]
+    created = board.enqueue_book(book_title, chapter_indices, priority)
+    logger.info(f"Queued {created} chapters of '{book_title}' for the chapter workers")
+    return json.dumps({"book_title": book_title, "chapters_queued": created}, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m Ai-book-adk.chapter_workers", description="Distributed chapter workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue the unwritten chapters of a planned book")
+    enqueue.add_argument("book_title")
+    enqueue.add_argument("--priority", type=int, default=0)
+
+    work = commands.add_parser("work", help="Write chapters from the shared queue")
+    work.add_argument("--threads", type=int, default=1, help="Chapters written at the same time on this machine")
+
+    commands.add_parser("status", help="Show the chapter task counts and active workers")
+
+    retry = commands.add_parser("retry-failed", help="Requeue chapters that failed all their attempts")
+    retry.add_argument("--book", default=None, help="Only requeue the chapters of this book")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(levelname)s %(message)s")
+
+    if args.command == "enqueue":
+        print(enqueue_book_chapters(args.book_title, args.priority))
+        return
+
+    board = get_task_board()
+    if board is None:
+        sys.exit("Cannot connect to MongoDB")
+
+    if args.command == "status":
+        print(json.dumps(board.status(), indent=2))
+        return
+
+    if args.command == "retry-failed":
+        print(json.dumps({"requeued": board.retry_failed(args.book)}))
+        return
+
+    stop = threading.Event()
+    host = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(target=chapter_worker_loop, args=(board, f"{host}:{index}", stop), name=f"chapter-worker-{index}")
+        for index in range(max(1, args.threads))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Stopping chapter workers after their current chapters...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+    # Illustrations queued by this machine finish before it exits
+    get_render_queue().wait()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,575 @@
+"""Durable job queue and worker pool for producing many books at once.
+
+Book requests are stored in a local SQLite queue and processed by a pool of
+worker processes, so many books advance without anyone driving an agent and
+nothing is lost across restarts. A book is a chain of jobs:
+
+    plan -> chapter (one job per chapter, in order) -> illustrations -> compile
+
+Each job finishes by enqueuing the next one in the same transaction. A job can
+checkpoint progress into its stored payload, so a retry resumes instead of
+repeating work (a retried plan job continues the book it already planned). Jobs are
+claimed by priority with a lease (visibility timeout) that the worker renews
+while it runs; a job whose worker died becomes visible again when its lease
+expires. Failed jobs are retried with exponential backoff up to a per-job
+attempt limit.
+
+Jobs of the same priority are claimed fairly across tenants: the tenant with
+the fewest running jobs goes first and no tenant runs more than
+JOB_TENANT_CONCURRENCY jobs at once, so one customer's 300-chapter book does
+not hold up everyone else's. Inside each worker the model calls are further
+shared through the fair scheduler in the bulk lane.
+
+Usage:
+    python -m Ai-book-adk.job_queue submit "a topic" --chapters 5 --priority 10 --tenant acme
+    python -m Ai-book-adk.job_queue work --workers 8
+    python -m Ai-book-adk.job_queue stats
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .sub_agents.thinker_agent.scheduler import scheduling_lane
+from .sub_agents.thinker_agent.tools import BookMetadata
+from .sub_agents.publisher_agent.tools import compile_book
+from .sub_agents.writer_agent.story_memory import StoryMemory
+from .tools import backfill_illustrations, book_pipeline, write_next_chapter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', os.path.join('books', '.job_queue.sqlite3'))
+# Seconds a claimed job stays invisible to other workers unless its lease is renewed
+JOB_VISIBILITY_TIMEOUT = float(os.getenv('JOB_VISIBILITY_TIMEOUT', '600'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BASE = float(os.getenv('JOB_RETRY_BASE', '5'))
+JOB_RETRY_MAX = float(os.getenv('JOB_RETRY_MAX', '300'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+# Jobs of one tenant running at the same time across all workers
+JOB_TENANT_CONCURRENCY = int(os.getenv('JOB_TENANT_CONCURRENCY', '4'))
+
+JOB_KINDS = ("plan", "chapter", "illustrations", "compile")
+
+# A follow-up job enqueued when a job completes: (kind, payload)
+FollowUp = Tuple[str, Dict[str, Any]]
+# Merges progress into the running job's stored payload so a retry can resume from it
+Checkpoint = Callable[[Dict[str, Any]], bool]
+
+
+class JobQueue:
+    """SQLite-backed queue of book jobs with priorities, leases and retries"""
+
+    def __init__(self, db_path=JOB_QUEUE_PATH, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+                 retry_base: float = JOB_RETRY_BASE, retry_max: float = JOB_RETRY_MAX,
+                 tenant_concurrency: int = JOB_TENANT_CONCURRENCY):
+        """
+        Args:
+            db_path: Path of the SQLite queue file
+            visibility_timeout: Seconds a claimed job is leased to its worker
+            retry_base: Base delay in seconds for exponential retry backoff
+            retry_max: Maximum retry delay in seconds
+            tenant_concurrency: Jobs of one tenant running at the same time
+        """
+        self.db_path = Path(db_path)
+        self.visibility_timeout = visibility_timeout
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.tenant_concurrency = max(1, tenant_concurrency)
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    tenant TEXT NOT NULL DEFAULT '',
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_token TEXT,
+                    lease_expires_at REAL,
+                    worker TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+            # Queues created before tenants were tracked
+            if "tenant" not in [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_tenant ON jobs (tenant, status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _insert(self, conn: sqlite3.Connection, kind: str, payload: Dict[str, Any], priority: int,
+                max_attempts: int, tenant: str) -> int:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        now = time.time()
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, tenant, payload, priority, max_attempts, available_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, tenant, json.dumps(payload), priority, max_attempts, now, now)
+        )
+        return cursor.lastrowid
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = 0,
+                max_attempts: int = JOB_MAX_ATTEMPTS, tenant: str = "") -> int:
+        """
+        Add a job to the queue.
+
+        Args:
+            kind: Job kind (plan, chapter, illustrations or compile)
+            payload: Job arguments
+            priority: Higher priorities are claimed first (default: 0)
+            max_attempts: Attempts before the job is marked failed
+            tenant: Customer the job belongs to, for fair sharing (default: none)
+
+        Returns:
+            The job id
+        """
+        with self._connect() as conn:
+            return self._insert(conn, kind, payload, priority, max_attempts, tenant)
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the highest-priority job that is ready, including jobs whose lease expired.
+
+        Within a priority the tenant with the fewest running jobs goes first, and
+        tenants already running tenant_concurrency jobs are passed over.
+
+        Args:
+            worker: Name of the claiming worker
+
+        Returns:
+            The job as a dictionary (with its lease token), or None if nothing is ready
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            while True:
+                row = conn.execute(
+                    "SELECT *, (SELECT COUNT(*) FROM jobs AS active WHERE active.tenant = jobs.tenant "
+                    "AND active.status = 'running' AND active.lease_expires_at >= ?) AS tenant_running "
+                    "FROM jobs WHERE ((status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_expires_at < ?)) AND tenant_running < ? "
+                    "ORDER BY priority DESC, tenant_running, id LIMIT 1",
+                    (now, now, now, self.tenant_concurrency)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["status"] == "queued":
+                    break
+
+                # The worker holding this job died or stalled
+                if row["attempts"] < row["max_attempts"]:
+                    logger.warning(f"Job {row['id']} ({row['kind']}) lease of '{row['worker']}' expired; reclaiming")
+                    break
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, lease_token = NULL, last_error = ? WHERE id = ?",
+                    (now, f"lease of '{row['worker']}' expired on the last attempt", row["id"])
+                )
+                logger.error(f"Job {row['id']} ({row['kind']}) failed: its lease expired on the last attempt")
+
+            token = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_token = ?, "
+                "lease_expires_at = ?, worker = ? WHERE id = ?",
+                (token, now + self.visibility_timeout, worker, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job.pop("tenant_running")
+        job.update(payload=json.loads(row["payload"]), attempts=row["attempts"] + 1, lease_token=token)
+        return job
+
+    def renew(self, job: Dict[str, Any]) -> bool:
+        """
+        Extend the lease of a running job.
+
+        Returns:
+            False if the job is no longer leased to this worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND lease_token = ? AND status = 'running'",
+                (time.time() + self.visibility_timeout, job["id"], job["lease_token"])
+            )
+            return cursor.rowcount == 1
+
+    def checkpoint(self, job: Dict[str, Any], progress: Dict[str, Any]) -> bool:
+        """
+        Merge progress into a running job's stored payload, so a retry resumes from it.
+
+        Returns:
+            False if the job is no longer leased to this worker
+        """
+        payload = {**job["payload"], **progress}
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET payload = ? WHERE id = ? AND lease_token = ? AND status = 'running'",
+                (json.dumps(payload), job["id"], job["lease_token"])
+            )
+        if cursor.rowcount != 1:
+            return False
+        job["payload"] = payload
+        return True
+
+    def complete(self, job: Dict[str, Any], follow_ups: Optional[List[FollowUp]] = None) -> bool:
+        """
+        Mark a job done and enqueue its follow-up jobs atomically.
+
+        Follow-ups inherit the job's priority, attempt limit and tenant.
+
+        Returns:
+            False if the lease was lost (another worker owns the job now)
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, lease_token = NULL, last_error = NULL "
+                "WHERE id = ? AND lease_token = ?",
+                (time.time(), job["id"], job["lease_token"])
+            )
+            if cursor.rowcount != 1:
+                conn.execute("ROLLBACK")
+                logger.warning(f"Job {job['id']} lease was lost; its result is discarded")
+                return False
+            for kind, payload in follow_ups or []:
+                self._insert(conn, kind, payload, job["priority"], job["max_attempts"], job["tenant"])
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        """Record a failed attempt; the job is retried with backoff until it runs out of attempts"""
+        with self._connect() as conn:
+            if job["attempts"] >= job["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, lease_token = NULL, last_error = ? "
+                    "WHERE id = ? AND lease_token = ?",
+                    (time.time(), error, job["id"], job["lease_token"])
+                )
+                logger.error(f"Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+                return
+
+            delay = min(self.retry_max, self.retry_base * (2 ** (job["attempts"] - 1)))
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ?, lease_token = NULL, last_error = ? "
+                "WHERE id = ? AND lease_token = ?",
+                (time.time() + delay, error, job["id"], job["lease_token"])
+            )
+            logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+
+    def retry_failed(self) -> int:
+        """
+        Requeue every failed job with a fresh set of attempts.
+
+        Returns:
+            Number of jobs requeued
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, finished_at = NULL "
+                "WHERE status = 'failed'",
+                (time.time(),)
+            )
+            return cursor.rowcount
+
+    def stats(self, window: float = 3600.0) -> Dict[str, Any]:
+        """
+        Queue depth by status and kind, and recent throughput.
+
+        Args:
+            window: Seconds over which throughput is measured (default: 3600)
+
+        Returns:
+            Dictionary with counts per status, queued/running counts per kind and jobs finished per minute
+        """
+        now = time.time()
+        with self._connect() as conn:
+            by_status = {row["status"]: row["count"] for row in conn.execute(
+                "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"
+            )}
+            by_kind = {row["kind"]: row["count"] for row in conn.execute(
+                "SELECT kind, COUNT(*) AS count FROM jobs WHERE status IN ('queued', 'running') GROUP BY kind"
+            )}
+            finished = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'done' AND finished_at >= ?", (now - window,)
+            ).fetchone()[0]
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            last_error = conn.execute(
+                "SELECT id, kind, last_error FROM jobs WHERE last_error IS NOT NULL ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+
+        return {
+            "jobs": {status: by_status.get(status, 0) for status in ("queued", "running", "done", "failed")},
+            "pending_by_kind": {kind: by_kind.get(kind, 0) for kind in JOB_KINDS},
+            "throughput_per_minute": round(finished / (window / 60), 2),
+            "finished_in_window": finished,
+            "window_seconds": window,
+            "oldest_queued_seconds": round(now - oldest, 1) if oldest else None,
+            "last_error": dict(last_error) if last_error else None,
+        }
+
+
+def submit_book(topic: str, num_chapters: int = 5, priority: int = 0, options: Optional[Dict[str, Any]] = None,
+                db_path=JOB_QUEUE_PATH, tenant: str = "") -> int:
+    """
+    Queue a book request; workers plan, write, illustrate and compile it.
+
+    Args:
+        topic: The main topic or theme for the book
+        num_chapters: Number of chapters to plan (default: 5)
+        priority: Higher priorities are processed first (default: 0)
+        options: Extra options, e.g. {"force_compile": true}
+        db_path: Path of the queue file
+        tenant: Customer the book belongs to, for fair sharing (default: none)
+
+    Returns:
+        The id of the book's plan job
+    """
+    payload = {"topic": topic, "num_chapters": num_chapters, "options": options or {}, "tenant": tenant}
+    job_id = JobQueue(db_path).enqueue("plan", payload, priority, tenant=tenant)
+    logger.info(f"Queued book on '{topic}' as job {job_id}")
+    return job_id
+
+
+def _run_plan(payload: Dict[str, Any], checkpoint: Checkpoint) -> List[FollowUp]:
+    book_title = payload.get("book_title")
+    if book_title and BookMetadata("books", book_title).load():
+        # An earlier attempt planned the book but did not complete the job
+        logger.info(f"Resuming book '{book_title}' planned by an earlier attempt")
+    else:
+        book_title = book_pipeline(payload["topic"], payload["num_chapters"])
+        if not checkpoint({"book_title": book_title}):
+            logger.warning(f"Could not record planned book '{book_title}'; the job's lease was lost")
+    if payload.get("tenant"):
+        # The scheduler shares model time by the tenant recorded on the book
+        BookMetadata("books", book_title).update_book_info(tenant=payload["tenant"])
+    return [("chapter", {"book_title": book_title, "options": payload["options"]})]
+
+
+def _run_chapter(payload: Dict[str, Any], checkpoint: Checkpoint) -> List[FollowUp]:
+    book_title = payload["book_title"]
+    book_metadata = BookMetadata("books", book_title)
+    # A retried job may find its chapter already written; the book just moves on
+    if book_metadata.get_next_chapter_index() is not None and not write_next_chapter(book_title):
+        raise RuntimeError(f"Writing the next chapter of '{book_title}' failed")
+    # The next chapter may run in another process, so the story memory must be saved first
+    StoryMemory(book_title).wait_for_update()
+
+    next_kind = "chapter" if book_metadata.get_next_chapter_index() is not None else "illustrations"
+    return [(next_kind, {"book_title": book_title, "options": payload["options"]})]
+
+
+def _run_illustrations(payload: Dict[str, Any], checkpoint: Checkpoint) -> List[FollowUp]:
+    result = json.loads(backfill_illustrations(payload["book_title"], wait=True))
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    missing = sum(count for status, count in result["illustrations"].items() if status != "done")
+    if missing:
+        # Missing illustrations keep their placeholder; they should not hold the book back
+        logger.warning(f"{missing} illustrations of '{payload['book_title']}' are still missing; compiling anyway")
+    return [("compile", {"book_title": payload["book_title"], "options": payload["options"]})]
+
+
+def _run_compile(payload: Dict[str, Any], checkpoint: Checkpoint) -> List[FollowUp]:
+    if not compile_book(payload["book_title"], force=payload["options"].get("force_compile", False)):
+        raise RuntimeError(f"Compiling '{payload['book_title']}' failed")
+    return []
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any], Checkpoint], List[FollowUp]]] = {
+    "plan": _run_plan,
+    "chapter": _run_chapter,
+    "illustrations": _run_illustrations,
+    "compile": _run_compile,
+}
+
+
+def process_one(queue: JobQueue, worker: str) -> bool:
+    """
+    Claim and run one job, renewing its lease while it runs.
+
+    Args:
+        queue: The job queue
+        worker: Name of this worker
+
+    Returns:
+        True if a job was processed, False if none was ready
+    """
+    job = queue.claim(worker)
+    if job is None:
+        return False
+
+    logger.info(f"[{worker}] Running job {job['id']} ({job['kind']}, attempt {job['attempts']})")
+    finished = threading.Event()
+
+    def heartbeat() -> None:
+        while not finished.wait(queue.visibility_timeout / 3):
+            if not queue.renew(job):
+                logger.warning(f"[{worker}] Lost the lease of job {job['id']}")
+                return
+
+    renewer = threading.Thread(target=heartbeat, name=f"lease-{job['id']}", daemon=True)
+    renewer.start()
+    try:
+        with scheduling_lane("bulk"):
+            follow_ups = JOB_HANDLERS[job["kind"]](job["payload"], partial(queue.checkpoint, job))
+    except Exception as e:
+        finished.set()
+        queue.fail(job, str(e))
+        return True
+    finished.set()
+
+    if queue.complete(job, follow_ups):
+        logger.info(f"[{worker}] Job {job['id']} ({job['kind']}) done")
+    return True
+
+
+def worker_loop(db_path=JOB_QUEUE_PATH, worker: Optional[str] = None, stop: Optional[Any] = None,
+                poll_interval: float = JOB_POLL_INTERVAL) -> None:
+    """
+    Process jobs until stopped.
+
+    Args:
+        db_path: Path of the queue file
+        worker: Name of this worker (default: host and process id)
+        stop: Event that ends the loop when set (default: run until interrupted)
+        poll_interval: Seconds to sleep when no job is ready
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(db_path)
+    logger.info(f"[{worker}] Worker started")
+    while stop is None or not stop.is_set():
+        try:
+            processed = process_one(queue, worker)
+        except Exception as e:
+            logger.error(f"[{worker}] Worker error: {e}")
+            processed = False
+        if not processed:
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+    logger.info(f"[{worker}] Worker stopped")
+
+
+def _worker_process(db_path: str, worker: str, stop) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    try:
+        worker_loop(db_path, worker, stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_worker_pool(num_workers: Optional[int] = None, db_path=JOB_QUEUE_PATH) -> None:
+    """
+    Run a pool of worker processes until interrupted.
+
+    Jobs interrupted by a shutdown are picked up again when their lease expires.
+
+    Args:
+        num_workers: Number of worker processes (default: number of CPU cores)
+        db_path: Path of the queue file
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    JobQueue(db_path)
+
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    processes = [
+        context.Process(
+            target=_worker_process,
+            args=(str(db_path), f"{socket.gethostname()}:worker-{index}", stop),
+            name=f"book-worker-{index}"
+        )
+        for index in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {num_workers} book workers on '{db_path}'")
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping workers after their current jobs...")
+        stop.set()
+        for process in processes:
+            process.join()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m Ai-book-adk.job_queue", description="Book job queue")
+    parser.add_argument("--db", default=JOB_QUEUE_PATH, help="Path of the queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Queue a book")
+    submit.add_argument("topic")
+    submit.add_argument("--chapters", type=int, default=5)
+    submit.add_argument("--priority", type=int, default=0)
+    submit.add_argument("--options", default="{}", help="JSON object of book options")
+    submit.add_argument("--tenant", default="", help="Customer the book belongs to")
+
+    work = commands.add_parser("work", help="Run the worker pool")
+    work.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU cores)")
+
+    stats = commands.add_parser("stats", help="Show queue depth and throughput")
+    stats.add_argument("--window", type=float, default=3600.0, help="Throughput window in seconds")
+
+    commands.add_parser("retry-failed", help="Requeue failed jobs")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    if args.command == "submit":
+        job_id = submit_book(args.topic, args.chapters, args.priority, json.loads(args.options), args.db, args.tenant)
+        print(json.dumps({"job_id": job_id}))
+    elif args.command == "work":
+        run_worker_pool(args.workers, args.db)
+    elif args.command == "stats":
+        print(json.dumps(JobQueue(args.db).stats(args.window), indent=2))
+    elif args.command == "retry-failed":
+        print(json.dumps({"requeued": JobQueue(args.db).retry_failed()}))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,233 @@
+"""Async HTTP service for starting books and following their progress.
+
+Endpoints:
+    POST /books                        plan a new book
+    GET  /books/{book_id}              status of a book and its chapters
+    POST /books/{book_id}/chapters     queue chapters to be written
+    POST /books/{book_id}/compile      compile the written chapters
+    GET  /books/{book_id}/download     compiled book (Markdown or EPUB), with ETag and Range support
+    GET  /books/{book_id}/events       progress events as Server-Sent Events
+
+``book_id`` is the book's safe title (its folder name under ``books``). The
+blocking pipeline steps run in worker threads; progress streams are plain
+asyncio queues fed by the progress bus, so idle connections cost no threads.
+
+Usage:
+    python -m Ai-book-adk.service
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from .sub_agents.publisher_agent.tools import compile_book
+from .sub_agents.thinker_agent.progress import emit, subscribe, unsubscribe
+from .sub_agents.thinker_agent.scheduler import scheduling_lane
+from .sub_agents.thinker_agent.tools import BookMetadata
+from .tools import book_pipeline, write_next_chapter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BOOK_SERVICE_HOST = os.getenv('BOOK_SERVICE_HOST', '127.0.0.1')
+BOOK_SERVICE_PORT = int(os.getenv('BOOK_SERVICE_PORT', '8080'))
+# Seconds between keep-alive comments on idle event streams
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+
+BOOKS_DIR = "books"
+_BOOK_ID = re.compile(r'^book_\w+$')
+_DOWNLOAD_TYPES = {
+    "md": "text/markdown; charset=utf-8",
+    "epub": "application/epub+zip",
+}
+
+app = FastAPI(title="Editor House Book Service")
+
+# Chapters still to write per book, and the task writing them
+_chapters_pending: Dict[str, int] = {}
+_chapter_runs: Dict[str, asyncio.Task] = {}
+
+
+class CreateBookRequest(BaseModel):
+    topic: str = Field(..., min_length=1)
+    num_chapters: int = Field(5, ge=1, le=100)
+    # Customer the book belongs to; model time is shared fairly between tenants
+    tenant: Optional[str] = Field(None, min_length=1, max_length=100)
+
+
+class QueueChaptersRequest(BaseModel):
+    # Number of chapters to write; all remaining chapters if omitted
+    count: Optional[int] = Field(None, ge=1)
+
+
+def _load_book(book_id: str) -> Dict[str, Any]:
+    """Load a book's metadata by id, or raise 404"""
+    metadata_file = Path(BOOKS_DIR) / book_id / "book_metadata.json"
+    if not _BOOK_ID.match(book_id) or not metadata_file.is_file():
+        raise HTTPException(status_code=404, detail=f"Book '{book_id}' not found")
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _book_status(book_id: str) -> Dict[str, Any]:
+    metadata = _load_book(book_id)
+    book_metadata = BookMetadata(BOOKS_DIR, metadata["book_info"]["title"])
+    return {
+        "book_id": book_id,
+        "book": book_metadata.get_book_info(),
+        "chapters": [
+            {
+                "chapter_number": chapter["chapter_number"],
+                "chapter_title": chapter["chapter_title"],
+                "status": chapter["status"],
+                "word_count": chapter.get("word_count", 0),
+                "illustration": (chapter.get("illustration") or {}).get("status"),
+            }
+            for chapter in metadata["chapters"]
+        ],
+        "chapters_queued": _chapters_pending.get(book_id, 0),
+    }
+
+
+def _write_chapter(book_title: str, lane: str) -> Optional[str]:
+    with scheduling_lane(lane):
+        return write_next_chapter(book_title)
+
+
+async def _write_queued_chapters(book_id: str, book_title: str) -> None:
+    """Write a book's queued chapters one after another in a worker thread"""
+    try:
+        while _chapters_pending.get(book_id, 0) > 0:
+            # A single requested chapter is someone waiting on it; longer runs are bulk work
+            lane = "interactive" if _chapters_pending[book_id] == 1 else "bulk"
+            chapter_file = await asyncio.to_thread(_write_chapter, book_title, lane)
+            _chapters_pending[book_id] -= 1
+            if not chapter_file:
+                # Book complete, or the chapter failed; either way stop this run
+                break
+    except Exception as e:
+        logger.error(f"Writing chapters of '{book_title}' failed: {e}")
+        emit(book_title, "chapter_failed", error=str(e))
+    finally:
+        _chapters_pending.pop(book_id, None)
+        _chapter_runs.pop(book_id, None)
+
+
+@app.post("/books", status_code=201)
+async def create_book(request: CreateBookRequest) -> Dict[str, Any]:
+    """Plan a new book; chapters are queued separately"""
+    book_title = await asyncio.to_thread(book_pipeline, request.topic, request.num_chapters)
+    book_metadata = BookMetadata(BOOKS_DIR, book_title)
+    if request.tenant:
+        await asyncio.to_thread(book_metadata.update_book_info, tenant=request.tenant)
+    book_id = book_metadata.safe_title
+    return {"book_id": book_id, "book_title": book_title}
+
+
+@app.get("/books/{book_id}")
+async def get_book(book_id: str) -> Dict[str, Any]:
+    """Status of a book and each of its chapters"""
+    return await asyncio.to_thread(_book_status, book_id)
+
+
+@app.post("/books/{book_id}/chapters", status_code=202)
+async def queue_chapters(book_id: str, request: QueueChaptersRequest) -> Dict[str, Any]:
+    """Queue chapters to be written in order; progress is reported on the event stream"""
+    metadata = await asyncio.to_thread(_load_book, book_id)
+    book_title = metadata["book_info"]["title"]
+    remaining = sum(1 for chapter in metadata["chapters"] if chapter["status"] == "planned")
+    if remaining == 0:
+        raise HTTPException(status_code=409, detail="All chapters have already been written")
+
+    queued = min(remaining, _chapters_pending.get(book_id, 0) + (request.count or remaining))
+    _chapters_pending[book_id] = queued
+    if book_id not in _chapter_runs:
+        _chapter_runs[book_id] = asyncio.create_task(_write_queued_chapters(book_id, book_title))
+    emit(book_title, "chapters_queued", count=queued)
+    return {"book_id": book_id, "chapters_queued": queued}
+
+
+@app.post("/books/{book_id}/compile")
+async def compile_book_endpoint(book_id: str, force: bool = False) -> Dict[str, Any]:
+    """Compile the written chapters into the finished book"""
+    metadata = await asyncio.to_thread(_load_book, book_id)
+    book_filename = await asyncio.to_thread(compile_book, metadata["book_info"]["title"], force)
+    if not book_filename:
+        raise HTTPException(status_code=409, detail="The book could not be compiled; are all chapters written?")
+    return {"book_id": book_id, "filename": Path(book_filename).name}
+
+
+@app.get("/books/{book_id}/download")
+async def download_book(book_id: str, request: Request, format: str = Query("md", pattern="^(md|epub)$")) -> Response:
+    """The compiled book. Supports If-None-Match (304) and Range requests."""
+    await asyncio.to_thread(_load_book, book_id)
+    path = Path(BOOKS_DIR) / f"{book_id}.{format}"
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No compiled {format} file for '{book_id}' yet")
+
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ]):
+        return Response(status_code=304, headers={"etag": etag})
+
+    return FileResponse(
+        path,
+        media_type=_DOWNLOAD_TYPES[format],
+        filename=path.name,
+        stat_result=stat_result,
+        headers={"etag": etag, "cache-control": "no-cache"},
+    )
+
+
+def _format_event(event: Dict[str, Any]) -> str:
+    return f"id: {event['id']}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.get("/books/{book_id}/events")
+async def book_events(book_id: str, request: Request) -> StreamingResponse:
+    """Progress events of a book as Server-Sent Events; resumes after the Last-Event-ID header"""
+    await asyncio.to_thread(_load_book, book_id)
+    last_event_id = request.headers.get("last-event-id")
+    queue, history = subscribe(book_id, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            yield "retry: 3000\n\n"
+            for event in history:
+                yield _format_event(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_event(event)
+        finally:
+            unsubscribe(book_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    uvicorn.run(app, host=BOOK_SERVICE_HOST, port=BOOK_SERVICE_PORT)
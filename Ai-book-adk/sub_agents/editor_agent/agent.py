@@ -2,6 +2,8 @@ from datetime import datetime
 
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
+from . import cleanup
+from . import quality_gate
 from . import tools
 
 # Create the editor agent
@@ -24,5 +26,8 @@ editor_agent = Agent(
         tools.editor_agent,
         tools.publish_story,
         tools.chapter_editor_agent,
+        tools.edit_chapter_if_needed,
+        cleanup.clean_library,
+        quality_gate.get_editor_gate_stats,
     ],
 )
@@ -0,0 +1,189 @@
+"""Chunked, concurrent chapter editing.
+
+Long chapters are split at scene and paragraph boundaries into windows of a
+bounded size. Each window is edited concurrently with its neighbouring
+paragraphs supplied as read-only context, so the edit wall time follows the
+largest window instead of the whole chapter. The edited windows are stitched
+back together after a seam check that strips context the model echoed back and
+keeps the original text of any window whose edit came back unusable.
+"""
+
+import difflib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Target size of one edit window, in estimated tokens. Only chapters longer than
+# this are split; a typical 1,500-2,000 word chapter (~2,000-2,700 tokens) is one call
+EDITOR_CHUNK_TOKENS = int(os.getenv('EDITOR_CHUNK_TOKENS', '3000'))
+# Maximum number of windows edited at the same time
+EDITOR_CHUNK_CONCURRENCY = int(os.getenv('EDITOR_CHUNK_CONCURRENCY', '4'))
+# Number of neighbouring paragraphs passed as read-only context on each side
+EDITOR_CHUNK_OVERLAP = int(os.getenv('EDITOR_CHUNK_OVERLAP', '1'))
+
+# An edited window shorter or longer than this fraction of the original is rejected
+_MIN_LENGTH_RATIO = 0.5
+_MAX_LENGTH_RATIO = 2.0
+# Similarity above which the start/end of an edit is treated as echoed context
+_ECHO_SIMILARITY = 0.8
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SCENE_BREAK = re.compile(r'^\s*(?:\*\s*\*\s*\*|-{3,}|#{1,6}\s.*|~{3,})\s*$')
+
+# Edits one window: (window text, context before, context after) -> edited window text
+ChunkEditor = Callable[[str, str, str], str]
+
+
+@dataclass
+class EditChunk:
+    """A window of consecutive paragraphs plus the read-only context around it"""
+    text: str
+    context_before: str
+    context_after: str
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English prose (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Split text into non-empty paragraphs"""
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+
+
+def split_into_chunks(text: str, max_tokens: int = EDITOR_CHUNK_TOKENS,
+                      overlap: int = EDITOR_CHUNK_OVERLAP) -> List[EditChunk]:
+    """
+    Split a chapter into edit windows at scene and paragraph boundaries.
+
+    Windows are filled greedily up to max_tokens. A scene break (a heading,
+    "***" or "---") always ends the current window once it is at least half
+    full, so scenes are kept together where possible. A single paragraph
+    larger than max_tokens becomes a window of its own.
+
+    Args:
+        text: Chapter text
+        max_tokens: Target window size in estimated tokens
+        overlap: Number of paragraphs of read-only context on each side
+
+    Returns:
+        The windows in chapter order
+    """
+    paragraphs = split_paragraphs(text)
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for index, paragraph in enumerate(paragraphs):
+        tokens = estimate_tokens(paragraph)
+        scene_break = bool(_SCENE_BREAK.match(paragraph.splitlines()[0]))
+        if current and (current_tokens + tokens > max_tokens or (scene_break and current_tokens >= max_tokens // 2)):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for group in groups:
+        first, last = group[0], group[-1]
+        chunks.append(EditChunk(
+            text="\n\n".join(paragraphs[first:last + 1]),
+            context_before="\n\n".join(paragraphs[max(0, first - overlap):first]),
+            context_after="\n\n".join(paragraphs[last + 1:last + 1 + overlap]),
+        ))
+    return chunks
+
+
+def _similar(first: str, second: str) -> bool:
+    if " ".join(first.split()) == " ".join(second.split()):
+        return True
+    matcher = difflib.SequenceMatcher(None, first, second)
+    return matcher.quick_ratio() >= _ECHO_SIMILARITY and matcher.ratio() >= _ECHO_SIMILARITY
+
+
+def reconcile_seam(chunk: EditChunk, edited: Optional[str]) -> str:
+    """
+    Check an edited window before it is stitched back in.
+
+    Paragraphs the model copied from the read-only context are removed from the
+    start and end of the edit. If the edit is missing or its length is far off
+    the original, the original window is kept so the seam stays intact.
+
+    Args:
+        chunk: The window that was edited
+        edited: The model's edit of the window
+
+    Returns:
+        Text to use for this window in the stitched chapter
+    """
+    if not edited or not edited.strip():
+        logger.warning("Edited chunk came back empty; keeping the original text")
+        return chunk.text
+
+    paragraphs = split_paragraphs(edited)
+    before = split_paragraphs(chunk.context_before)
+    after = split_paragraphs(chunk.context_after)
+
+    original = split_paragraphs(chunk.text)
+
+    # Drop context echoed at the seams, unless the window itself starts/ends the same way
+    while paragraphs and before and _similar(paragraphs[0], before[-1]) and not _similar(paragraphs[0], original[0]):
+        paragraphs.pop(0)
+        before.pop()
+    while paragraphs and after and _similar(paragraphs[-1], after[0]) and not _similar(paragraphs[-1], original[-1]):
+        paragraphs.pop()
+        after.pop(0)
+
+    result = "\n\n".join(paragraphs)
+    ratio = len(result) / max(1, len(chunk.text))
+    if not _MIN_LENGTH_RATIO <= ratio <= _MAX_LENGTH_RATIO:
+        logger.warning(f"Edited chunk is {ratio:.0%} of the original length; keeping the original text")
+        return chunk.text
+    return result
+
+
+def edit_in_chunks(text: str, edit_chunk: ChunkEditor, max_tokens: int = EDITOR_CHUNK_TOKENS,
+                   max_workers: int = EDITOR_CHUNK_CONCURRENCY,
+                   chunk_indices: Optional[Iterable[int]] = None) -> str:
+    """
+    Edit a long text window by window, concurrently, and stitch the result.
+
+    Args:
+        text: Text to edit
+        edit_chunk: Callable editing one window given its surrounding context
+        max_tokens: Target window size in estimated tokens
+        max_workers: Maximum number of windows edited at the same time
+        chunk_indices: Only edit the windows with these indices; the rest are kept as-is (default: all)
+
+    Returns:
+        The edited text
+    """
+    chunks = split_into_chunks(text, max_tokens)
+    selected = set(range(len(chunks)) if chunk_indices is None else chunk_indices)
+
+    def run(position: int) -> str:
+        chunk = chunks[position]
+        if position not in selected:
+            return chunk.text
+        try:
+            return reconcile_seam(chunk, edit_chunk(chunk.text, chunk.context_before, chunk.context_after))
+        except Exception as e:
+            logger.error(f"Error editing chunk: {e}")
+            return chunk.text
+
+    if len(chunks) <= 1:
+        return run(0) if chunks else text
+
+    logger.info(f"Editing {len(selected)} of {len(chunks)} chunks with up to {max_workers} workers")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="chunk-editor") as executor:
+        edited = list(executor.map(run, range(len(chunks))))
+    return "\n\n".join(edited)
@@ -0,0 +1,152 @@
+"""Precompiled cleanup and normalization of editor output.
+
+The editor model sometimes wraps a chapter in meta-commentary ("Here's an
+edited version of your chapter...", a "Key Changes and Rationale" section, "I
+hope these edits are helpful"). ``clean_chapter_text`` strips all of it, fixes
+over-emphasis and collapses runs of blank lines in a single scan with one
+precompiled pattern, so chapters are clean in memory before they are written.
+``clean_library`` applies the same engine to every chapter already on disk.
+
+This module has no package-relative imports so the scripts in ``others/`` can
+load it directly by path.
+"""
+
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_CLEANUP_PATTERN = re.compile(r"""
+    # Introductions such as "Okay, here's an edited version of your chapter:" at the start
+    # of the text, or right after the heading and illustration lines of a saved chapter file
+    (?P<intro>
+        \A(?P<front>\s*(?:(?:\#|!\[|\*\[illustration\s+pending:)[^\n]*(?:\n|\Z)\s*)*)
+        (?:okay|ok|sure|certainly)?[,!. \t]*
+        (?:
+            (?:here'?s|here\s+is)\b[^\n]*?
+            \b(?:(?:edited|revised|polished|improved)\s+(?:version|chapter|draft|text)|version\s+of\s+(?:your|the|this)\s+chapter)\b
+          | i(?:'?ve|\s+have)\s+(?:edited|revised|polished)\s+(?:your|the|this)\s+chapter\b
+        )[^\n]*(?:\n[ \t]*)*
+    )
+    # Closing remarks on lines of their own, then an optional "Key Changes and Rationale"
+    # section (and a rule before it), at the very end; the same words inside the prose are kept
+  | (?P<tail>
+        (?:
+            ^[ \t]*(?:
+                i\s+hope\s+(?:these\s+edits|this\s+helps|you\s+enjoy)[^\n]*
+              | (?:thanks|thank\s+you)\s+for\s+reading[^\n]*
+              | stay\s+tuned\s+for\s+the\s+next\s+chapter[^\n]*
+              | this\s+concludes\s+chapter\s+\d+[^\n]*
+              | author'?s\s+note:[^\n]*
+              | \**(?:the\s+end|to\s+be\s+continued)\.?\**[ \t]*$
+            )\s*
+        )*
+        (?:
+            (?:^[ \t]*(?:-{3,}|\*{3,}|_{3,})[ \t]*\n\s*)?
+            ^[ \t]*[*_# \t]*(?:key\s+)?changes\s+(?:and|&)\s+rationale\b(?s:.*)
+        )?
+        \Z
+    )
+    # ****text**** -> **text**
+  | \*\*\*\*(?P<emphasized>[^\n]*?)\*\*\*\*
+    # Three or more line breaks -> one blank line
+  | (?P<blank_run>\n[ \t]*\n(?:[ \t]*\n)+)
+""", re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+
+_QUOTED_DIALOGUE = re.compile(r'(?<!\*)"([^"]*)"(?!\*)')
+_SETEXT_H1 = re.compile(r'^(?!#)(.+?)\n={3,}$', re.MULTILINE)
+_SETEXT_H2 = re.compile(r'^(?!##)(.+?)\n-{3,}$', re.MULTILINE)
+_SINGLE_LINE_BREAK = re.compile(r'([^\n])\n([^\n])')
+
+
+def _replace_match(match: re.Match) -> str:
+    if match.group("emphasized") is not None:
+        return f"**{match.group('emphasized')}**"
+    if match.group("blank_run") is not None:
+        return "\n\n"
+    if match.group("intro") is not None:
+        return match.group("front")
+    return ""
+
+
+def clean_chapter_text(text: str) -> str:
+    """
+    Remove editor meta-commentary and normalize spacing in one pass.
+
+    Args:
+        text: Chapter text as returned by the editor
+
+    Returns:
+        The cleaned text
+    """
+    return _CLEANUP_PATTERN.sub(_replace_match, text).strip()
+
+
+def normalize_markdown(text: str) -> str:
+    """
+    Apply the rule-based Markdown formatting used for styled chapters.
+
+    Italicizes quoted dialogue, converts underlined (setext) headings to
+    ATX headings and puts every line in its own paragraph, then cleans the
+    result with clean_chapter_text.
+
+    Args:
+        text: Chapter text
+
+    Returns:
+        The formatted text
+    """
+    text = _QUOTED_DIALOGUE.sub(r'*"\1"*', text)
+    text = _SETEXT_H1.sub(r'# \1', text)
+    text = _SETEXT_H2.sub(r'## \1', text)
+    text = _SINGLE_LINE_BREAK.sub(r'\1\n\n\2', text)
+    return clean_chapter_text(text)
+
+
+def clean_library(books_dir: str = "books", dry_run: bool = False) -> str:
+    """
+    Clean editor meta-commentary out of every chapter file in the library.
+
+    Args:
+        books_dir: Folder containing the books (default: books)
+        dry_run: Only report the chapters that would change (default: False)
+
+    Returns:
+        JSON string with the number of chapters checked and the files cleaned or failed
+    """
+    root = Path(books_dir)
+    if not root.exists():
+        logger.error(f"Books directory '{books_dir}' not found")
+        return json.dumps({"error": f"Books directory '{books_dir}' not found"})
+
+    checked = 0
+    cleaned: List[str] = []
+    failed: Dict[str, str] = {}
+
+    for chapter_file in sorted(root.glob("*/ch*.md")):
+        checked += 1
+        try:
+            content = chapter_file.read_text(encoding="utf-8")
+            result = clean_chapter_text(content)
+            if content.endswith("\n"):
+                result += "\n"
+            if result == content:
+                continue
+
+            if not dry_run:
+                temp_file = chapter_file.with_name(f".{chapter_file.name}.tmp")
+                temp_file.write_text(result, encoding="utf-8")
+                os.replace(temp_file, chapter_file)
+            cleaned.append(str(chapter_file))
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Error cleaning '{chapter_file}': {e}")
+            failed[str(chapter_file)] = str(e)
+
+    action = "would be cleaned" if dry_run else "cleaned"
+    logger.info(f"{len(cleaned)}/{checked} chapter files {action}")
+    return json.dumps({"checked": checked, "cleaned": cleaned, "failed": failed, "dry_run": dry_run}, indent=2)
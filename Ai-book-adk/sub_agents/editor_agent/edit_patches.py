@@ -0,0 +1,165 @@
+"""Structured edit lists and a fuzzy local applier.
+
+Instead of re-emitting a whole chapter, the model returns a JSON list of edits,
+each naming a passage of the original text (the anchor) and its replacement.
+The edits are applied locally, so output size follows the amount of change.
+Anchors are located exactly where possible, then ignoring whitespace and case,
+then by fuzzy matching. An anchor that occurs more than once (a repeated line of
+dialogue, say) is ambiguous and is not placed. If any anchor cannot be placed
+the caller falls back to a full rewrite.
+"""
+
+import difflib
+import json
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Minimum similarity for a fuzzy anchor match (0-1)
+EDIT_ANCHOR_SIMILARITY = float(os.getenv('EDIT_ANCHOR_SIMILARITY', '0.85'))
+
+_CODE_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+
+PATCH_INSTRUCTIONS = """
+    Do NOT return the edited text. Return your edits as a JSON array, one object per change:
+    [{"anchor": "<exact passage copied from the text>", "replacement": "<edited passage>"}]
+    - Each anchor must be copied verbatim from the text and be long enough to be unique (a full sentence or clause).
+    - Keep anchors short: only the sentence or phrase you change, never whole paragraphs that stay the same.
+    - To delete a passage, use an empty replacement.
+    - Return [] if the text needs no changes.
+    """
+
+
+def parse_edits(response_text: str) -> Optional[List[dict]]:
+    """
+    Parse the model's edit list.
+
+    Args:
+        response_text: Raw model output, a JSON array (optionally in a code fence or under an "edits" key)
+
+    Returns:
+        List of {"anchor", "replacement"} dictionaries, or None if the output is not a valid edit list
+    """
+    try:
+        edits = json.loads(_CODE_FENCE.sub("", response_text.strip()))
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+    if isinstance(edits, dict):
+        edits = edits.get("edits")
+    if not isinstance(edits, list):
+        return None
+
+    parsed = []
+    for edit in edits:
+        if not isinstance(edit, dict) or not isinstance(edit.get("anchor"), str) or not edit["anchor"].strip():
+            return None
+        replacement = edit.get("replacement", "")
+        if not isinstance(replacement, str):
+            return None
+        parsed.append({"anchor": edit["anchor"], "replacement": replacement})
+    return parsed
+
+
+def find_anchor(text: str, anchor: str) -> Optional[Tuple[int, int]]:
+    """
+    Locate an anchor passage in the text.
+
+    Tries an exact match, then a match ignoring whitespace and case, then the
+    most similar word-aligned span around the longest partial match. An anchor
+    found more than once is rejected rather than applied to the wrong passage.
+
+    Args:
+        text: Text to search
+        anchor: Passage to find
+
+    Returns:
+        (start, end) of the matched span, or None if it cannot be placed confidently
+    """
+    start = text.find(anchor)
+    if start != -1:
+        if text.find(anchor, start + 1) != -1:
+            logger.warning(f"Edit anchor occurs more than once: {anchor[:60]!r}")
+            return None
+        return start, start + len(anchor)
+
+    words = anchor.split()
+    if not words:
+        return None
+    matches = re.finditer(r'\s+'.join(re.escape(word) for word in words), text, re.IGNORECASE)
+    match = next(matches, None)
+    if match:
+        if next(matches, None) is not None:
+            logger.warning(f"Edit anchor occurs more than once: {anchor[:60]!r}")
+            return None
+        return match.span()
+
+    # Fuzzy: place an anchor-sized span around the longest common block, then
+    # try nearby word boundaries for its start and end and keep the best score
+    matcher = difflib.SequenceMatcher(None, text, anchor, autojunk=False)
+    block = matcher.find_longest_match(0, len(text), 0, len(anchor))
+    if block.size == 0:
+        return None
+    slack = max(3, min(20, len(anchor) // 10))
+    guess_start = max(0, block.a - block.b)
+    guess_end = min(len(text), guess_start + len(anchor))
+
+    def boundaries(center: int) -> List[int]:
+        return [
+            position for position in range(max(0, center - slack), min(len(text), center + slack) + 1)
+            if position in (0, len(text)) or text[position - 1].isspace() != text[position].isspace()
+        ] or [center]
+
+    best = None
+    for start in boundaries(guess_start):
+        for end in boundaries(guess_end):
+            if end <= start:
+                continue
+            score = difflib.SequenceMatcher(None, text[start:end], anchor, autojunk=False).ratio()
+            if best is None or score > best[0]:
+                best = (score, start, end)
+
+    if best and best[0] >= EDIT_ANCHOR_SIMILARITY:
+        return best[1], best[2]
+    return None
+
+
+def apply_edits(text: str, edits: List[dict]) -> Optional[str]:
+    """
+    Apply an edit list to the original text.
+
+    All anchors are located in the original text before anything is replaced.
+
+    Args:
+        text: The original text
+        edits: Edits as returned by parse_edits
+
+    Returns:
+        The edited text, or None if an anchor could not be placed or two edits overlap
+    """
+    spans = []
+    for edit in edits:
+        span = find_anchor(text, edit["anchor"])
+        if span is None:
+            logger.warning(f"Could not anchor edit: {edit['anchor'][:60]!r}")
+            return None
+        spans.append((span[0], span[1], edit["replacement"]))
+
+    spans.sort()
+    for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < previous_end:
+            logger.warning("Edits overlap; cannot apply them safely")
+            return None
+
+    parts = []
+    position = 0
+    for start, end, replacement in spans:
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
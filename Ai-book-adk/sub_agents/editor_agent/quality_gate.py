@@ -0,0 +1,202 @@
+"""Local quality gate deciding how much LLM editing a chapter draft needs.
+
+A deterministic analysis of the draft (length against the target, sentence
+length distribution, repeated phrases and leftover Markdown artifacts) decides
+per chapter whether it needs a full edit, an edit of only the problem chunks,
+or no edit at all. Editor meta-commentary is removed locally by the cleanup
+engine and never needs an LLM call. Every decision is appended to a JSON-lines
+log so the number of saved LLM calls can be measured.
+"""
+
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from .chunked_editor import split_into_chunks
+from .cleanup import clean_chapter_text
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+EDITOR_TARGET_MIN_WORDS = int(os.getenv('EDITOR_TARGET_MIN_WORDS', '1500'))
+EDITOR_TARGET_MAX_WORDS = int(os.getenv('EDITOR_TARGET_MAX_WORDS', '2000'))
+EDITOR_GATE_LOG = os.getenv('EDITOR_GATE_LOG', os.path.join('books', '.editor_gate_log.jsonl'))
+# Size of the passages the gate checks, and edits on their own when only a few are flagged
+EDITOR_GATE_CHUNK_TOKENS = int(os.getenv('EDITOR_GATE_CHUNK_TOKENS', '800'))
+
+# Chapters this far outside the word target get a full edit
+_WORD_COUNT_TOLERANCE = 0.1
+# Sentence length limits (words)
+_LONG_SENTENCE = 45
+_MAX_LONG_SENTENCE_SHARE = 0.1
+_MAX_MEAN_SENTENCE = 30
+# A phrase of this many words repeated this often in one chunk is flagged
+_NGRAM_SIZE = 4
+_MAX_NGRAM_REPEATS = 3
+# More than this share of flagged chunks turns a chunk edit into a full edit
+_MAX_CHUNK_SHARE = 0.5
+
+# Phrases made only of these words ("at the end of") are too common to count as repetition
+_STOPWORDS = frozenset(
+    "a an the and or but of to in on at by for with from as is was were be been it its he she they them "
+    "his her their i you we me my your our that this there then than so not no up out into over said".split()
+)
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+_WORD = re.compile(r"[A-Za-z0-9']+")
+_ARTIFACT_PATTERN = re.compile(
+    r'```'                                   # code fences
+    r'|<\/?(?:p|br|div|span|em|strong|i|b)\b[^>]*>'  # HTML tags
+    r'|\[(?:TODO|TBD|insert[^\]]*|placeholder[^\]]*)\]'  # placeholders
+    r'|^\s*#{1,6}\s*$'                       # empty headings
+    r'|\*{4,}',                              # broken emphasis
+    re.IGNORECASE | re.MULTILINE
+)
+
+_log_lock = threading.Lock()
+
+
+def _sentence_lengths(text: str) -> List[int]:
+    return [len(_WORD.findall(sentence)) for sentence in _SENTENCE_END.split(text) if _WORD.search(sentence)]
+
+
+def _chunk_issues(text: str) -> List[str]:
+    """Problems in one chunk of a chapter that an LLM edit should fix"""
+    issues = []
+
+    lengths = _sentence_lengths(text)
+    if lengths:
+        long_share = sum(1 for length in lengths if length > _LONG_SENTENCE) / len(lengths)
+        if long_share > _MAX_LONG_SENTENCE_SHARE:
+            issues.append(f"{long_share:.0%} of sentences are over {_LONG_SENTENCE} words")
+        if sum(lengths) / len(lengths) > _MAX_MEAN_SENTENCE:
+            issues.append(f"mean sentence length {sum(lengths) / len(lengths):.0f} words")
+
+    words = [word.lower() for word in _WORD.findall(text)]
+    ngrams = Counter(tuple(words[i:i + _NGRAM_SIZE]) for i in range(len(words) - _NGRAM_SIZE + 1))
+    repeated = [
+        " ".join(ngram) for ngram, count in ngrams.items()
+        if count >= _MAX_NGRAM_REPEATS and not _STOPWORDS.issuperset(ngram)
+    ]
+    if repeated:
+        issues.append(f"repeated phrases: {', '.join(repeated[:3])}")
+
+    if text.count("**") % 2 or _ARTIFACT_PATTERN.search(text):
+        issues.append("leftover Markdown artifacts")
+
+    return issues
+
+
+def analyze_chapter(text: str, max_tokens: int = EDITOR_GATE_CHUNK_TOKENS) -> Dict[str, object]:
+    """
+    Analyze a chapter draft and decide how it should be edited.
+
+    Args:
+        text: The chapter draft
+        max_tokens: Size of the checked passages, in estimated tokens
+
+    Returns:
+        Dictionary with "decision" ("none", "chunk" or "full"), "reasons",
+        "word_count", "meta_removed", "chunk_count" and "flagged_chunks"
+        (indices of the chunks needing an edit)
+    """
+    cleaned = clean_chapter_text(text)
+    word_count = len(_WORD.findall(cleaned))
+    chunks = split_into_chunks(cleaned, max_tokens)
+
+    reasons = []
+    flagged = []
+    for index, chunk in enumerate(chunks):
+        issues = _chunk_issues(chunk.text)
+        if issues:
+            flagged.append(index)
+            reasons.append(f"chunk {index}: {'; '.join(issues)}")
+
+    low = EDITOR_TARGET_MIN_WORDS * (1 - _WORD_COUNT_TOLERANCE)
+    high = EDITOR_TARGET_MAX_WORDS * (1 + _WORD_COUNT_TOLERANCE)
+    length_off = not low <= word_count <= high
+    if length_off:
+        reasons.insert(0, f"{word_count} words, target {EDITOR_TARGET_MIN_WORDS}-{EDITOR_TARGET_MAX_WORDS}")
+
+    if length_off or (flagged and len(chunks) <= 1) or len(flagged) > len(chunks) * _MAX_CHUNK_SHARE:
+        decision = "full"
+    elif flagged:
+        decision = "chunk"
+    else:
+        decision = "none"
+
+    return {
+        "decision": decision,
+        "reasons": reasons,
+        "word_count": word_count,
+        "meta_removed": cleaned != text.strip(),
+        "chunk_count": len(chunks),
+        "flagged_chunks": flagged,
+    }
+
+
+def log_decision(chapter_title: str, analysis: Dict[str, object]) -> None:
+    """Append a gate decision to the decision log"""
+    if analysis["decision"] == "full":
+        calls_saved = 0
+    elif analysis["decision"] == "chunk":
+        calls_saved = analysis["chunk_count"] - len(analysis["flagged_chunks"])
+    else:
+        calls_saved = max(1, analysis["chunk_count"])
+
+    entry = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "chapter_title": chapter_title,
+        "decision": analysis["decision"],
+        "word_count": analysis["word_count"],
+        "chunk_count": analysis["chunk_count"],
+        "flagged_chunks": analysis["flagged_chunks"],
+        "llm_calls_saved": calls_saved,
+        "reasons": analysis["reasons"],
+    }
+    logger.info(
+        f"Editor gate: '{chapter_title}' -> {analysis['decision']} edit "
+        f"({calls_saved} LLM calls saved){': ' + '; '.join(analysis['reasons']) if analysis['reasons'] else ''}"
+    )
+
+    try:
+        log_file = Path(EDITOR_GATE_LOG)
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        with _log_lock, open(log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write editor gate log: {e}")
+
+
+def get_editor_gate_stats() -> str:
+    """
+    Summarize the editor quality gate's decisions and the LLM edit calls it saved.
+
+    Returns:
+        JSON string with the number of chapters per decision and the total LLM calls saved
+    """
+    decisions: Counter = Counter()
+    calls_saved = 0
+    try:
+        with open(EDITOR_GATE_LOG, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                decisions[entry["decision"]] += 1
+                calls_saved += entry.get("llm_calls_saved", 0)
+    except FileNotFoundError:
+        pass
+
+    return json.dumps({
+        "chapters": sum(decisions.values()),
+        "decisions": {decision: decisions.get(decision, 0) for decision in ("none", "chunk", "full")},
+        "llm_calls_saved": calls_saved,
+    }, indent=2)
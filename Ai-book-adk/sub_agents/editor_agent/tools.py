@@ -6,9 +6,16 @@ import datetime
 import logging
 from pathlib import Path
 import re
+from functools import partial
 from typing import Optional
 
 from google import genai
+from google.genai import types
+
+from .chunked_editor import EDITOR_CHUNK_TOKENS, edit_in_chunks, estimate_tokens
+from .cleanup import clean_chapter_text
+from .edit_patches import PATCH_INSTRUCTIONS, apply_edits, parse_edits
+from .quality_gate import EDITOR_GATE_CHUNK_TOKENS, analyze_chapter, log_decision
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -17,6 +24,46 @@ load_dotenv()
 # Configure the client with your API key
 client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
 
+# "patch" asks the model for a list of edits and applies them locally; "rewrite" has it return the full text
+EDITOR_EDIT_MODE = os.getenv('EDITOR_EDIT_MODE', 'patch').lower()
+
+
+def _edit_text(text: str, patch_prompt: str, rewrite_prompt: str) -> str:
+    """
+    Edit text through an edit list, falling back to a full rewrite.
+    
+    Args:
+        text: The text being edited
+        patch_prompt: Prompt asking for a JSON edit list for the text
+        rewrite_prompt: Prompt asking for the full edited text
+        
+    Returns:
+        The edited text
+    """
+    if EDITOR_EDIT_MODE == "patch":
+        try:
+            response = client.models.generate_content(
+                model="gemini-2.0-flash",
+                contents=patch_prompt,
+                config=types.GenerateContentConfig(response_mime_type="application/json")
+            )
+            edits = parse_edits(response.text)
+            if edits is not None:
+                edited = apply_edits(text, edits)
+                if edited is not None:
+                    logger.info(f"Applied {len(edits)} edits")
+                    return edited
+        except Exception as e:
+            logger.error(f"Error requesting edit list: {e}")
+        logger.info("Edit list could not be applied; falling back to a full rewrite")
+    
+    response = client.models.generate_content(
+        model="gemini-2.0-flash",
+        contents=rewrite_prompt
+    )
+    # Strip any meta-commentary before the text is stitched or written
+    return clean_chapter_text(response.text)
+
 
 def editor_agent(story: str) -> str:
     """
@@ -28,12 +75,12 @@ def editor_agent(story: str) -> str:
     Returns:
         The edited story with improved grammar, clarity, and flow
     """
-    prompt = f"Please edit the following story for grammar, clarity, and flow. Keep the creative style:\n\n{story}"
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt
+    instructions = "Please edit the following story for grammar, clarity, and flow. Keep the creative style"
+    return _edit_text(
+        story,
+        f"{instructions}.\n{PATCH_INSTRUCTIONS}\nStory:\n\n{story}",
+        f"{instructions}:\n\n{story}"
     )
-    return response.text.strip()
 
 
 def publish_story(title: str, story: str, output_dir: str = ".") -> str:
@@ -56,10 +103,47 @@ def publish_story(title: str, story: str, output_dir: str = ".") -> str:
     return filepath
 
 
+_CHAPTER_EDIT_INSTRUCTIONS = """
+    Edit the following {part} titled "{chapter_title}" for grammar, clarity, flow, and narrative coherence.
+    Preserve the creative style and voice while improving the overall quality.
+    """
+
+
+def _edit_chapter_chunk(chunk: str, context_before: str, context_after: str, chapter_title: str) -> str:
+    """Edit one section of a chapter, using the neighbouring text only for continuity"""
+    instructions = _CHAPTER_EDIT_INSTRUCTIONS.format(part="section of the chapter", chapter_title=chapter_title)
+    context = f"""
+    The text before and after the section is given only so the edited section joins up with it smoothly.
+    Do not edit or repeat it.
+    
+    Text before the section (do not include in your answer):
+    {context_before or "(start of chapter)"}
+    """
+    context_end = f"""
+    Text after the section (do not include in your answer):
+    {context_after or "(end of chapter)"}
+    """
+    
+    return _edit_text(
+        chunk,
+        f"{instructions}{PATCH_INSTRUCTIONS}{context}\n    Section to edit:\n    {chunk}\n{context_end}",
+        f"""{instructions}{context}
+    IMPORTANT: Return ONLY the edited section. Do not include any explanatory text, rationale, or meta-commentary about the edits made.
+    
+    Section to edit:
+    {chunk}
+    {context_end}"""
+    )
+
+
 def chapter_editor_agent(chapter_content: str, chapter_title: str) -> str:
     """
     Edit a chapter for grammar, style, and narrative coherence.
     
+    Chapters longer than one edit window are split at scene and paragraph
+    boundaries and the parts are edited concurrently. In the default "patch"
+    mode the model only returns the passages it changes.
+    
     Args:
         chapter_content: The raw chapter content to edit
         chapter_title: The title of the chapter being edited
@@ -67,20 +151,49 @@ def chapter_editor_agent(chapter_content: str, chapter_title: str) -> str:
     Returns:
         The edited chapter with improved quality while preserving the original voice
     """
-    prompt = f"""
-    Edit the following chapter titled "{chapter_title}" for grammar, clarity, flow, and narrative coherence.
-    Preserve the creative style and voice while improving the overall quality.
+    if estimate_tokens(chapter_content) > EDITOR_CHUNK_TOKENS:
+        return edit_in_chunks(chapter_content, partial(_edit_chapter_chunk, chapter_title=chapter_title))
     
+    instructions = _CHAPTER_EDIT_INSTRUCTIONS.format(part="chapter", chapter_title=chapter_title)
+    return _edit_text(
+        chapter_content,
+        f"{instructions}{PATCH_INSTRUCTIONS}\n    Chapter content:\n    {chapter_content}\n    ",
+        f"""{instructions}
     IMPORTANT: Return ONLY the edited chapter content. Do not include any explanatory text, rationale, or meta-commentary about the edits made. Just return the clean, edited chapter text.
     
     Chapter content:
     {chapter_content}
     """
-    
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt
     )
-    return response.text.strip()
 
 
+def edit_chapter_if_needed(chapter_content: str, chapter_title: str) -> str:
+    """
+    Edit a chapter only as much as a local quality check says it needs.
+    
+    The draft is cleaned locally, then analyzed for length, sentence structure,
+    repeated phrases and Markdown artifacts. Clean drafts are returned without
+    an LLM call, drafts with a few problem passages have only those chunks
+    edited, and the rest get a full edit with chapter_editor_agent.
+    
+    Args:
+        chapter_content: The raw chapter content
+        chapter_title: The title of the chapter
+        
+    Returns:
+        The chapter ready to be saved
+    """
+    analysis = analyze_chapter(chapter_content)
+    log_decision(chapter_title, analysis)
+    cleaned = clean_chapter_text(chapter_content)
+    
+    if analysis["decision"] == "none":
+        return cleaned
+    if analysis["decision"] == "chunk":
+        return edit_in_chunks(
+            cleaned,
+            partial(_edit_chapter_chunk, chapter_title=chapter_title),
+            max_tokens=EDITOR_GATE_CHUNK_TOKENS,
+            chunk_indices=analysis["flagged_chunks"]
+        )
+    return chapter_editor_agent(cleaned, chapter_title)
@@ -7,6 +7,9 @@ from google.adk.tools.tool_context import ToolContext
 from .sub_agents.image_description_writer_agent.agent import image_description_weiter_agent
 from . import prompt
 from . import illustrator
+from . import render_queue
+from . import derivatives
+from . import illustration_cache
 
 
 # Create the sales agent
@@ -16,5 +19,8 @@ illustrator_agent = Agent(
     description="Illustrator agent for creating illustrations for chapters of a book",
     instruction= prompt.prompt,
     tools=[illustrator.generate_illustration,
+           render_queue.backfill_illustrations,
+           derivatives.build_illustration_derivatives,
+           illustration_cache.find_duplicate_illustrations,
            AgentTool(agent = image_description_weiter_agent)],
 )
@@ -0,0 +1,202 @@
+"""Publishing derivatives of illustrations (WebP/AVIF and thumbnail sizes).
+
+Encoding images is CPU bound, so derivatives are produced in a process pool
+instead of on the threads that generate and save illustrations. Derivatives
+are written next to their source in a ``derivatives`` folder as
+``{stem}.{ext}`` (full size) and ``{stem}.{width}w.{ext}`` (thumbnails).
+"""
+
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from PIL import Image, features
+
+from ..thinker_agent.tools import BookMetadata
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Whether new illustrations get derivatives automatically after they are saved
+ILLUSTRATION_DERIVATIVES_ENABLED = os.getenv('ILLUSTRATION_DERIVATIVES_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Output formats, in order of preference (supported: webp, avif)
+ILLUSTRATION_DERIVATIVE_FORMATS = tuple(
+    fmt.strip().lower() for fmt in os.getenv('ILLUSTRATION_DERIVATIVE_FORMATS', 'webp').split(',') if fmt.strip()
+)
+# Thumbnail widths in pixels; images narrower than a width are not upscaled
+ILLUSTRATION_THUMBNAIL_WIDTHS = tuple(
+    int(width) for width in os.getenv('ILLUSTRATION_THUMBNAIL_WIDTHS', '480,960').split(',') if width.strip()
+)
+ILLUSTRATION_DERIVATIVE_QUALITY = int(os.getenv('ILLUSTRATION_DERIVATIVE_QUALITY', '80'))
+ILLUSTRATION_DERIVATIVE_WORKERS = int(os.getenv('ILLUSTRATION_DERIVATIVE_WORKERS', '0')) or None
+
+DERIVATIVES_DIR_NAME = "derivatives"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def derivatives_dir(source: Path) -> Path:
+    """Folder holding the derivatives of an illustration"""
+    return source.parent / DERIVATIVES_DIR_NAME
+
+
+def derivative_path(source: Path, fmt: str, width: Optional[int] = None) -> Path:
+    """
+    Path of one derivative of an illustration.
+
+    Args:
+        source: Path of the source illustration
+        fmt: Derivative format (webp or avif)
+        width: Thumbnail width, or None for the full-size derivative
+
+    Returns:
+        Path where the derivative is (or would be) stored
+    """
+    size = f".{width}w" if width else ""
+    return derivatives_dir(source) / f"{source.stem}{size}.{fmt}"
+
+
+def supported_formats(formats: Sequence[str] = ILLUSTRATION_DERIVATIVE_FORMATS) -> List[str]:
+    """Filter formats down to the ones this Pillow build can encode"""
+    supported = []
+    for fmt in formats:
+        if features.check(fmt):
+            supported.append(fmt)
+        else:
+            logger.warning(f"Pillow cannot encode '{fmt}'; skipping those derivatives")
+    return supported
+
+
+def render_derivatives(source: str, formats: Sequence[str], widths: Sequence[int], quality: int) -> List[str]:
+    """
+    Write the derivatives of one illustration that don't exist yet.
+
+    Runs inside the worker processes, so it only takes and returns picklable values.
+
+    Args:
+        source: Path of the source illustration
+        formats: Derivative formats to produce
+        widths: Thumbnail widths to produce
+        quality: Encoder quality (0-100)
+
+    Returns:
+        Paths of all derivatives of the illustration
+    """
+    source_path = Path(source)
+    derivatives_dir(source_path).mkdir(exist_ok=True)
+    written = []
+
+    with Image.open(source_path) as image:
+        image.load()
+        width, height = image.size
+        sizes = [None] + sorted(w for w in set(widths) if w < width)
+
+        for fmt in formats:
+            for size in sizes:
+                target = derivative_path(source_path, fmt, size)
+                if not target.exists():
+                    variant = image if size is None else image.resize((size, round(height * size / width)), Image.LANCZOS)
+                    temp_file = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+                    variant.save(temp_file, format=fmt.upper(), quality=quality)
+                    os.replace(temp_file, target)
+                written.append(str(target))
+
+    return written
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Get the shared derivative process pool, creating it on first use"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the pool is started from render threads, and forking a
+            # multithreaded process can deadlock on locks held by the other threads
+            _pool = ProcessPoolExecutor(
+                max_workers=ILLUSTRATION_DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_derivative_pool() -> None:
+    """Wait for queued derivatives and stop the process pool"""
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+atexit.register(shutdown_derivative_pool)
+
+
+def submit_derivatives(source, formats: Optional[Sequence[str]] = None,
+                       widths: Sequence[int] = ILLUSTRATION_THUMBNAIL_WIDTHS) -> Optional[Future]:
+    """
+    Queue derivative generation for an illustration in the process pool.
+
+    Args:
+        source: Path of the source illustration
+        formats: Derivative formats (default: ILLUSTRATION_DERIVATIVE_FORMATS)
+        widths: Thumbnail widths (default: ILLUSTRATION_THUMBNAIL_WIDTHS)
+
+    Returns:
+        Future resolving to the derivative paths, or None if no format is supported
+    """
+    formats = supported_formats(formats if formats is not None else ILLUSTRATION_DERIVATIVE_FORMATS)
+    if not formats:
+        return None
+    return _get_pool().submit(render_derivatives, str(source), formats, tuple(widths), ILLUSTRATION_DERIVATIVE_QUALITY)
+
+
+def build_illustration_derivatives(book_title: str) -> str:
+    """
+    Create WebP/AVIF versions and thumbnails of every illustration in a book for publishing.
+
+    Existing derivatives are kept, so re-running only processes new illustrations.
+
+    Args:
+        book_title: The title of the book
+
+    Returns:
+        JSON string with the number of illustrations processed, derivatives available and failures
+    """
+    book_metadata = BookMetadata("books", book_title)
+    if not book_metadata.load():
+        logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
+        return json.dumps({"error": f"Book '{book_title}' not found"})
+
+    illustrations_dir = book_metadata.chapters_dir / "illustrations"
+    sources = sorted(
+        path for path in illustrations_dir.rglob("*")
+        if path.is_file() and path.suffix.lower() in (".png", ".jpg", ".jpeg")
+        and DERIVATIVES_DIR_NAME not in path.relative_to(illustrations_dir).parts
+    ) if illustrations_dir.exists() else []
+
+    futures: Dict[Future, Path] = {}
+    for source in sources:
+        future = submit_derivatives(source)
+        if future is None:
+            break
+        futures[future] = source
+
+    derivatives = 0
+    failed: List[str] = []
+    for future in as_completed(futures):
+        try:
+            derivatives += len(future.result())
+        except Exception as e:
+            logger.error(f"Could not create derivatives for '{futures[future]}': {e}")
+            failed.append(str(futures[future]))
+
+    logger.info(f"Derivatives ready for {len(futures) - len(failed)}/{len(sources)} illustrations of '{book_title}'")
+    return json.dumps({"illustrations": len(sources), "derivatives": derivatives, "failed": failed}, indent=2)
@@ -0,0 +1,320 @@
+"""Illustration cache and near-duplicate index.
+
+Every illustrations folder keeps a small SQLite index next to its images:
+
+* a cache mapping (normalized description, model) to the image generated for
+  it, so asking for the same scene again returns the existing file instead of
+  paying for another generation;
+* a perceptual hash (dHash) per image, so visually near-identical
+  illustrations can be found even when their prompts differ;
+* a manifest mapping each chapter's illustration label to its image, mirrored
+  to ``manifest.json``.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from ..thinker_agent.tools import BookMetadata
+from .derivatives import DERIVATIVES_DIR_NAME
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = ".illustration_index.sqlite3"
+MANIFEST_FILENAME = "manifest.json"
+
+# Maximum Hamming distance between two 64-bit dHashes to count as near-duplicates
+NEAR_DUPLICATE_DISTANCE = int(os.getenv('ILLUSTRATION_NEAR_DUPLICATE_DISTANCE', '6'))
+
+
+def normalize_description(description: str) -> str:
+    """Normalize an illustration description so trivial differences share a cache entry"""
+    text = unicodedata.normalize("NFKC", description).casefold()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def description_cache_key(description: str, model: str) -> str:
+    """Cache key for an illustration description rendered by a model"""
+    return hashlib.sha256(f"{model}\0{normalize_description(description)}".encode("utf-8")).hexdigest()
+
+
+def dhash(image_path, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash of an image.
+
+    The image is shrunk to (hash_size + 1) x hash_size grayscale pixels and each
+    bit records whether a pixel is brighter than its right-hand neighbour.
+
+    Args:
+        image_path: Path of the image
+        hash_size: Hash grid size; the hash has hash_size ** 2 bits
+
+    Returns:
+        The hash as an integer
+    """
+    with Image.open(image_path) as image:
+        image.draft("L", (hash_size * 4, hash_size * 4))
+        pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(first: int, second: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(first ^ second).count("1")
+
+
+class IllustrationIndex:
+    """SQLite index of the illustrations in one folder"""
+
+    def __init__(self, illustrations_dir):
+        """
+        Args:
+            illustrations_dir: Folder holding the illustrations (created if missing)
+        """
+        self.illustrations_dir = Path(illustrations_dir)
+        self.illustrations_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.illustrations_dir / INDEX_FILENAME
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    filename TEXT PRIMARY KEY,
+                    dhash TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS manifest (
+                    label TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def _filename(self, path) -> str:
+        """Path of an illustration relative to the indexed folder"""
+        return Path(os.path.relpath(path, self.illustrations_dir)).as_posix()
+
+    def lookup(self, description: str, model: str) -> Optional[str]:
+        """
+        Find the illustration previously generated for a description.
+
+        Entries whose file has since been deleted are dropped.
+
+        Args:
+            description: The illustration description
+            model: The image generation model
+
+        Returns:
+            Path of the cached illustration, or None on a cache miss
+        """
+        key = description_cache_key(description, model)
+        with self._connect() as conn:
+            row = conn.execute("SELECT filename FROM cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            path = self.illustrations_dir / row[0]
+            if path.exists():
+                return str(path)
+
+            conn.execute("DELETE FROM cache WHERE cache_key = ?", (key,))
+            conn.execute("DELETE FROM hashes WHERE filename = ?", (row[0],))
+            return None
+
+    def record(self, description: str, model: str, image_path) -> List[str]:
+        """
+        Add a newly generated illustration to the cache and the perceptual-hash index.
+
+        Args:
+            description: The description the illustration was generated from
+            model: The image generation model
+            image_path: Path of the saved illustration
+
+        Returns:
+            Paths of existing illustrations that are near-duplicates of this one
+        """
+        filename = self._filename(image_path)
+        duplicates = []
+        try:
+            image_hash = dhash(image_path)
+            duplicates = self.find_near_duplicates(image_hash, exclude=filename)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not hash illustration '{image_path}': {e}")
+            image_hash = None
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (cache_key, model, description, filename, created_at) VALUES (?, ?, ?, ?, ?)",
+                (description_cache_key(description, model), model, description, filename,
+                 datetime.datetime.now().isoformat())
+            )
+            if image_hash is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO hashes (filename, dhash) VALUES (?, ?)",
+                    (filename, f"{image_hash:016x}")
+                )
+
+        return duplicates
+
+    def assign(self, label: str, image_path) -> None:
+        """
+        Point a manifest entry (e.g. a chapter's illustration prefix) at an image.
+
+        The manifest is mirrored to manifest.json in the illustrations folder.
+
+        Args:
+            label: Name of the entry, e.g. "ch01_the_beginning"
+            image_path: Path of the illustration
+        """
+        with self._connect() as conn:
+            # Take the write lock up front so concurrent writers mirror the manifest in order
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO manifest (label, filename, updated_at) VALUES (?, ?, ?)",
+                (label, self._filename(image_path), datetime.datetime.now().isoformat())
+            )
+            rows = conn.execute("SELECT label, filename FROM manifest ORDER BY label").fetchall()
+
+            manifest_file = self.illustrations_dir / MANIFEST_FILENAME
+            temp_file = manifest_file.with_name(f".{MANIFEST_FILENAME}.{os.getpid()}.tmp")
+            temp_file.write_text(json.dumps(dict(rows), indent=2), encoding="utf-8")
+            os.replace(temp_file, manifest_file)
+
+    def manifest(self) -> Dict[str, str]:
+        """Manifest entries mapped to illustration paths relative to the folder"""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT label, filename FROM manifest ORDER BY label").fetchall())
+
+    def _hashes(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT filename, dhash FROM hashes").fetchall()
+        return {filename: int(value, 16) for filename, value in rows}
+
+    def find_near_duplicates(self, image_hash: int, max_distance: int = NEAR_DUPLICATE_DISTANCE,
+                             exclude: Optional[str] = None) -> List[str]:
+        """
+        Find indexed illustrations that look nearly the same as a hash.
+
+        Args:
+            image_hash: dHash to compare against
+            max_distance: Maximum Hamming distance counted as a near-duplicate
+            exclude: Relative filename to leave out (usually the image itself)
+
+        Returns:
+            Paths of the matching illustrations, closest first
+        """
+        matches = []
+        for filename, other in self._hashes().items():
+            distance = hamming_distance(image_hash, other)
+            if filename != exclude and distance <= max_distance:
+                matches.append((distance, filename))
+        return [str(self.illustrations_dir / filename) for _, filename in sorted(matches)]
+
+    def reindex(self) -> int:
+        """
+        Hash illustrations in the folder that are not in the index yet.
+
+        Returns:
+            Number of illustrations added
+        """
+        known = self._hashes()
+        added = 0
+        with self._connect() as conn:
+            for path in sorted(self.illustrations_dir.rglob("*.png")):
+                filename = self._filename(path)
+                if filename in known or DERIVATIVES_DIR_NAME in Path(filename).parts:
+                    continue
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO hashes (filename, dhash) VALUES (?, ?)",
+                        (filename, f"{dhash(path):016x}")
+                    )
+                    added += 1
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not hash illustration '{path}': {e}")
+        return added
+
+    def near_duplicate_groups(self, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> List[List[str]]:
+        """
+        Group the indexed illustrations into clusters of near-duplicates.
+
+        Returns:
+            Lists of relative filenames with two or more near-identical images each
+        """
+        hashes = sorted(
+            (filename, value) for filename, value in self._hashes().items()
+            if (self.illustrations_dir / filename).exists()
+        )
+        parent = {filename: filename for filename, _ in hashes}
+
+        def find(filename):
+            while parent[filename] != filename:
+                parent[filename] = parent[parent[filename]]
+                filename = parent[filename]
+            return filename
+
+        for position, (first, first_hash) in enumerate(hashes):
+            for second, second_hash in hashes[position + 1:]:
+                if hamming_distance(first_hash, second_hash) <= max_distance:
+                    parent[find(second)] = find(first)
+
+        groups: Dict[str, List[str]] = {}
+        for filename, _ in hashes:
+            groups.setdefault(find(filename), []).append(filename)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicate_illustrations(book_title: str, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> str:
+    """
+    Find groups of near-identical illustrations in a book using perceptual hashes.
+
+    Args:
+        book_title: The title of the book
+        max_distance: Maximum number of differing hash bits (out of 64) to count as a duplicate (default: 6)
+
+    Returns:
+        JSON string with the number of indexed illustrations and the duplicate groups
+    """
+    book_metadata = BookMetadata("books", book_title)
+    if not book_metadata.load():
+        logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
+        return json.dumps({"error": f"Book '{book_title}' not found"})
+
+    index = IllustrationIndex(book_metadata.chapters_dir / "illustrations")
+    added = index.reindex()
+    if added:
+        logger.info(f"Indexed {added} illustrations of '{book_title}'")
+
+    groups = index.near_duplicate_groups(max_distance)
+    logger.info(f"Found {len(groups)} groups of near-duplicate illustrations in '{book_title}'")
+    return json.dumps({"illustrations": len(index._hashes()), "duplicate_groups": groups}, indent=2)
@@ -0,0 +1,58 @@
+"""Content-addressed storage for illustration files.
+
+Illustrations are stored under the SHA-256 of their bytes, sharded into
+subfolders by the first two hex digits (``illustrations/3f/3fa4....png``).
+Identical images share one file, concurrent writers never overwrite each
+other's work, and no single folder grows to tens of thousands of entries.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+# Number of leading hex digits of the hash used as the shard folder name
+SHARD_PREFIX_LENGTH = 2
+
+
+def content_address(data: bytes) -> str:
+    """SHA-256 hex digest identifying a file's content"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_path(illustrations_dir, digest: str, suffix: str = ".png") -> Path:
+    """Path where the file with a given content hash is stored"""
+    return Path(illustrations_dir) / digest[:SHARD_PREFIX_LENGTH] / f"{digest}{suffix}"
+
+
+def store_bytes(illustrations_dir, data: bytes, suffix: str = ".png") -> Path:
+    """
+    Store bytes under their content hash.
+
+    The data is written to a uniquely named temp file in the shard folder and
+    renamed into place, so readers never see a partial file and two writers of
+    the same image simply produce the same file.
+
+    Args:
+        illustrations_dir: Root folder of the content-addressed store
+        data: File content
+        suffix: File extension including the dot (default: .png)
+
+    Returns:
+        Path of the stored file
+    """
+    target = content_path(illustrations_dir, content_address(data), suffix)
+    if target.exists():
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.stem[:16]}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_name, target)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    return target
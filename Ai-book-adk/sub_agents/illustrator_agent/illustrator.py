@@ -5,10 +5,13 @@ from google.genai import types
 from PIL import Image
 from io import BytesIO
 import base64
-import datetime
 import logging
 from typing import Optional
 
+from .derivatives import ILLUSTRATION_DERIVATIVES_ENABLED, submit_derivatives
+from .illustration_cache import IllustrationIndex
+from .illustration_store import store_bytes
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -23,14 +26,37 @@ if not api_key:
 # Initialize the client with the API key
 client = genai.Client(api_key=api_key)
 
-def generate_illustration(description: str, prefix: str = "illustration", book_path: Optional[str] = None) -> Optional[str]:
+ILLUSTRATION_MODEL = os.getenv('ILLUSTRATION_MODEL', 'gemini-2.0-flash-exp-image-generation')
+
+
+def _store_image_bytes(data: bytes, mime_type: Optional[str], illustrations_dir: str) -> str:
+    """
+    Store generated image bytes as a PNG in the content-addressed illustration store.
+
+    PNG payloads are stored as-is; anything else is decoded and re-encoded as PNG.
+    
+    Returns:
+        The file path of the stored illustration
+    """
+    if mime_type != "image/png":
+        buffer = BytesIO()
+        with Image.open(BytesIO(data)) as image:
+            image.save(buffer, format="PNG")
+        data = buffer.getvalue()
+    return str(store_bytes(illustrations_dir, data, ".png"))
+
+def generate_illustration(description: str, prefix: str = "illustration", book_path: Optional[str] = None,
+                          use_cache: bool = True) -> Optional[str]:
     """
     Generate an illustration based on the provided description
     
+    Asking again for the same description returns the image generated the first time.
+    
     Args:
         description: A text description of what to generate
-        prefix: A prefix for the filename (default: 'illustration')
+        prefix: Label recorded for the illustration in the manifest (default: 'illustration')
         book_path: Path to the book folder where illustrations should be saved
+        use_cache: Whether to reuse an earlier illustration of the same description (default: True)
         
     Returns:
         The file path of the saved illustration, or None if generation failed
@@ -44,34 +70,46 @@ def generate_illustration(description: str, prefix: str = "illustration", book_p
         illustrations_dir = os.path.join(os.path.dirname(__file__), 'illustrations')
     
     # Create illustrations directory if it doesn't exist
-    if not os.path.exists(illustrations_dir):
-        os.makedirs(illustrations_dir)
+    os.makedirs(illustrations_dir, exist_ok=True)
     
-    # Clean up prefix to ensure it's filename-safe and reasonably short
+    # Clean up prefix to ensure it's a short, filename-safe manifest label
     safe_prefix = prefix.replace(" ", "_").replace(":", "")[:30].lower()  # Limit to 30 chars
     
+    # Reuse the illustration already generated for this description, if any
+    index = IllustrationIndex(illustrations_dir)
+    if use_cache:
+        cached_path = index.lookup(description, ILLUSTRATION_MODEL)
+        if cached_path:
+            index.assign(safe_prefix, cached_path)
+            logger.info(f"Reusing cached illustration: {cached_path}")
+            return cached_path
+    
     # Call the AI model to generate the image
     response = client.models.generate_content(
-        model="gemini-2.0-flash-exp-image-generation",
+        model=ILLUSTRATION_MODEL,
         contents=description,
         config=types.GenerateContentConfig(
           response_modalities=['Text', 'Image']
         )
     )
 
-    # Generate a unique filename using timestamp
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{safe_prefix}_{timestamp}.png"
-    filepath = os.path.join(illustrations_dir, filename)
-
     # Process and save the generated image
     for part in response.candidates[0].content.parts:
         if part.text is not None:
             logger.info(f"Image generation note: {part.text}")
         elif part.inline_data is not None:
-            image = Image.open(BytesIO((part.inline_data.data)))
-            image.save(filepath)
+            # Files are named by content hash, so concurrent renders never overwrite each other
+            filepath = _store_image_bytes(part.inline_data.data, part.inline_data.mime_type, illustrations_dir)
+            index.assign(safe_prefix, filepath)
             logger.info(f"Image saved to: {filepath}")
+            duplicates = index.record(description, ILLUSTRATION_MODEL, filepath)
+            if duplicates:
+                logger.warning(
+                    f"Illustration '{filepath}' looks nearly identical to {len(duplicates)} existing "
+                    f"illustrations, e.g. {', '.join(duplicates[:3])}"
+                )
+            if ILLUSTRATION_DERIVATIVES_ENABLED:
+                submit_derivatives(filepath)
             return filepath
     
     # If no image was generated, return None
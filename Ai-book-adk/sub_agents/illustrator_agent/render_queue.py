@@ -0,0 +1,321 @@
+"""Background render queue for chapter illustrations.
+
+Image generation is the slowest step of writing a chapter, so chapters are
+saved straight away with a placeholder token and the illustration is rendered
+on a separate, bounded pool of workers. When a render finishes the placeholder
+in the chapter file is replaced with the image link and the chapter's
+illustration record in the book metadata is updated. Renders that failed, or
+were interrupted by a restart, are picked up again by ``backfill_illustrations``.
+"""
+
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_for_futures
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..thinker_agent.progress import emit
+from ..thinker_agent.scheduler import ILLUSTRATION_TOKEN_COST, book_tenant, get_scheduler
+from ..thinker_agent.tools import BookMetadata, create_safe_title
+from .illustrator import generate_illustration
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Maximum number of illustrations rendered at the same time
+ILLUSTRATION_RENDER_CONCURRENCY = int(os.getenv('ILLUSTRATION_RENDER_CONCURRENCY', '2'))
+
+_render_queue = None
+_render_queue_lock = threading.Lock()
+
+
+def illustration_placeholder(token: str) -> str:
+    """Markdown line standing in for an illustration until it has been rendered"""
+    return f"*[Illustration pending: {token}]*"
+
+
+# Matches a placeholder line; compiled books leave out illustrations that are not rendered yet
+PENDING_ILLUSTRATION_PATTERN = re.compile(r"^\*\[Illustration pending: \w+\]\*[ \t]*\r?$")
+
+
+def new_illustration_token() -> str:
+    """Create a unique token identifying one chapter illustration render"""
+    return uuid.uuid4().hex[:16]
+
+
+def _replace_placeholder(chapter_file: Path, token: str, illustration_markdown: str) -> bool:
+    """
+    Atomically swap an illustration placeholder in a chapter file for the image link.
+
+    Returns:
+        True if the placeholder was found and replaced, False otherwise
+    """
+    content = chapter_file.read_text(encoding="utf-8")
+    placeholder = illustration_placeholder(token)
+    if placeholder not in content:
+        return False
+
+    temp_file = chapter_file.with_name(f".{chapter_file.name}.tmp")
+    temp_file.write_text(content.replace(placeholder, illustration_markdown, 1), encoding="utf-8")
+    os.replace(temp_file, chapter_file)
+    return True
+
+
+def render_chapter_illustration(book_title: str, chapter_index: int) -> bool:
+    """
+    Render the pending illustration of a chapter and patch it into the chapter file.
+
+    Args:
+        book_title: The title of the book
+        chapter_index: Index of the chapter in the book metadata
+
+    Returns:
+        True if the illustration is in place, False otherwise
+    """
+    book_metadata = BookMetadata("books", book_title)
+    metadata = book_metadata.load()
+    if not metadata:
+        logger.error(f"Book '{book_title}' not found")
+        return False
+
+    chapter = metadata["chapters"][chapter_index]
+    illustration = chapter.get("illustration")
+    if not illustration:
+        logger.warning(f"Chapter {chapter['chapter_number']} of '{book_title}' has no illustration to render")
+        return False
+    if illustration.get("status") == "done":
+        return True
+
+    # Every update is made only while the record still has this render's token:
+    # a rewritten or re-queued chapter gets a new token and a render of its own
+    token = illustration["token"]
+    if not book_metadata.update_chapter_illustration(
+        chapter_index,
+        expected_token=token,
+        status="rendering",
+        attempts=illustration.get("attempts", 0) + 1
+    ):
+        return False
+
+    logger.info(f"Rendering illustration for chapter {chapter['chapter_number']} of '{book_title}'...")
+    emit(book_title, "illustration_started", chapter_number=chapter["chapter_number"])
+    try:
+        # Illustrations are background work: they queue behind interactive chapters
+        with get_scheduler().slot(book_tenant(book_title), "bulk", ILLUSTRATION_TOKEN_COST):
+            illustration_path = generate_illustration(
+                illustration["prompt"], illustration["prefix"], str(book_metadata.chapters_dir)
+            )
+    except Exception as e:
+        logger.error(f"Illustration for chapter {chapter['chapter_number']} failed: {e}")
+        book_metadata.update_chapter_illustration(chapter_index, expected_token=token, status="failed", error=str(e))
+        emit(book_title, "illustration_failed", chapter_number=chapter["chapter_number"], error=str(e))
+        return False
+
+    if not illustration_path:
+        book_metadata.update_chapter_illustration(
+            chapter_index, expected_token=token, status="failed", error="No image was generated"
+        )
+        emit(book_title, "illustration_failed", chapter_number=chapter["chapter_number"], error="No image was generated")
+        return False
+
+    relative_path = os.path.relpath(illustration_path, book_metadata.chapters_dir)
+    illustration_markdown = f"![Chapter {chapter['chapter_number']} Illustration: {chapter['chapter_title']}]({relative_path})"
+
+    try:
+        replaced = _replace_placeholder(Path(chapter["filename"]), token, illustration_markdown)
+    except OSError as e:
+        logger.error(f"Could not patch illustration into '{chapter['filename']}': {e}")
+        book_metadata.update_chapter_illustration(
+            chapter_index, expected_token=token, status="failed", error=str(e), path=relative_path
+        )
+        emit(book_title, "illustration_failed", chapter_number=chapter["chapter_number"], error=str(e))
+        return False
+
+    if not replaced:
+        error = f"Placeholder not found in '{chapter['filename']}'"
+        if book_metadata.update_chapter_illustration(
+            chapter_index, expected_token=token, status="failed", error=error, path=relative_path
+        ):
+            logger.warning(f"Chapter {chapter['chapter_number']} illustration was saved but not linked: {error}")
+            emit(book_title, "illustration_failed", chapter_number=chapter["chapter_number"], error=error)
+        else:
+            logger.info(f"Chapter {chapter['chapter_number']} of '{book_title}' was rewritten during its render; discarding it")
+        return False
+
+    if not book_metadata.update_chapter_illustration(
+        chapter_index,
+        expected_token=token,
+        status="done",
+        path=relative_path,
+        error=None,
+        rendered_at=datetime.datetime.now().isoformat()
+    ):
+        logger.info(f"Chapter {chapter['chapter_number']} of '{book_title}' was rewritten during its render; discarding it")
+        return False
+
+    logger.info(f"Illustration for chapter {chapter['chapter_number']} saved to '{illustration_path}'")
+    emit(book_title, "illustration_done", chapter_number=chapter["chapter_number"], path=relative_path)
+    return True
+
+
+class IllustrationRenderQueue:
+    """Bounded pool of background workers rendering chapter illustrations"""
+
+    def __init__(self, max_workers: int = ILLUSTRATION_RENDER_CONCURRENCY):
+        """
+        Args:
+            max_workers: Maximum number of illustrations rendered concurrently
+        """
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="illustration-render")
+        self._in_flight: Dict[str, Future] = {}
+        # Re-entrant: a job that is already finished runs its done callback inside submit()
+        self._lock = threading.RLock()
+
+    def submit(self, book_title: str, chapter_index: int) -> Future:
+        """
+        Queue a chapter's illustration for rendering.
+
+        Submitting a chapter that is already queued returns the existing job.
+
+        Args:
+            book_title: The title of the book
+            chapter_index: Index of the chapter in the book metadata
+
+        Returns:
+            Future resolving to True once the illustration is in place
+        """
+        key = f"{create_safe_title(book_title)}:{chapter_index}"
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None and not future.done():
+                return future
+
+            future = self._executor.submit(self._run, book_title, chapter_index)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done, key=key: self._forget(key, done))
+            return future
+
+    def _run(self, book_title: str, chapter_index: int) -> bool:
+        try:
+            return render_chapter_illustration(book_title, chapter_index)
+        except Exception as e:
+            logger.error(f"Illustration render for chapter index {chapter_index} of '{book_title}' crashed: {e}")
+            return False
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def pending_count(self) -> int:
+        """Number of illustrations queued or rendering"""
+        with self._lock:
+            return len(self._in_flight)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for all queued illustrations to finish.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the queue is empty, False if the timeout expired first
+        """
+        with self._lock:
+            futures = list(self._in_flight.values())
+        _, not_done = wait_for_futures(futures, timeout=timeout)
+        return not not_done
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting renders; optionally wait for the running ones"""
+        self._executor.shutdown(wait=wait)
+
+
+def get_render_queue() -> IllustrationRenderQueue:
+    """Get the shared illustration render queue, creating it on first use"""
+    global _render_queue
+
+    with _render_queue_lock:
+        if _render_queue is None:
+            _render_queue = IllustrationRenderQueue()
+            logger.info(f"Started illustration render queue ({_render_queue.max_workers} workers)")
+        return _render_queue
+
+
+def record_pending_illustration(book_metadata: BookMetadata, chapter_index: int, prompt: str, prefix: str) -> str:
+    """
+    Record a pending illustration for a chapter before it is queued for rendering.
+
+    Args:
+        book_metadata: Metadata manager of the book
+        chapter_index: Index of the chapter in the book metadata
+        prompt: Description to generate the illustration from
+        prefix: Filename prefix for the illustration
+
+    Returns:
+        The placeholder line to write into the chapter file
+    """
+    token = new_illustration_token()
+    book_metadata.update_chapter_illustration(
+        chapter_index,
+        status="pending",
+        token=token,
+        prompt=prompt,
+        prefix=prefix,
+        path=None,
+        attempts=0,
+        error=None
+    )
+    return illustration_placeholder(token)
+
+
+def backfill_illustrations(book_title: str, wait: bool = True, timeout: float = 600.0) -> str:
+    """
+    Render any chapter illustrations that are still missing and patch them into the chapters.
+
+    Picks up illustrations that failed or were interrupted, e.g. by a restart.
+
+    Args:
+        book_title: The title of the book to backfill
+        wait: Whether to wait for the renders to finish before returning (default: True)
+        timeout: Maximum seconds to wait when wait is True (default: 600)
+
+    Returns:
+        JSON string with the number of renders submitted and the illustration counts by status
+    """
+    book_metadata = BookMetadata("books", book_title)
+    metadata = book_metadata.load()
+
+    if not metadata:
+        logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
+        return json.dumps({"error": f"Book '{book_title}' not found"})
+
+    queue = get_render_queue()
+    futures = []
+    for chapter_index, chapter in enumerate(metadata["chapters"]):
+        illustration = chapter.get("illustration")
+        if chapter["filename"] and illustration and illustration.get("status") != "done":
+            futures.append(queue.submit(book_title, chapter_index))
+
+    logger.info(f"Queued {len(futures)} illustrations for '{book_title}'")
+
+    if wait and futures:
+        _, not_done = wait_for_futures(futures, timeout=timeout)
+        if not_done:
+            logger.warning(f"{len(not_done)} illustrations for '{book_title}' are still rendering")
+
+    counts: Dict[str, int] = {}
+    for chapter in (book_metadata.load() or metadata)["chapters"]:
+        illustration = chapter.get("illustration")
+        if illustration:
+            counts[illustration["status"]] = counts.get(illustration["status"], 0) + 1
+
+    return json.dumps({"submitted": len(futures), "illustrations": counts}, indent=2)
@@ -3,6 +3,8 @@ from datetime import datetime
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 from . import tools
+from . import epub
+from . import html_site
 
 # Create the publisher agent
 publisher_agent = Agent(
@@ -14,7 +16,7 @@ publisher_agent = Agent(
     Your expertise includes:
     - Compiling individual chapters into complete books
     - Managing book metadata and tracking
-    - Generating final formatted output
+    - Generating final formatted output (Markdown, EPUB and a static HTML site)
     - Creating book status reports
     - Handling file management and organization
     
@@ -22,6 +24,9 @@ publisher_agent = Agent(
     """,
     tools=[
         tools.compile_book,
+        tools.compile_all_books,
         tools.get_book_status,
+        epub.export_book_epub,
+        html_site.export_book_html,
     ],
 )
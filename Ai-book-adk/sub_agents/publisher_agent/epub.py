@@ -0,0 +1,376 @@
+"""EPUB 3 export for compiled books.
+
+Chapters are converted from Markdown to XHTML on a thread pool and streamed
+straight into the ZIP archive in order; illustrations are stored without
+recompression. The package document and navigation are generated from the
+book's metadata, and the finished file is checked with an offline structural
+validator before it replaces any previous export.
+"""
+
+import datetime
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import tempfile
+import time
+import uuid
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..thinker_agent.tools import BookMetadata
+from .markdown_html import markdown_to_html
+from .tools import _iter_chapter_body
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Number of threads converting chapters to XHTML
+EPUB_EXPORT_WORKERS = int(os.getenv('EPUB_EXPORT_WORKERS', str(min(8, (os.cpu_count() or 1) + 4))))
+
+CONTAINER_XML = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+STYLESHEET = """body { font-family: serif; line-height: 1.5; margin: 0 5%; }
+h1, h2, h3 { font-family: sans-serif; }
+img { max-width: 100%; height: auto; display: block; margin: 1em auto; }
+blockquote { margin: 1em 2em; font-style: italic; }
+"""
+
+OPF_NS = "http://www.idpf.org/2007/opf"
+CONTAINER_NS = "urn:oasis:names:tc:opendocument:xmlns:container"
+XHTML_NS = "http://www.w3.org/1999/xhtml"
+
+
+def _xhtml_document(title: str, body: str) -> str:
+    """Wrap an XHTML body fragment in an EPUB content document"""
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<!DOCTYPE html>\n'
+        f'<html xmlns="{XHTML_NS}" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="en" lang="en">\n'
+        f'<head>\n<meta charset="utf-8"/>\n<title>{escape(title)}</title>\n'
+        '<link rel="stylesheet" type="text/css" href="style.css"/>\n</head>\n'
+        f'<body>\n{body}\n</body>\n</html>\n'
+    )
+
+
+def _image_archive_name(image_path: Path) -> str:
+    """Stable, collision-free archive name for an illustration"""
+    digest = hashlib.sha1(str(image_path.resolve()).encode("utf-8")).hexdigest()[:10]
+    return f"images/{digest}_{image_path.name}"
+
+
+def _ordered_map(executor: ThreadPoolExecutor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    """
+    Like executor.map, but keeps at most `window` results in flight so memory stays bounded.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _render_chapter(chapter: dict, chapters_dir: Path, force: bool) -> Optional[Tuple[dict, str, Dict[str, Path]]]:
+    """
+    Convert one chapter to an XHTML content document.
+
+    Args:
+        chapter: The chapter's metadata entry
+        chapters_dir: Directory chapter image paths are relative to
+        force: Whether to render a placeholder for an unwritten chapter
+
+    Returns:
+        Tuple of (chapter, XHTML document, {archive name: image file}) or None if the chapter is skipped
+    """
+    if chapter["status"] == "published" and chapter["filename"]:
+        markdown = "".join(_iter_chapter_body(chapter["filename"]))
+    elif force:
+        markdown = "*[This chapter is not yet written]*"
+    else:
+        return None
+
+    images: Dict[str, Path] = {}
+
+    def render_image(alt: str, src: str) -> str:
+        if "://" in src:
+            # EPUB content documents may not load remote images
+            return f'<a href="{escape(src)}">{escape(alt or src, quote=False)}</a>'
+        image_path = chapters_dir / src
+        if not image_path.is_file():
+            logger.warning(f"Illustration '{src}' for chapter {chapter['chapter_number']} not found, skipping")
+            return f"<em>{escape(alt, quote=False)}</em>"
+        name = _image_archive_name(image_path)
+        images[name] = image_path
+        return f'<img src="{escape(name)}" alt="{escape(alt)}"/>'
+
+    title = f"Chapter {chapter['chapter_number']}: {chapter['chapter_title']}"
+    body = f"<h2>{escape(title, quote=False)}</h2>\n{markdown_to_html(markdown, render_image)}"
+    return chapter, _xhtml_document(title, body), images
+
+
+def _title_page(metadata: dict) -> str:
+    """Title page with the front matter and cover description compile_book includes"""
+    book_info = metadata["book_info"]
+    body = (
+        f"<h1>{escape(book_info['title'], quote=False)}</h1>\n"
+        f"<p><em>{escape(book_info['description'], quote=False)}</em></p>\n"
+        f"<p><strong>Topic:</strong> {escape(str(book_info['topic']), quote=False)}</p>\n"
+        f"<p><strong>Created:</strong> {escape(str(book_info['creation_date']), quote=False)}<br/>"
+        f"<strong>Last Updated:</strong> {escape(str(book_info['last_updated']), quote=False)}<br/>"
+        f"<strong>Word Count:</strong> {book_info['estimated_word_count']}<br/>"
+        f"<strong>Page Count:</strong> {book_info['estimated_page_count']}</p>\n"
+        "<hr/>\n<h2>Cover Design Description</h2>\n"
+        f"{markdown_to_html(metadata['generation_info']['cover_description'])}"
+    )
+    return _xhtml_document(book_info["title"], body)
+
+
+def _nav_document(title: str, entries: List[Tuple[str, str]]) -> str:
+    """EPUB 3 navigation document listing the given (href, label) entries"""
+    items = "\n".join(f'<li><a href="{escape(href)}">{escape(label, quote=False)}</a></li>' for href, label in entries)
+    body = f'<nav epub:type="toc" id="toc">\n<h1>{escape(title, quote=False)}</h1>\n<ol>\n{items}\n</ol>\n</nav>'
+    return _xhtml_document(title, body)
+
+
+def _package_document(metadata: dict, safe_title: str, documents: List[Tuple[str, str]], images: Dict[str, Path]) -> str:
+    """
+    Build the OPF package document.
+
+    Args:
+        metadata: The book's metadata
+        safe_title: The book's safe title, used for a stable identifier
+        documents: Ordered (item id, href) pairs of the spine content documents
+        images: Archive names of every illustration in the package
+
+    Returns:
+        The content.opf XML
+    """
+    book_info = metadata["book_info"]
+    identifier = uuid.uuid5(uuid.NAMESPACE_URL, f"editor-house:{safe_title}")
+    modified = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    manifest = [
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+        '<item id="css" href="style.css" media-type="text/css"/>',
+    ]
+    manifest += [f'<item id="{item_id}" href="{escape(href)}" media-type="application/xhtml+xml"/>' for item_id, href in documents]
+    for index, name in enumerate(sorted(images)):
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        manifest.append(f'<item id="img{index}" href="{escape(name)}" media-type="{media_type}"/>')
+    spine = "\n    ".join(f'<itemref idref="{item_id}"/>' for item_id, _ in documents)
+
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f'<package xmlns="{OPF_NS}" version="3.0" unique-identifier="book-id" xml:lang="en">\n'
+        '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+        f'    <dc:identifier id="book-id">urn:uuid:{identifier}</dc:identifier>\n'
+        f'    <dc:title>{escape(book_info["title"], quote=False)}</dc:title>\n'
+        '    <dc:language>en</dc:language>\n'
+        f'    <dc:description>{escape(book_info["description"], quote=False)}</dc:description>\n'
+        f'    <dc:subject>{escape(str(book_info["topic"]), quote=False)}</dc:subject>\n'
+        f'    <dc:date>{escape(str(book_info["creation_date"]), quote=False)}</dc:date>\n'
+        f'    <meta property="dcterms:modified">{modified}</meta>\n'
+        '  </metadata>\n'
+        '  <manifest>\n    ' + "\n    ".join(manifest) + '\n  </manifest>\n'
+        f'  <spine>\n    {spine}\n  </spine>\n'
+        '</package>\n'
+    )
+
+
+def _write_text(archive: zipfile.ZipFile, name: str, text: str, compress_type: int = zipfile.ZIP_DEFLATED) -> None:
+    """Stream a text entry into the archive"""
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = compress_type
+    with archive.open(info, "w") as entry:
+        entry.write(text.encode("utf-8"))
+
+
+def write_epub(book_metadata: BookMetadata, metadata: dict, output_path: Path, force: bool = False,
+               max_workers: int = EPUB_EXPORT_WORKERS) -> Tuple[int, int]:
+    """
+    Write a book as an EPUB 3 file.
+
+    Args:
+        book_metadata: The book's metadata manager
+        metadata: The book's metadata
+        output_path: Where to write the .epub file
+        force: Whether to include placeholders for unwritten chapters
+        max_workers: Number of threads converting chapters
+
+    Returns:
+        Tuple of (chapters written, illustrations written)
+    """
+    documents = [("title", "title.xhtml")]
+    nav_entries = [("title.xhtml", metadata["book_info"]["title"])]
+    images: Dict[str, Path] = {}
+
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        # The mimetype entry must come first and be stored uncompressed
+        _write_text(archive, "mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        _write_text(archive, "META-INF/container.xml", CONTAINER_XML)
+        _write_text(archive, "OEBPS/style.css", STYLESHEET)
+        _write_text(archive, "OEBPS/title.xhtml", _title_page(metadata))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            rendered = _ordered_map(
+                executor,
+                lambda chapter: _render_chapter(chapter, book_metadata.chapters_dir, force),
+                metadata["chapters"],
+                window=max_workers * 2
+            )
+            for result in rendered:
+                if result is None:
+                    continue
+                chapter, xhtml, chapter_images = result
+
+                href = f"chapter_{chapter['chapter_number']:03d}.xhtml"
+                _write_text(archive, f"OEBPS/{href}", xhtml)
+                documents.append((f"ch{chapter['chapter_number']}", href))
+                nav_entries.append((href, f"Chapter {chapter['chapter_number']}: {chapter['chapter_title']}"))
+
+                for name, image_path in chapter_images.items():
+                    if name not in images:
+                        # Illustrations are already compressed; store them as-is
+                        archive.write(image_path, f"OEBPS/{name}", compress_type=zipfile.ZIP_STORED)
+                        images[name] = image_path
+
+        _write_text(archive, "OEBPS/nav.xhtml", _nav_document("Table of Contents", nav_entries))
+        _write_text(archive, "OEBPS/content.opf", _package_document(metadata, book_metadata.safe_title, documents, images))
+
+    return len(documents) - 1, len(images)
+
+
+def validate_epub(path) -> List[str]:
+    """
+    Check an EPUB file's structure offline.
+
+    Verifies the mimetype entry, container, package document, that every
+    manifest and spine item exists, that every content document is well-formed
+    XHTML and that every image it references is in the archive.
+
+    Args:
+        path: Path of the .epub file
+
+    Returns:
+        List of problems found (empty if the file is valid)
+    """
+    problems = []
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        return [f"Not a ZIP archive: {e}"]
+
+    with archive:
+        entries = archive.infolist()
+        names = {entry.filename for entry in entries}
+
+        if not entries or entries[0].filename != "mimetype":
+            problems.append("mimetype is not the first entry")
+        elif entries[0].compress_type != zipfile.ZIP_STORED:
+            problems.append("mimetype entry is compressed")
+        elif archive.read("mimetype") != b"application/epub+zip":
+            problems.append("mimetype entry has the wrong content")
+
+        try:
+            container = ET.fromstring(archive.read("META-INF/container.xml"))
+            rootfile = container.find(f".//{{{CONTAINER_NS}}}rootfile")
+            opf_path = rootfile.get("full-path")
+            package = ET.fromstring(archive.read(opf_path))
+        except (KeyError, ET.ParseError, AttributeError) as e:
+            return problems + [f"Missing or invalid container/package document: {e}"]
+
+        base = posixpath.dirname(opf_path)
+        items = {}
+        for item in package.iterfind(f"{{{OPF_NS}}}manifest/{{{OPF_NS}}}item"):
+            href = posixpath.normpath(posixpath.join(base, item.get("href")))
+            items[item.get("id")] = (href, item.get("media-type"), item.get("properties") or "")
+            if href not in names:
+                problems.append(f"Manifest item '{href}' is missing from the archive")
+
+        if not any("nav" in properties.split() for _, _, properties in items.values()):
+            problems.append("No navigation document in the manifest")
+
+        for itemref in package.iterfind(f"{{{OPF_NS}}}spine/{{{OPF_NS}}}itemref"):
+            if itemref.get("idref") not in items:
+                problems.append(f"Spine item '{itemref.get('idref')}' is not in the manifest")
+
+        for href, media_type, _ in items.values():
+            if media_type != "application/xhtml+xml" or href not in names:
+                continue
+            try:
+                document = ET.fromstring(archive.read(href))
+            except ET.ParseError as e:
+                problems.append(f"'{href}' is not well-formed XHTML: {e}")
+                continue
+            for image in document.iter(f"{{{XHTML_NS}}}img"):
+                image_href = posixpath.normpath(posixpath.join(posixpath.dirname(href), image.get("src", "")))
+                if image_href not in names:
+                    problems.append(f"'{href}' references missing image '{image_href}'")
+
+    return problems
+
+
+def export_book_epub(book_title: str, force: bool = False) -> Optional[str]:
+    """
+    Export a book as an EPUB 3 e-book with its chapters and illustrations.
+
+    Args:
+        book_title: The title of the book to export
+        force: Whether to export even if not all chapters are complete
+
+    Returns:
+        The filename of the EPUB file if successful, None otherwise
+    """
+    book_metadata = BookMetadata("books", book_title)
+    metadata = book_metadata.load()
+
+    if not metadata:
+        logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
+        return
+
+    completed = sum(1 for chapter in metadata["chapters"] if chapter["status"] == "published")
+    total = len(metadata["chapters"])
+
+    if completed < total and not force:
+        logger.warning(f"Not all chapters are complete. {completed}/{total} chapters have been written.")
+        logger.info(f"To continue writing, use: write_next_chapter('{book_title}')")
+        logger.info(f"Or force export with incomplete chapters by using: export_book_epub('{book_title}', force=True)")
+        return
+
+    epub_filename = book_metadata.book_dir / f"{book_metadata.safe_title}.epub"
+    temp_file = tempfile.NamedTemporaryFile(
+        dir=book_metadata.book_dir, prefix=f".{book_metadata.safe_title}.", suffix=".epub.tmp", delete=False
+    )
+    temp_file.close()
+    try:
+        chapters, illustrations = write_epub(book_metadata, metadata, Path(temp_file.name), force)
+
+        problems = validate_epub(temp_file.name)
+        if problems:
+            for problem in problems:
+                logger.error(f"EPUB validation: {problem}")
+            os.remove(temp_file.name)
+            return
+
+        os.replace(temp_file.name, epub_filename)
+    except BaseException:
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+        raise
+
+    logger.info(f"EPUB exported as '{epub_filename}' ({chapters} chapters, {illustrations} illustrations)")
+    return str(epub_filename)
@@ -0,0 +1,265 @@
+"""Static HTML site export for the web reader.
+
+Each book is exported as an index page built from the table of contents plus
+one page per chapter. Illustrations are published as content-hashed assets
+with smaller responsive variants, referenced through ``srcset`` and loaded
+lazily, so a chapter page only downloads what it displays and every asset can
+be cached indefinitely. Thumbnails already produced by the illustrator's
+derivative stage (e.g. WebP) are reused instead of being resized again.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+from html import escape
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from PIL import Image
+
+from ..illustrator_agent.derivatives import ILLUSTRATION_DERIVATIVE_FORMATS, derivative_path
+from ..thinker_agent.tools import BookMetadata
+from .markdown_html import markdown_to_html
+from .tools import _iter_chapter_body
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Widths (in pixels) of the responsive illustration variants
+RESPONSIVE_WIDTHS = (480, 960)
+
+SITE_STYLESHEET = """body { font-family: Georgia, serif; line-height: 1.6; max-width: 46em; margin: 0 auto; padding: 1em; color: #222; }
+h1, h2, h3 { font-family: Helvetica, Arial, sans-serif; line-height: 1.2; }
+img { max-width: 100%; height: auto; display: block; margin: 1.5em auto; }
+nav.pager { display: flex; justify-content: space-between; margin: 2em 0; }
+blockquote { margin: 1em 2em; font-style: italic; }
+"""
+
+
+def _content_hash(data: bytes) -> str:
+    """Short content hash used in asset filenames"""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _write_if_changed(path: Path, data: bytes) -> None:
+    """Atomically write a file unless it already has exactly this content"""
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+def _page(title: str, stylesheet: str, body: str) -> bytes:
+    """Render a complete HTML page"""
+    return (
+        "<!DOCTYPE html>\n"
+        '<html lang="en">\n<head>\n<meta charset="utf-8"/>\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1"/>\n'
+        f"<title>{escape(title)}</title>\n"
+        f'<link rel="stylesheet" href="{escape(stylesheet)}"/>\n'
+        f"</head>\n<body>\n{body}\n</body>\n</html>\n"
+    ).encode("utf-8")
+
+
+def _prebuilt_derivative(image_path: Path, width: int) -> Optional[Path]:
+    """Thumbnail made by the illustrator's derivative stage, if one exists"""
+    for fmt in ILLUSTRATION_DERIVATIVE_FORMATS:
+        candidate = derivative_path(image_path, fmt, width)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+class _AssetPublisher:
+    """Copies illustrations into the site's asset folder under content-hashed names"""
+
+    def __init__(self, assets_dir: Path):
+        self.assets_dir = assets_dir
+        self.published: Dict[Path, str] = {}
+        self.written: Set[str] = set()
+
+    def publish_stylesheet(self) -> str:
+        data = SITE_STYLESHEET.encode("utf-8")
+        name = f"style.{_content_hash(data)}.css"
+        _write_if_changed(self.assets_dir / name, data)
+        self.written.add(name)
+        return f"assets/{name}"
+
+    def publish_image(self, image_path: Path) -> Optional[str]:
+        """
+        Publish an illustration and its responsive variants.
+
+        Args:
+            image_path: Path of the source illustration
+
+        Returns:
+            The <img> attributes other than alt, or None if the image cannot be read
+        """
+        if image_path in self.published:
+            return self.published[image_path]
+
+        try:
+            data = image_path.read_bytes()
+            digest = _content_hash(data)
+            suffix = image_path.suffix.lower()
+            name = f"{image_path.stem}.{digest}{suffix}"
+            target = self.assets_dir / name
+            if not target.exists():
+                shutil.copyfile(image_path, target)
+            self.written.add(name)
+
+            with Image.open(image_path) as image:
+                width, height = image.size
+                sources: List[Tuple[str, int]] = []
+                for variant_width in RESPONSIVE_WIDTHS:
+                    if variant_width >= width:
+                        continue
+                    prebuilt = _prebuilt_derivative(image_path, variant_width)
+                    variant_suffix = prebuilt.suffix if prebuilt else suffix
+                    variant_name = f"{image_path.stem}.{digest}.{variant_width}w{variant_suffix}"
+                    variant_path = self.assets_dir / variant_name
+                    if prebuilt and not variant_path.exists():
+                        shutil.copyfile(prebuilt, variant_path)
+                    elif not variant_path.exists():
+                        variant_height = round(height * variant_width / width)
+                        resized = image.resize((variant_width, variant_height), Image.LANCZOS)
+                        temp_path = variant_path.with_name(f".{variant_name}.tmp{suffix}")
+                        resized.save(temp_path)
+                        os.replace(temp_path, variant_path)
+                    self.written.add(variant_name)
+                    sources.append((f"assets/{variant_name}", variant_width))
+                sources.append((f"assets/{name}", width))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not publish illustration '{image_path}': {e}")
+            return None
+
+        srcset = ", ".join(f"{src} {source_width}w" for src, source_width in sources)
+        attributes = (
+            f'src="assets/{escape(name)}" srcset="{escape(srcset)}" '
+            f'sizes="(max-width: {width}px) 100vw, {width}px" width="{width}" height="{height}" '
+            'loading="lazy" decoding="async"'
+        )
+        self.published[image_path] = attributes
+        return attributes
+
+    def remove_stale(self) -> int:
+        """Delete assets left over from earlier exports"""
+        removed = 0
+        for path in self.assets_dir.iterdir():
+            if path.is_file() and path.name not in self.written:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+def _chapter_page_name(chapter: dict) -> str:
+    return f"chapter-{chapter['chapter_number']:03d}.html"
+
+
+def export_book_html(book_title: str, force: bool = False) -> Optional[str]:
+    """
+    Export a book as a static website with one page per chapter and an index page.
+
+    Illustrations are lazy-loaded, offered in responsive sizes and given
+    content-hashed filenames so browsers can cache them indefinitely.
+
+    Args:
+        book_title: The title of the book to export
+        force: Whether to export even if not all chapters are complete
+
+    Returns:
+        The path of the site's index.html if successful, None otherwise
+    """
+    book_metadata = BookMetadata("books", book_title)
+    metadata = book_metadata.load()
+
+    if not metadata:
+        logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
+        return
+
+    completed = sum(1 for chapter in metadata["chapters"] if chapter["status"] == "published")
+    total = len(metadata["chapters"])
+
+    if completed < total and not force:
+        logger.warning(f"Not all chapters are complete. {completed}/{total} chapters have been written.")
+        logger.info(f"To continue writing, use: write_next_chapter('{book_title}')")
+        logger.info(f"Or force export with incomplete chapters by using: export_book_html('{book_title}', force=True)")
+        return
+
+    site_dir = book_metadata.book_dir / f"{book_metadata.safe_title}_site"
+    assets_dir = site_dir / "assets"
+    assets_dir.mkdir(parents=True, exist_ok=True)
+
+    assets = _AssetPublisher(assets_dir)
+    stylesheet = assets.publish_stylesheet()
+    book_info = metadata["book_info"]
+
+    chapters = [
+        chapter for chapter in metadata["chapters"]
+        if (chapter["status"] == "published" and chapter["filename"]) or force
+    ]
+    pages = set()
+
+    for position, chapter in enumerate(chapters):
+        if chapter["status"] == "published" and chapter["filename"]:
+            markdown = "".join(_iter_chapter_body(chapter["filename"]))
+        else:
+            markdown = "*[This chapter is not yet written]*"
+
+        def render_image(alt: str, src: str) -> str:
+            if "://" in src:
+                return f'<img src="{escape(src)}" loading="lazy" decoding="async" alt="{escape(alt)}"/>'
+            attributes = assets.publish_image(book_metadata.chapters_dir / src)
+            if attributes is None:
+                return f"<em>{escape(alt, quote=False)}</em>"
+            return f'<img {attributes} alt="{escape(alt)}"/>'
+
+        title = f"Chapter {chapter['chapter_number']}: {chapter['chapter_title']}"
+        pager = ['<nav class="pager">']
+        if position > 0:
+            pager.append(f'<a rel="prev" href="{_chapter_page_name(chapters[position - 1])}">&larr; Previous</a>')
+        pager.append('<a href="index.html">Contents</a>')
+        if position + 1 < len(chapters):
+            pager.append(f'<a rel="next" href="{_chapter_page_name(chapters[position + 1])}">Next &rarr;</a>')
+        pager.append("</nav>")
+        pager = "".join(pager)
+
+        body = (
+            f'<p><a href="index.html">{escape(book_info["title"], quote=False)}</a></p>\n'
+            f"<h1>{escape(title, quote=False)}</h1>\n"
+            f"{markdown_to_html(markdown, render_image)}\n{pager}"
+        )
+        page_name = _chapter_page_name(chapter)
+        _write_if_changed(site_dir / page_name, _page(title, stylesheet, body))
+        pages.add(page_name)
+
+    toc_items = "\n".join(
+        f'<li><a href="{_chapter_page_name(chapter)}">'
+        f"Chapter {chapter['chapter_number']}: {escape(chapter['chapter_title'], quote=False)}</a></li>"
+        for chapter in chapters
+    )
+    index_body = (
+        f"<h1>{escape(book_info['title'], quote=False)}</h1>\n"
+        f"<p><em>{escape(book_info['description'], quote=False)}</em></p>\n"
+        f"<p><strong>Topic:</strong> {escape(str(book_info['topic']), quote=False)}<br/>"
+        f"<strong>Word Count:</strong> {book_info['estimated_word_count']} "
+        f"(~{book_info['estimated_page_count']} pages)</p>\n"
+        f"<h2>Table of Contents</h2>\n<ol>\n{toc_items}\n</ol>\n"
+        f"<h2>Cover Design Description</h2>\n{markdown_to_html(metadata['generation_info']['cover_description'])}"
+    )
+    index_file = site_dir / "index.html"
+    _write_if_changed(index_file, _page(book_info["title"], stylesheet, index_body))
+
+    # Drop pages and assets for chapters or illustrations that no longer exist
+    for path in site_dir.glob("chapter-*.html"):
+        if path.name not in pages:
+            path.unlink()
+    removed = assets.remove_stale()
+
+    logger.info(
+        f"HTML site exported to '{site_dir}' ({len(pages)} chapter pages, "
+        f"{len(assets.published)} illustrations, {removed} stale assets removed)"
+    )
+    return str(index_file)
@@ -0,0 +1,177 @@
+"""Minimal Markdown to XHTML conversion for book exports.
+
+Covers the Markdown the writer and editor agents produce: headings, paragraphs,
+emphasis, inline code, links, images, lists, block quotes, code fences and
+horizontal rules. The output is well-formed XHTML so it can go straight into
+EPUB content documents as well as HTML pages.
+"""
+
+import re
+from html import escape
+from typing import Callable, List, Optional
+
+# Renders an image given its alt text and source; returns the markup to emit
+ImageRenderer = Callable[[str, str], str]
+
+_INLINE_PATTERN = re.compile(
+    r'!\[(?P<img_alt>[^\]]*)\]\((?P<img_src>[^)\s]+)(?:\s+"[^"]*")?\)'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_href>[^)\s]+)\)'
+    r'|`(?P<code>[^`]+)`'
+    r'|\*\*(?P<strong>.+?)\*\*'
+    r'|__(?P<strong_alt>.+?)__'
+    r'|\*(?P<em>[^*\s](?:[^*]*[^*\s])?)\*'
+    r'|(?<!\w)_(?P<em_alt>[^_\s](?:[^_]*[^_\s])?)_(?!\w)'
+)
+_HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_RULE_PATTERN = re.compile(r'^\s{0,3}([-*_])(?:\s*\1){2,}\s*$')
+_UNORDERED_ITEM_PATTERN = re.compile(r'^\s{0,3}[-*+]\s+(.*)$')
+_ORDERED_ITEM_PATTERN = re.compile(r'^\s{0,3}\d+[.)]\s+(.*)$')
+_FENCE_PATTERN = re.compile(r'^\s{0,3}(```|~~~)')
+
+
+def default_image_renderer(alt: str, src: str) -> str:
+    """Render a plain <img/> element"""
+    return f'<img src="{escape(src)}" alt="{escape(alt)}"/>'
+
+
+def render_inline(text: str, image_renderer: Optional[ImageRenderer] = None) -> str:
+    """
+    Convert inline Markdown (emphasis, code, links, images) to XHTML.
+
+    Args:
+        text: Inline Markdown text
+        image_renderer: Callable producing the markup for each image
+
+    Returns:
+        Escaped XHTML fragment
+    """
+    image_renderer = image_renderer or default_image_renderer
+    parts = []
+    position = 0
+
+    for match in _INLINE_PATTERN.finditer(text):
+        parts.append(escape(text[position:match.start()], quote=False))
+        position = match.end()
+
+        if match.group("img_src") is not None:
+            parts.append(image_renderer(match.group("img_alt"), match.group("img_src")))
+        elif match.group("link_href") is not None:
+            parts.append(
+                f'<a href="{escape(match.group("link_href"))}">'
+                f'{render_inline(match.group("link_text"), image_renderer)}</a>'
+            )
+        elif match.group("code") is not None:
+            parts.append(f'<code>{escape(match.group("code"), quote=False)}</code>')
+        elif match.group("strong") is not None or match.group("strong_alt") is not None:
+            inner = match.group("strong") if match.group("strong") is not None else match.group("strong_alt")
+            parts.append(f'<strong>{render_inline(inner, image_renderer)}</strong>')
+        else:
+            inner = match.group("em") if match.group("em") is not None else match.group("em_alt")
+            parts.append(f'<em>{render_inline(inner, image_renderer)}</em>')
+
+    parts.append(escape(text[position:], quote=False))
+    return "".join(parts)
+
+
+def markdown_to_html(markdown: str, image_renderer: Optional[ImageRenderer] = None) -> str:
+    """
+    Convert a Markdown document to an XHTML body fragment.
+
+    Args:
+        markdown: Markdown source
+        image_renderer: Callable producing the markup for each image
+
+    Returns:
+        XHTML fragment (without <html>/<body> wrappers)
+    """
+    output: List[str] = []
+    paragraph: List[str] = []
+    quote: List[str] = []
+    list_items: List[str] = []
+    list_tag: Optional[str] = None
+
+    def flush_paragraph():
+        if paragraph:
+            output.append(f"<p>{render_inline(' '.join(paragraph), image_renderer)}</p>")
+            paragraph.clear()
+
+    def flush_quote():
+        if quote:
+            output.append(f"<blockquote>{markdown_to_html(chr(10).join(quote), image_renderer)}</blockquote>")
+            quote.clear()
+
+    def flush_list():
+        nonlocal list_tag
+        if list_items:
+            items = "".join(f"<li>{render_inline(item, image_renderer)}</li>" for item in list_items)
+            output.append(f"<{list_tag}>{items}</{list_tag}>")
+            list_items.clear()
+        list_tag = None
+
+    def flush_all():
+        flush_paragraph()
+        flush_quote()
+        flush_list()
+
+    lines = markdown.splitlines()
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+
+        fence = _FENCE_PATTERN.match(line)
+        if fence:
+            flush_all()
+            code_lines = []
+            while index < len(lines) and not lines[index].strip().startswith(fence.group(1)):
+                code_lines.append(lines[index])
+                index += 1
+            index += 1  # Skip the closing fence
+            output.append(f"<pre><code>{escape(chr(10).join(code_lines), quote=False)}</code></pre>")
+            continue
+
+        if not line.strip():
+            flush_all()
+            continue
+
+        if line.lstrip().startswith(">"):
+            flush_paragraph()
+            flush_list()
+            quote.append(line.lstrip()[1:].removeprefix(" "))
+            continue
+        flush_quote()
+
+        heading = _HEADING_PATTERN.match(line)
+        if heading:
+            flush_all()
+            level = len(heading.group(1))
+            output.append(f"<h{level}>{render_inline(heading.group(2), image_renderer)}</h{level}>")
+            continue
+
+        if _RULE_PATTERN.match(line):
+            flush_all()
+            output.append("<hr/>")
+            continue
+
+        unordered = _UNORDERED_ITEM_PATTERN.match(line)
+        ordered = None if unordered else _ORDERED_ITEM_PATTERN.match(line)
+        if unordered or ordered:
+            flush_paragraph()
+            tag = "ul" if unordered else "ol"
+            if list_tag != tag:
+                flush_list()
+                list_tag = tag
+            list_items.append((unordered or ordered).group(1))
+            continue
+
+        if list_items and line.startswith((" ", "\t")):
+            # Continuation of the previous list item
+            list_items[-1] += " " + line.strip()
+            continue
+
+        flush_list()
+        paragraph.append(line.strip())
+
+    flush_all()
+    return "\n".join(output)
+
@@ -4,16 +4,21 @@ import json
 import time
 import datetime
 import logging
+import multiprocessing
 from pathlib import Path
 import re
-from typing import Optional
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Iterator, Optional, Tuple
 
 from google import genai
 
 # Import BookMetadata from thinker agent
-import sys
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'thinker_agent'))
-from tools import BookMetadata
+from ..thinker_agent.tools import BookMetadata
+from ..thinker_agent.progress import emit
+from ..illustrator_agent.render_queue import PENDING_ILLUSTRATION_PATTERN
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -23,13 +28,209 @@ load_dotenv()
 client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
 
 
-def compile_book(book_title: str, force: bool = False) -> Optional[str]:
+# Size of the blocks chapter bodies are copied in while compiling
+COMPILE_CHUNK_SIZE = 64 * 1024
+# Bump when the compiled layout changes so old build manifests are ignored
+BUILD_MANIFEST_VERSION = 2
+
+
+def _write_json_atomic(path: Path, data) -> None:
+    """Write JSON to a temp file and rename it over the target"""
+    temp_path = path.with_name(f".{path.name}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def _iter_chapter_body(filename) -> Iterator[str]:
+    """
+    Stream a chapter file's content after its header block (everything up to the first blank line).
+    
+    The placeholder of an illustration that has not been rendered yet (or
+    whose render failed) is left out, so it never shows up in a compiled book.
+    
+    Args:
+        filename: Path of the chapter Markdown file
+        
+    Yields:
+        Chunks of the chapter body
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        header = []
+        for line in f:
+            if not line.strip("\r\n"):
+                break
+            header.append(line)
+        else:
+            # No header block; the whole file is the chapter body
+            yield "".join(header)
+            return
+        
+        for line in f:
+            if line.strip() and not PENDING_ILLUSTRATION_PATTERN.match(line.rstrip("\n")):
+                yield line
+                break
+        
+        while True:
+            chunk = f.read(COMPILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _iter_front_matter(metadata: dict) -> Iterator[str]:
+    """
+    Generate the front matter, table of contents and cover section of the compiled book.
+    
+    Args:
+        metadata: The book's metadata
+        
+    Yields:
+        Consecutive fragments of the compiled Markdown book
+    """
+    book_info = metadata["book_info"]
+    yield f"# {book_info['title']}\n\n"
+    yield f"*{book_info['description']}*\n\n"
+    yield f"**Topic:** {book_info['topic']}\n\n"
+    yield f"**Created:** {book_info['creation_date']}\n"
+    yield f"**Last Updated:** {book_info['last_updated']}\n"
+    yield f"**Word Count:** {book_info['estimated_word_count']}\n"
+    yield f"**Page Count:** {book_info['estimated_page_count']}\n\n"
+    yield "---\n\n"
+    yield metadata["generation_info"]["toc"]
+    yield "\n\n---\n\n"
+    
+    # Add cover description
+    yield "## Cover Design Description\n\n"
+    yield f"{metadata['generation_info']['cover_description']}\n\n"
+    yield "---\n\n"
+
+
+def _iter_chapter_fragment(chapter: dict, force: bool = False) -> Iterator[str]:
+    """
+    Generate one chapter's section of the compiled book.
+    
+    Args:
+        chapter: The chapter's metadata entry
+        force: Whether to emit a placeholder if the chapter is not written yet
+        
+    Yields:
+        Consecutive fragments of the chapter section (nothing if the chapter is skipped)
+    """
+    if chapter["status"] == "published" and chapter["filename"]:
+        body = _iter_chapter_body(chapter["filename"])
+    elif force:
+        # For incomplete chapters, add a placeholder if force=True
+        body = iter(["*[This chapter is not yet written]*"])
+    else:
+        return
+    
+    yield f"## Chapter {chapter['chapter_number']}: {chapter['chapter_title']}\n\n"
+    yield from body
+    yield "\n\n---\n\n"
+
+
+def _iter_book_fragments(metadata: dict, force: bool = False) -> Iterator[str]:
+    """
+    Generate the compiled book piece by piece: front matter, table of contents, cover and chapters.
+    
+    Args:
+        metadata: The book's metadata
+        force: Whether to emit placeholders for chapters that are not written yet
+        
+    Yields:
+        Consecutive fragments of the compiled Markdown book
+    """
+    yield from _iter_front_matter(metadata)
+    for chapter in metadata["chapters"]:
+        yield from _iter_chapter_fragment(chapter, force)
+
+
+def _file_sha256(path) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COMPILE_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _chapter_render_key(chapter: dict, force: bool) -> str:
+    """Hash of the chapter metadata that affects how its section is rendered"""
+    fields = {key: chapter.get(key) for key in ("chapter_number", "chapter_title", "status", "filename")}
+    fields["placeholder"] = force and chapter["status"] != "published"
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _chapter_source_signature(chapter: dict) -> Optional[dict]:
+    """Size and modification time of a published chapter's source file"""
+    if chapter["status"] != "published" or not chapter["filename"]:
+        return None
+    stat = os.stat(chapter["filename"])
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _source_unchanged(previous: Optional[dict], current: Optional[dict], filename: Optional[str]) -> bool:
+    """
+    Check whether a chapter source matches the one recorded in the build manifest.
+    
+    A matching size and modification time is trusted; if only the timestamp moved,
+    the content hash decides.
+    """
+    if previous is None or current is None:
+        return previous is None and current is None
+    if previous["size"] != current["size"]:
+        return False
+    if previous["mtime_ns"] == current["mtime_ns"]:
+        current["sha256"] = previous.get("sha256")
+        return True
+    current["sha256"] = _file_sha256(filename)
+    return current["sha256"] == previous.get("sha256")
+
+
+def _load_build_manifest(manifest_file: Path, book_filename: Path) -> Optional[dict]:
+    """
+    Load the build manifest if it still describes the compiled book on disk.
+    
+    Returns:
+        The manifest, or None if there is no usable previous build
+    """
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        stat = os.stat(book_filename)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    
+    if (manifest.get("version") != BUILD_MANIFEST_VERSION
+            or manifest.get("output_size") != stat.st_size
+            or manifest.get("output_mtime_ns") != stat.st_mtime_ns):
+        logger.info("Build manifest is stale, recompiling the whole book")
+        return None
+    return manifest
+
+
+def _copy_range(source, destination, offset: int, length: int) -> None:
+    """Copy length bytes starting at offset from one binary file to another"""
+    source.seek(offset)
+    while length > 0:
+        block = source.read(min(COMPILE_CHUNK_SIZE, length))
+        if not block:
+            raise IOError("Previous compiled book is shorter than its build manifest")
+        destination.write(block)
+        length -= len(block)
+
+
+def compile_book(book_title: str, force: bool = False, rebuild: bool = False) -> Optional[str]:
     """
     Compile all written chapters into a complete book with cover and table of contents.
     
+    Only chapters that changed since the previous compilation are re-rendered.
+    
     Args:
         book_title: The title of the book to compile
         force: Whether to force compilation even if not all chapters are complete
+        rebuild: Whether to ignore the previous build and re-render every chapter
         
     Returns:
         The filename of the compiled book if successful, None otherwise
@@ -42,10 +243,6 @@ def compile_book(book_title: str, force: bool = False) -> Optional[str]:
         logger.error(f"Book '{book_title}' not found. Please create a book plan first with book_pipeline().")
         return
     
-    book_plan = metadata["generation_info"]["book_plan"]
-    cover_description = metadata["generation_info"]["cover_description"]
-    toc = metadata["generation_info"]["toc"]
-    
     completed = sum(1 for chapter in metadata["chapters"] if chapter["status"] == "published")
     total = len(metadata["chapters"])
     
@@ -55,66 +252,193 @@ def compile_book(book_title: str, force: bool = False) -> Optional[str]:
         logger.info(f"Or force compilation with incomplete chapters by using: compile_book('{book_title}', force=True)")
         return
     
-    # Compile chapters
-    chapters = []
-    for chapter in metadata["chapters"]:
-        if chapter["status"] == "published" and chapter["filename"]:
-            with open(chapter["filename"], "r", encoding="utf-8") as f:
-                # Skip the title line (first line) since we'll add it in the book compilation
-                content = f.read()
-                header_end = content.find('\n\n')
-                if header_end > -1:
-                    chapter_content = content[header_end + 2:]
-                else:
-                    chapter_content = content
-                chapters.append(chapter_content)
-        else:
-            # For incomplete chapters, add a placeholder if force=True
-            if force:
-                chapters.append("*[This chapter is not yet written]*")
-            
-    # Compile book content
+    # Stream the book to a temp file next to the output, then atomically swap it in.
+    # Chapters whose source and metadata are unchanged since the last build are
+    # spliced from the previous output instead of being re-rendered.
     book_filename = book_metadata.book_dir / f"{book_metadata.safe_title}.md"
-    book_content = f"# {metadata['book_info']['title']}\n\n"
-    book_content += f"*{metadata['book_info']['description']}*\n\n"
-    book_content += f"**Topic:** {metadata['book_info']['topic']}\n\n"
-    book_content += f"**Created:** {metadata['book_info']['creation_date']}\n"
-    book_content += f"**Last Updated:** {metadata['book_info']['last_updated']}\n"
-    book_content += f"**Word Count:** {metadata['book_info']['estimated_word_count']}\n"
-    book_content += f"**Page Count:** {metadata['book_info']['estimated_page_count']}\n\n"
-    book_content += "---\n\n"
-    book_content += toc
-    book_content += "\n\n---\n\n"
+    manifest_file = book_metadata.chapters_dir / "build_manifest.json"
+    previous = None if rebuild else _load_build_manifest(manifest_file, book_filename)
+    previous_chapters = {entry["chapter_number"]: entry for entry in previous["chapters"]} if previous else {}
     
-    # Add cover description
-    book_content += "## Cover Design Description\n\n"
-    book_content += f"{cover_description}\n\n"
-    book_content += "---\n\n"
-    
-    # Add each chapter
-    for i, chapter_content in enumerate(chapters):
-        if i < len(metadata["chapters"]):
-            chapter = metadata["chapters"][i]
-            book_content += f"## Chapter {chapter['chapter_number']}: {chapter['chapter_title']}\n\n"
-            book_content += f"{chapter_content}\n\n"
-            book_content += "---\n\n"
-    
-    # Write to file
-    with open(book_filename, "w", encoding="utf-8") as f:
-        f.write(book_content)
+    manifest_chapters = []
+    reused = 0
+    temp_file = tempfile.NamedTemporaryFile(
+        "wb", dir=book_metadata.book_dir,
+        prefix=f".{book_metadata.safe_title}.", suffix=".tmp", delete=False
+    )
+    try:
+        with temp_file as f, (open(book_filename, "rb") if previous else nullcontext()) as old_output:
+            for fragment in _iter_front_matter(metadata):
+                f.write(fragment.encode("utf-8"))
+            
+            for chapter in metadata["chapters"]:
+                render_key = _chapter_render_key(chapter, force)
+                source = _chapter_source_signature(chapter)
+                entry = previous_chapters.get(chapter["chapter_number"])
+                offset = f.tell()
+                
+                if (entry is not None and entry["render_key"] == render_key
+                        and _source_unchanged(entry["source"], source, chapter["filename"])):
+                    _copy_range(old_output, f, entry["offset"], entry["length"])
+                    reused += 1
+                else:
+                    for fragment in _iter_chapter_fragment(chapter, force):
+                        f.write(fragment.encode("utf-8"))
+                    if source is not None:
+                        source["sha256"] = _file_sha256(chapter["filename"])
+                
+                manifest_chapters.append({
+                    "chapter_number": chapter["chapter_number"],
+                    "render_key": render_key,
+                    "source": source,
+                    "offset": offset,
+                    "length": f.tell() - offset
+                })
+        os.replace(temp_file.name, book_filename)
+    except BaseException:
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+        raise
+    
+    stat = os.stat(book_filename)
+    _write_json_atomic(manifest_file, {
+        "version": BUILD_MANIFEST_VERSION,
+        "output_size": stat.st_size,
+        "output_mtime_ns": stat.st_mtime_ns,
+        "chapters": manifest_chapters
+    })
+    logger.info(f"Compiled {len(manifest_chapters)} chapters ({reused} reused from the previous build)")
+    emit(book_title, "compiled", filename=str(book_filename), size=stat.st_size, reused_chapters=reused)
     
     logger.info(f"Book successfully compiled and published as '{book_filename}'")
     logger.info(f"Individual chapters are available in '{book_metadata.chapters_dir}'")
     
-    # Generate a JSON export of all metadata
+    # Generate a JSON export of all metadata (skipped if the metadata is unchanged since the last export)
     export_filename = book_metadata.book_dir / f"{book_metadata.safe_title}_metadata_export.json"
-    with open(export_filename, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    
-    logger.info(f"Complete book metadata exported to '{export_filename}'")
+    if (not export_filename.exists()
+            or export_filename.stat().st_mtime_ns < book_metadata.metadata_file.stat().st_mtime_ns):
+        _write_json_atomic(export_filename, metadata)
+        logger.info(f"Complete book metadata exported to '{export_filename}'")
     
     return str(book_filename)
 
+
+def _book_needs_compile(book_dir: Path, chapters_dir: Path, metadata: dict) -> bool:
+    """
+    Check whether a book's compiled output is older than any of its inputs.
+    
+    Args:
+        book_dir: The books directory
+        chapters_dir: The book's own directory
+        metadata: The book's metadata
+        
+    Returns:
+        True if the book should be (re)compiled
+    """
+    book_filename = book_dir / f"{chapters_dir.name}.md"
+    try:
+        output_mtime = book_filename.stat().st_mtime_ns
+    except FileNotFoundError:
+        return True
+    
+    inputs = [chapters_dir / "book_metadata.json"]
+    inputs += [Path(chapter["filename"]) for chapter in metadata["chapters"] if chapter.get("filename")]
+    for path in inputs:
+        try:
+            if path.stat().st_mtime_ns > output_mtime:
+                return True
+        except FileNotFoundError:
+            return True
+    return False
+
+
+def _compile_book_worker(book_title: str, force: bool, rebuild: bool) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Compile one book in a worker process, isolating any failure.
+    
+    Returns:
+        Tuple of (book title, compiled filename or None, error message or None)
+    """
+    try:
+        filename = compile_book(book_title, force=force, rebuild=rebuild)
+        if filename is None:
+            return book_title, None, "Book could not be compiled (not found or incomplete)"
+        return book_title, filename, None
+    except Exception as e:
+        return book_title, None, f"{type(e).__name__}: {e}"
+
+
+def compile_all_books(force: bool = False, rebuild: bool = False, max_workers: Optional[int] = None) -> str:
+    """
+    Compile every book in the library in parallel, skipping books whose output is up to date.
+    
+    Args:
+        force: Whether to compile books that still have unwritten chapters
+        rebuild: Whether to recompile every book from scratch (e.g. after a template change)
+        max_workers: Number of worker processes (default: number of CPU cores)
+        
+    Returns:
+        JSON string with the compiled, skipped (up to date), incomplete and failed books
+    """
+    book_dir = Path("books")
+    summary = {"compiled": {}, "skipped": [], "incomplete": [], "failed": {}}
+    
+    if not book_dir.exists():
+        logger.info("No books found yet. Create one with book_pipeline()")
+        return json.dumps(summary)
+    
+    pending = []
+    for item in sorted(book_dir.iterdir()):
+        metadata_file = item / "book_metadata.json"
+        if not item.is_dir() or not metadata_file.exists():
+            continue
+        try:
+            with open(metadata_file, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            book_title = metadata["book_info"]["title"]
+        except Exception as e:
+            logger.error(f"Error reading metadata for {item.name}: {e}")
+            summary["failed"][item.name] = str(e)
+            continue
+        
+        if not force and any(chapter["status"] != "published" for chapter in metadata["chapters"]):
+            summary["incomplete"].append(book_title)
+        elif not rebuild and not _book_needs_compile(book_dir, item, metadata):
+            summary["skipped"].append(book_title)
+        else:
+            pending.append(book_title)
+    
+    logger.info(
+        f"Compiling {len(pending)} books ({len(summary['skipped'])} already up to date, "
+        f"{len(summary['incomplete'])} with unwritten chapters)"
+    )
+    
+    if pending:
+        # Spawn rather than fork: the outbox and render threads may already be running
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_compile_book_worker, title, force, rebuild) for title in pending]
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    book_title, filename, error = future.result()
+                except Exception as e:
+                    # The worker process itself died; we can't tell which book it was on
+                    logger.error(f"[{done}/{len(pending)}] Compile worker failed: {e}")
+                    summary["failed"][f"worker-{done}"] = str(e)
+                    continue
+                
+                if error:
+                    logger.error(f"[{done}/{len(pending)}] Failed to compile '{book_title}': {error}")
+                    summary["failed"][book_title] = error
+                else:
+                    logger.info(f"[{done}/{len(pending)}] Compiled '{book_title}'")
+                    summary["compiled"][book_title] = filename
+    
+    logger.info(
+        f"Library compile finished: {len(summary['compiled'])} compiled, "
+        f"{len(summary['skipped'])} skipped, {len(summary['failed'])} failed"
+    )
+    return json.dumps(summary)
+
 def get_book_status(book_title: Optional[str] = None) -> None:
     """
     Get the status of a book or list all available books with their progress.
@@ -4,6 +4,7 @@ from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 from google.adk.tools.agent_tool import AgentTool
 from . import tools
+from . import async_tools
 #from ...agent import root_agent               
 
 # Create the thinker agent
@@ -27,9 +28,12 @@ thinker_agent = Agent(
         tools.book_planner_agent,
         tools.table_of_contents_generator,
         tools.book_cover_description_agent,
-        tools.store_book_metadata_to_mongodb,
-        tools.load_book_metadata_from_mongodb,
+        async_tools.store_book_metadata_to_mongodb_async,
+        async_tools.load_book_metadata_from_mongodb_async,
         tools.sync_all_books_to_mongodb,
-        tools.get_all_books_from_mongodb,
+        async_tools.get_all_books_from_mongodb_async,
+        async_tools.query_books_from_mongodb_async,
+        tools.get_mongodb_sync_status,
+        tools.flush_mongodb_sync_queue,
     ],
 )
@@ -0,0 +1,254 @@
+"""Async MongoDB tools for book metadata.
+
+These mirror the synchronous Mongo tools in ``tools.py`` on top of PyMongo's
+native asyncio driver (``AsyncMongoClient``), so metadata I/O awaits instead of
+blocking the event loop when the agents run under the ADK async runner.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .tools import (
+    BOOK_SORT_FIELDS,
+    BOOK_SUMMARY_PROJECTION,
+    BOOK_SYNC_STATE_PROJECTION,
+    COLLECTION_NAME,
+    DB_NAME,
+    EMPTY_BOOK_PAGE,
+    MONGODB_CONNECTION_STRING,
+    MONGODB_DEFAULT_PAGE_SIZE,
+    MONGODB_HEALTH_CHECK_INTERVAL,
+    MONGODB_MAX_PAGE_SIZE,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    _book_index_specs,
+    _build_book_page,
+    _build_book_query,
+    _build_sync_operation,
+    create_safe_title,
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# AsyncMongoClient is bound to the event loop it is first used on, so each
+# running loop gets its own shared client
+_async_clients: Dict[asyncio.AbstractEventLoop, AsyncMongoClient] = {}
+_async_last_health_checks: Dict[asyncio.AbstractEventLoop, float] = {}
+_async_indexes_ready = False
+
+
+async def _close_clients_of_closed_loops() -> None:
+    """Close the clients left behind by event loops that have since closed"""
+    for loop in [loop for loop in list(_async_clients) if loop.is_closed()]:
+        client = _async_clients.pop(loop, None)
+        _async_last_health_checks.pop(loop, None)
+        if client is None:
+            continue
+        try:
+            await client.close()
+            logger.info("Closed the async MongoDB client of a closed event loop")
+        except Exception as e:
+            logger.warning(f"Error closing a stale async MongoDB client: {e}")
+
+
+async def _get_async_mongodb_collection():
+    """
+    Get the book metadata collection from the running loop's shared async MongoDB client.
+
+    Returns:
+        AsyncCollection object or None if connection fails
+    """
+    loop = asyncio.get_running_loop()
+    await _close_clients_of_closed_loops()
+    try:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncMongoClient(
+                MONGODB_CONNECTION_STRING,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            )
+            _async_clients[loop] = client
+            _async_last_health_checks[loop] = 0.0
+            logger.info(f"Created async MongoDB client (pool size {MONGODB_MAX_POOL_SIZE})")
+
+        now = time.monotonic()
+        if now - _async_last_health_checks[loop] >= MONGODB_HEALTH_CHECK_INTERVAL:
+            await client.admin.command('ping')
+            _async_last_health_checks[loop] = now
+
+        return client[DB_NAME][COLLECTION_NAME]
+    except PyMongoError as e:
+        logger.error(f"Failed to connect to MongoDB: {e}")
+    except Exception as e:
+        logger.error(f"MongoDB connection error: {e}")
+
+    await close_async_mongodb_client()
+    return None
+
+
+async def close_async_mongodb_client() -> None:
+    """Close the running loop's shared async MongoDB client and release its connection pool."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    _async_last_health_checks.pop(loop, None)
+    if client is not None:
+        await client.close()
+        logger.info("Async MongoDB client closed")
+
+
+async def store_book_metadata_to_mongodb_async(book_title: str) -> bool:
+    """
+    Store or update book metadata in MongoDB without blocking the event loop.
+
+    Only the parts of the metadata that changed since the last sync are written.
+
+    Args:
+        book_title: The title of the book to store metadata for
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        collection = await _get_async_mongodb_collection()
+        if collection is None:
+            logger.error("Cannot connect to MongoDB")
+            return False
+
+        safe_title = create_safe_title(book_title)
+        metadata_file = Path("books") / safe_title / "book_metadata.json"
+
+        try:
+            raw = await asyncio.to_thread(metadata_file.read_bytes)
+        except FileNotFoundError:
+            logger.error(f"No metadata found for book '{book_title}'")
+            return False
+
+        existing = await collection.find_one(
+            {"_id": safe_title},
+            BOOK_SYNC_STATE_PROJECTION
+        )
+        stored_title, operation = _build_sync_operation(safe_title, raw, existing)
+
+        if operation is None:
+            logger.info(f"Book metadata for '{stored_title}' already up to date in MongoDB")
+            return True
+
+        await collection.bulk_write([operation], ordered=False)
+        logger.info(f"Book metadata for '{stored_title}' synced to MongoDB")
+        return True
+
+    except BulkWriteError as e:
+        logger.error(f"Error storing book metadata to MongoDB: {e.details.get('writeErrors')}")
+        return False
+    except Exception as e:
+        logger.error(f"Error storing book metadata to MongoDB: {e}")
+        return False
+
+
+async def load_book_metadata_from_mongodb_async(book_title: str) -> str:
+    """
+    Load book metadata from MongoDB without blocking the event loop.
+
+    Args:
+        book_title: The title of the book to load metadata for
+
+    Returns:
+        JSON string of the book metadata, or "{}" if not found
+    """
+    try:
+        collection = await _get_async_mongodb_collection()
+        if collection is None:
+            logger.error("Cannot connect to MongoDB")
+            return "{}"
+
+        document = await collection.find_one({"_id": create_safe_title(book_title)}, {"metadata": 1})
+
+        if document:
+            logger.info(f"Book metadata for '{book_title}' loaded from MongoDB")
+            return json.dumps(document["metadata"])
+        else:
+            logger.warning(f"No metadata found in MongoDB for book '{book_title}'")
+            return "{}"
+
+    except Exception as e:
+        logger.error(f"Error loading book metadata from MongoDB: {e}")
+        return "{}"
+
+
+async def query_books_from_mongodb_async(
+    status: Optional[str] = None,
+    topic: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    sort_by: str = "last_synced",
+    descending: bool = True,
+    limit: int = MONGODB_DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> str:
+    """
+    Query one page of book summaries from MongoDB with server-side filtering and sorting.
+
+    Args:
+        status: Only return books with this status (planning, in-progress, complete)
+        topic: Only return books whose topic starts with this text (case-insensitive)
+        created_after: Only return books created on or after this date (YYYY-MM-DD)
+        created_before: Only return books created on or before this date (YYYY-MM-DD)
+        sort_by: Field to sort on: last_synced, last_updated, creation_date or title (default: last_synced)
+        descending: Sort newest/highest first (default: True)
+        limit: Maximum number of books to return, up to 100 (default: 20)
+        cursor: The next_cursor value from a previous page to continue from
+
+    Returns:
+        JSON string with "books" (compact summaries), "count" and "next_cursor" (null on the last page)
+    """
+    global _async_indexes_ready
+
+    if sort_by not in BOOK_SORT_FIELDS:
+        logger.error(f"Unsupported sort field '{sort_by}'. Use one of: {', '.join(BOOK_SORT_FIELDS)}")
+        return EMPTY_BOOK_PAGE
+
+    try:
+        collection = await _get_async_mongodb_collection()
+        if collection is None:
+            logger.error("Cannot connect to MongoDB")
+            return EMPTY_BOOK_PAGE
+
+        if not _async_indexes_ready:
+            for keys in _book_index_specs():
+                await collection.create_index(keys)
+            _async_indexes_ready = True
+
+        limit = max(1, min(int(limit), MONGODB_MAX_PAGE_SIZE))
+        query, sort = _build_book_query(status, topic, created_after, created_before, sort_by, descending, cursor)
+        documents = await collection.find(query, BOOK_SUMMARY_PROJECTION).sort(sort).limit(limit + 1).to_list()
+
+        return _build_book_page(documents, limit, sort_by)
+
+    except Exception as e:
+        logger.error(f"Error querying books from MongoDB: {e}")
+        return EMPTY_BOOK_PAGE
+
+
+async def get_all_books_from_mongodb_async(limit: int = MONGODB_DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> str:
+    """
+    Retrieve book summaries from MongoDB one page at a time, most recently synced first.
+
+    Use query_books_from_mongodb_async to filter by status, topic or creation date.
+
+    Args:
+        limit: Maximum number of books to return, up to 100 (default: 20)
+        cursor: The next_cursor value from a previous page to continue from
+
+    Returns:
+        JSON string with "books" (compact summaries), "count" and "next_cursor" (null on the last page)
+    """
+    return await query_books_from_mongodb_async(limit=limit, cursor=cursor)
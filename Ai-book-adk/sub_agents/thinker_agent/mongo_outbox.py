@@ -0,0 +1,230 @@
+"""Durable write-behind outbox for syncing book metadata to MongoDB.
+
+Metadata writes enqueue a sync event into a local SQLite outbox instead of
+talking to MongoDB directly. A background worker drains the outbox in batches
+and retries with exponential backoff, so the agent never waits on the database
+and no update is lost while MongoDB is unavailable.
+
+A batch that fails as a whole (MongoDB unreachable) is retried indefinitely. A
+book whose own sync keeps failing is marked dead after max_attempts and left
+out of later drains until its metadata is written again, and a book whose
+metadata file no longer exists is dropped from the outbox.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class MongoSyncOutbox:
+    """SQLite-backed outbox of pending book metadata syncs with a background drain worker"""
+
+    def __init__(self, db_path, sync_fn: Callable[[List[Tuple[str, Path]]], Dict[str, bool]],
+                 batch_size: int = 100, retry_base: float = 2.0, retry_max: float = 300.0,
+                 poll_interval: float = 1.0, max_attempts: int = 20):
+        """
+        Args:
+            db_path: Path of the SQLite outbox file
+            sync_fn: Callable taking a list of (safe title, metadata file) pairs and
+                     returning a dictionary of safe title to success status
+            batch_size: Maximum number of books handed to sync_fn at once
+            retry_base: Base delay in seconds for exponential retry backoff
+            retry_max: Maximum retry delay in seconds
+            poll_interval: Seconds the worker sleeps when there is nothing due
+            max_attempts: Failed syncs of one book before it is marked dead
+        """
+        self.db_path = Path(db_path)
+        self.sync_fn = sync_fn
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    safe_title TEXT PRIMARY KEY,
+                    metadata_file TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    dead INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Outboxes created before dead rows were tracked
+            if "dead" not in [row[1] for row in conn.execute("PRAGMA table_info(outbox)")]:
+                conn.execute("ALTER TABLE outbox ADD COLUMN dead INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def enqueue(self, safe_title: str, metadata_file) -> None:
+        """
+        Record that a book's metadata changed and needs syncing.
+
+        Repeated events for the same book collapse into one pending row.
+
+        Args:
+            safe_title: The book's safe title (Mongo document id)
+            metadata_file: Path of the book's metadata JSON file
+        """
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO outbox (safe_title, metadata_file, next_attempt_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(safe_title) DO UPDATE SET
+                    metadata_file = excluded.metadata_file,
+                    version = version + 1,
+                    attempts = 0,
+                    dead = 0,
+                    next_attempt_at = excluded.next_attempt_at
+            """, (safe_title, str(Path(metadata_file).resolve()), time.time()))
+
+        self.start()
+        self._wakeup.set()
+
+    def pending_count(self) -> int:
+        """Number of books waiting to be synced (dead rows excluded)"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 0").fetchone()[0]
+
+    def status(self) -> Dict[str, object]:
+        """Summary of the outbox for status reporting"""
+        with self._connect() as conn:
+            pending, retrying, dead = conn.execute(
+                "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 0 AND attempts > 0), 0), "
+                "COALESCE(SUM(dead), 0) FROM outbox"
+            ).fetchone()
+            last_error = conn.execute(
+                "SELECT last_error FROM outbox WHERE last_error IS NOT NULL ORDER BY next_attempt_at DESC LIMIT 1"
+            ).fetchone()
+
+        return {
+            "pending": pending,
+            "retrying": retrying,
+            "dead": dead,
+            "last_error": last_error[0] if last_error else None,
+            "worker_running": self._worker is not None and self._worker.is_alive()
+        }
+
+    def drain_once(self) -> int:
+        """
+        Sync one batch of due books.
+
+        Returns:
+            Number of books taken from the outbox in this batch
+        """
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT safe_title, metadata_file, version, attempts FROM outbox "
+                "WHERE dead = 0 AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, self.batch_size)
+            ).fetchall()
+
+            if not rows:
+                return 0
+
+            # A deleted book has nothing left to sync
+            missing = [row for row in rows if not Path(row[1]).exists()]
+            for safe_title, metadata_file, version, _ in missing:
+                logger.warning(f"MongoDB outbox: dropping '{safe_title}', '{metadata_file}' no longer exists")
+                conn.execute("DELETE FROM outbox WHERE safe_title = ? AND version = ?", (safe_title, version))
+        rows = [row for row in rows if row not in missing]
+
+        if not rows:
+            return len(missing)
+
+        try:
+            results = self.sync_fn([(safe_title, Path(metadata_file)) for safe_title, metadata_file, _, _ in rows])
+            error = None
+        except Exception as e:
+            results = {}
+            error = str(e)
+
+        with self._connect() as conn:
+            for safe_title, _, version, attempts in rows:
+                if results.get(safe_title):
+                    # Only remove the event if no newer write was enqueued while syncing
+                    conn.execute("DELETE FROM outbox WHERE safe_title = ? AND version = ?", (safe_title, version))
+                elif error is None and attempts + 1 >= self.max_attempts:
+                    # Only this book failed, on every attempt: stop retrying until it is written again
+                    logger.error(f"MongoDB outbox: giving up on '{safe_title}' after {attempts + 1} failed syncs")
+                    conn.execute(
+                        "UPDATE outbox SET attempts = attempts + 1, dead = 1, last_error = ? "
+                        "WHERE safe_title = ? AND version = ?",
+                        ("sync failed", safe_title, version)
+                    )
+                else:
+                    delay = min(self.retry_max, self.retry_base * (2 ** attempts))
+                    conn.execute(
+                        "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? "
+                        "WHERE safe_title = ? AND version = ?",
+                        (time.time() + delay, error or "sync failed", safe_title, version)
+                    )
+
+        synced = sum(1 for safe_title, _, _, _ in rows if results.get(safe_title))
+        if synced < len(rows):
+            logger.warning(f"MongoDB outbox: {len(rows) - synced}/{len(rows)} syncs failed, will retry")
+        else:
+            logger.info(f"MongoDB outbox: synced {synced} books")
+        return len(rows) + len(missing)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                logger.error(f"MongoDB outbox worker error: {e}")
+                processed = 0
+
+            if processed == 0:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        """Start the background drain worker if it is not already running"""
+        with self._worker_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="mongo-sync-outbox", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the background worker. Pending events stay in the outbox."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """
+        Wait until everything currently due has been synced.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the outbox is empty, False otherwise
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.drain_once() == 0:
+                break
+        return self.pending_count() == 0
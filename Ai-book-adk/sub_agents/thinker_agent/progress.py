@@ -0,0 +1,108 @@
+"""In-process progress bus for book production events.
+
+The pipeline steps (planning, writing, editing, illustrating, compiling) call
+``emit`` from whatever thread they run in. Subscribers - typically the
+Server-Sent Events streams of the HTTP service - receive the events for one
+book on their own asyncio queue without polling. Every book keeps a short
+history so a client reconnecting with ``Last-Event-ID`` can catch up on what
+it missed.
+"""
+
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .tools import create_safe_title
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Number of recent events kept per book for reconnecting clients
+PROGRESS_HISTORY_SIZE = int(os.getenv('PROGRESS_HISTORY_SIZE', '200'))
+# Events buffered per subscriber before the slowest ones are dropped
+PROGRESS_SUBSCRIBER_BUFFER = int(os.getenv('PROGRESS_SUBSCRIBER_BUFFER', '100'))
+
+_event_ids = itertools.count(1)
+_lock = threading.Lock()
+_history: Dict[str, Deque[Dict[str, Any]]] = {}
+_subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+
+def _deliver(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    if queue.full():
+        # A stalled client loses its oldest event rather than holding up the pipeline
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+def emit(book_title: str, stage: str, **data: Any) -> Dict[str, Any]:
+    """
+    Publish a progress event for a book. Safe to call from any thread.
+
+    Args:
+        book_title: The title of the book
+        stage: Name of the stage, e.g. "chapter_started" or "compiled"
+        **data: Extra JSON-serializable details
+
+    Returns:
+        The published event
+    """
+    book_id = create_safe_title(book_title)
+    event = {
+        "id": next(_event_ids),
+        "book_id": book_id,
+        "stage": stage,
+        "timestamp": datetime.datetime.now().isoformat(),
+        **data,
+    }
+
+    with _lock:
+        _history.setdefault(book_id, deque(maxlen=PROGRESS_HISTORY_SIZE)).append(event)
+        subscribers = list(_subscribers.get(book_id, ()))
+
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(_deliver, queue, event)
+        except RuntimeError:
+            # The subscriber's event loop has closed
+            unsubscribe(book_id, queue)
+    return event
+
+
+def subscribe(book_id: str, last_event_id: Optional[int] = None) -> Tuple[asyncio.Queue, List[Dict[str, Any]]]:
+    """
+    Subscribe the running event loop to a book's events.
+
+    Args:
+        book_id: The book's safe title
+        last_event_id: Id of the last event the client saw, to replay the ones after it
+
+    Returns:
+        The queue receiving new events and the history events to send first
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=PROGRESS_SUBSCRIBER_BUFFER)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        _subscribers.setdefault(book_id, set()).add((loop, queue))
+        history = list(_history.get(book_id, ()))
+
+    if last_event_id is not None:
+        history = [event for event in history if event["id"] > last_event_id]
+    return queue, history
+
+
+def unsubscribe(book_id: str, queue: asyncio.Queue) -> None:
+    """Stop delivering a book's events to a queue"""
+    with _lock:
+        subscribers = _subscribers.get(book_id)
+        if not subscribers:
+            return
+        for entry in [entry for entry in subscribers if entry[1] is queue]:
+            subscribers.discard(entry)
+        if not subscribers:
+            del _subscribers[book_id]
@@ -0,0 +1,427 @@
+"""Fair scheduling of model work across tenants.
+
+Every chapter draft and illustration render asks the scheduler for a slot
+before it calls the model. Slots are granted by start-time fair queuing: each
+request gets a virtual start tag of max(system virtual time, the tenant's
+previous finish tag) and a finish tag that advances by cost / weight, and the
+waiting request with the smallest start tag goes first. A tenant with a
+300-chapter book therefore runs ahead in virtual time, and a newly arriving
+tenant's small book is served next instead of waiting behind it.
+
+On top of that:
+- each tenant may hold at most SCHEDULER_TENANT_CONCURRENCY slots;
+- each tenant has an optional token bucket (SCHEDULER_TENANT_TOKENS_PER_MINUTE).
+  The buckets are kept in a SQLite file (SCHEDULER_QUOTA_PATH) that every
+  scheduler process sharing ``books/`` spends from, so the quota holds per
+  tenant however many worker processes run;
+- requests come in two lanes. Interactive requests (a user waiting on
+  ``write_next_chapter``) are served before bulk ones (job queues, workers,
+  prefetch, illustrations), and SCHEDULER_INTERACTIVE_RESERVED slots are never
+  given to bulk work, so interactive latency stays low under heavy load.
+
+The tenant of a book is ``book_info.tenant`` in its metadata, or the book
+itself when none is set, so books are scheduled fairly against each other by
+default. Callers mark bulk work with ``scheduling_lane("bulk")``. A slot is
+held for the whole block it is taken in, so model work nested inside it runs
+in the same slot instead of queueing a second time.
+"""
+
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .tools import BookMetadata
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Model calls running at the same time across all tenants
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv('SCHEDULER_MAX_CONCURRENCY', '4'))
+# Slots only interactive requests may use
+SCHEDULER_INTERACTIVE_RESERVED = int(os.getenv('SCHEDULER_INTERACTIVE_RESERVED', '1'))
+# Slots one tenant may hold at the same time
+SCHEDULER_TENANT_CONCURRENCY = int(os.getenv('SCHEDULER_TENANT_CONCURRENCY', '2'))
+# Estimated tokens a tenant may spend per minute (0 = unlimited)
+SCHEDULER_TENANT_TOKENS_PER_MINUTE = int(os.getenv('SCHEDULER_TENANT_TOKENS_PER_MINUTE', '0'))
+# Relative shares, e.g. "acme=3,free=1" (unlisted tenants weigh 1)
+SCHEDULER_TENANT_WEIGHTS = os.getenv('SCHEDULER_TENANT_WEIGHTS', '')
+# Token buckets shared by all scheduler processes ("" keeps a separate quota per process)
+SCHEDULER_QUOTA_PATH = os.getenv('SCHEDULER_QUOTA_PATH', os.path.join('books', '.scheduler_quota.sqlite3'))
+
+# Estimated tokens of one unit of work
+CHAPTER_TOKEN_COST = int(os.getenv('CHAPTER_TOKEN_COST', '8000'))
+ILLUSTRATION_TOKEN_COST = int(os.getenv('ILLUSTRATION_TOKEN_COST', '1500'))
+
+LANES = ("interactive", "bulk")
+
+_lane: contextvars.ContextVar = contextvars.ContextVar("scheduling_lane", default="interactive")
+_held: contextvars.ContextVar = contextvars.ContextVar("scheduler_slot", default=None)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for item in spec.split(","):
+        if "=" in item:
+            tenant, weight = item.split("=", 1)
+            weights[tenant.strip()] = max(0.01, float(weight))
+    return weights
+
+
+@contextlib.contextmanager
+def scheduling_lane(lane: str) -> Iterator[None]:
+    """Schedule the model work started in this block (and its threads) in the given lane"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown scheduling lane '{lane}'")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    """The lane model work started now is scheduled in"""
+    return _lane.get()
+
+
+def book_tenant(book_title: str) -> str:
+    """The tenant a book is scheduled under: its book_info.tenant, or the book itself"""
+    book_metadata = BookMetadata("books", book_title)
+    metadata = book_metadata.load()
+    tenant = metadata["book_info"].get("tenant") if metadata else None
+    return tenant or book_metadata.safe_title
+
+
+class _TokenBucket:
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, cost: int, now: float) -> float:
+        """Seconds until the cost can be spent (work larger than the bucket waits for a full bucket)"""
+        self._refill(now)
+        needed = min(cost, self.capacity) - self.tokens
+        return max(0.0, needed * 60 / self.capacity)
+
+    def spend(self, cost: int, now: float) -> None:
+        self._refill(now)
+        # May go negative: oversized work is paid back before the tenant runs again
+        self.tokens -= cost
+
+
+class SlotAbandoned(Exception):
+    """Raised when the caller gave up waiting for a slot"""
+
+
+class _SharedTokenBucket:
+    """
+    A tenant's token bucket kept in SQLite, so every process spends from the same quota.
+    
+    Uses wall-clock time, since monotonic clocks are not comparable between processes.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, tenant: str, tokens_per_minute: int):
+        self.conn = conn
+        self.tenant = tenant
+        self.capacity = float(tokens_per_minute)
+
+    def _tokens(self, now: float) -> float:
+        row = self.conn.execute(
+            "SELECT tokens, updated FROM token_buckets WHERE tenant = ?", (self.tenant,)
+        ).fetchone()
+        if row is None:
+            return self.capacity
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.capacity / 60)
+
+    def wait_time(self, cost: int, now: float) -> float:
+        """Seconds until the cost can be spent (see _TokenBucket.wait_time)"""
+        needed = min(cost, self.capacity) - self._tokens(time.time())
+        return max(0.0, needed * 60 / self.capacity)
+
+    def spend(self, cost: int, now: float) -> None:
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT INTO token_buckets (tenant, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (tenant) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (self.tenant, self._tokens(now) - cost, now)
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+
+@dataclass
+class SchedulerTicket:
+    """A request for a slot; granted once the scheduler picks it"""
+    tenant: str
+    lane: str
+    cost: int
+    start_tag: float
+    finish_tag: float
+    sequence: int
+    enqueued_at: float
+    granted: bool = False
+
+
+class FairScheduler:
+    """Weighted fair queuing of model work with tenant caps, token quotas and priority lanes"""
+
+    def __init__(self, max_concurrency: int = SCHEDULER_MAX_CONCURRENCY,
+                 interactive_reserved: int = SCHEDULER_INTERACTIVE_RESERVED,
+                 tenant_concurrency: int = SCHEDULER_TENANT_CONCURRENCY,
+                 tokens_per_minute: int = SCHEDULER_TENANT_TOKENS_PER_MINUTE,
+                 weights: Optional[Dict[str, float]] = None,
+                 quota_path: Optional[str] = SCHEDULER_QUOTA_PATH):
+        """
+        Args:
+            max_concurrency: Slots across all tenants
+            interactive_reserved: Slots bulk work may never take
+            tenant_concurrency: Slots one tenant may hold
+            tokens_per_minute: Token quota per tenant (0 = unlimited)
+            weights: Relative share per tenant (default: 1 each)
+            quota_path: SQLite file the token buckets are shared through (None or "" = this process only)
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.interactive_reserved = min(max(0, interactive_reserved), self.max_concurrency - 1)
+        self.tenant_concurrency = max(1, tenant_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.weights = weights if weights is not None else _parse_weights(SCHEDULER_TENANT_WEIGHTS)
+
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._waiting: List[SchedulerTicket] = []
+        self._running: Counter = Counter()
+        self._running_by_lane: Counter = Counter()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._buckets: Dict[str, object] = {}
+        self._quota_conn = None
+        if tokens_per_minute > 0 and quota_path:
+            Path(quota_path).parent.mkdir(parents=True, exist_ok=True)
+            # Only used under self._condition, so one connection serves every thread
+            self._quota_conn = sqlite3.connect(quota_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._quota_conn.execute("PRAGMA journal_mode=WAL")
+            self._quota_conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets (tenant TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        self.quota_path = quota_path if self._quota_conn is not None else None
+        self._granted: Counter = Counter()
+        self._wait_seconds: Counter = Counter()
+
+    def _bucket(self, tenant: str):
+        if self.tokens_per_minute <= 0:
+            return None
+        if tenant not in self._buckets:
+            if self._quota_conn is not None:
+                self._buckets[tenant] = _SharedTokenBucket(self._quota_conn, tenant, self.tokens_per_minute)
+            else:
+                self._buckets[tenant] = _TokenBucket(self.tokens_per_minute)
+        return self._buckets[tenant]
+
+    def _quota_wait(self, ticket: SchedulerTicket, now: float) -> float:
+        bucket = self._bucket(ticket.tenant)
+        return bucket.wait_time(ticket.cost, now) if bucket else 0.0
+
+    def _eligible(self, ticket: SchedulerTicket, now: float) -> bool:
+        running = sum(self._running_by_lane.values())
+        if running >= self.max_concurrency:
+            return False
+        if ticket.lane == "bulk" and self._running_by_lane["bulk"] >= self.max_concurrency - self.interactive_reserved:
+            return False
+        if self._running[ticket.tenant] >= self.tenant_concurrency:
+            return False
+        return self._quota_wait(ticket, now) == 0.0
+
+    def _dispatch(self, now: float) -> None:
+        """Grant slots to waiting tickets while any can run: interactive first, then by start tag"""
+        granted_any = False
+        while True:
+            candidates = [ticket for ticket in self._waiting if self._eligible(ticket, now)]
+            if not candidates:
+                break
+            ticket = min(candidates, key=lambda t: (t.lane != "interactive", t.start_tag, t.sequence))
+            self._waiting.remove(ticket)
+            ticket.granted = True
+            self._running[ticket.tenant] += 1
+            self._running_by_lane[ticket.lane] += 1
+            self._virtual_time = max(self._virtual_time, ticket.start_tag)
+            bucket = self._bucket(ticket.tenant)
+            if bucket:
+                bucket.spend(ticket.cost, now)
+            self._granted[ticket.lane] += 1
+            self._wait_seconds[ticket.lane] += now - ticket.enqueued_at
+            granted_any = True
+        if granted_any:
+            self._condition.notify_all()
+
+    def acquire(self, tenant: str, lane: Optional[str] = None, cost: int = CHAPTER_TOKEN_COST,
+                timeout: Optional[float] = None, abandon: Optional[threading.Event] = None) -> SchedulerTicket:
+        """
+        Wait for a slot.
+
+        Args:
+            tenant: Tenant the work is for
+            lane: "interactive" or "bulk" (default: the current scheduling lane)
+            cost: Estimated tokens of the work
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            abandon: Event that withdraws the request when set before a slot is granted
+
+        Returns:
+            The granted ticket, to be passed to release()
+
+        Raises:
+            TimeoutError: If no slot was granted within the timeout
+            SlotAbandoned: If the abandon event was set before a slot was granted
+        """
+        lane = lane or current_lane()
+        if lane not in LANES:
+            raise ValueError(f"Unknown scheduling lane '{lane}'")
+
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        with self._condition:
+            start_tag = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+            finish_tag = start_tag + cost / self.weights.get(tenant, 1.0)
+            self._last_finish[tenant] = finish_tag
+            ticket = SchedulerTicket(tenant, lane, cost, start_tag, finish_tag, next(self._sequence), now)
+            self._waiting.append(ticket)
+
+            while True:
+                now = time.monotonic()
+                self._dispatch(now)
+                if ticket.granted:
+                    break
+                if abandon is not None and abandon.is_set():
+                    self._withdraw(ticket)
+                    raise SlotAbandoned(f"Request for a scheduler slot for tenant '{tenant}' was abandoned")
+
+                # Wake up for a refilled token bucket even if no slot is released
+                wait = None
+                if self._bucket(tenant):
+                    wait = self._quota_wait(ticket, now) or None
+                # The abandon event does not notify the condition, so look at it regularly
+                if abandon is not None:
+                    wait = 0.1 if wait is None else min(wait, 0.1)
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._withdraw(ticket)
+                        raise TimeoutError(f"No scheduler slot for tenant '{tenant}' within {timeout}s")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+
+        waited = time.monotonic() - ticket.enqueued_at
+        if waited >= 1:
+            logger.info(f"Scheduler: {lane} work for '{tenant}' waited {waited:.1f}s for a slot")
+        return ticket
+
+    def _withdraw(self, ticket: SchedulerTicket) -> None:
+        """Remove a waiting ticket without charging its tenant for service it never got"""
+        self._waiting.remove(ticket)
+        service = ticket.finish_tag - ticket.start_tag
+        # The tenant's later requests were tagged after this one; move them up
+        for later in self._waiting:
+            if later.tenant == ticket.tenant and later.sequence > ticket.sequence:
+                later.start_tag = max(self._virtual_time, later.start_tag - service)
+                later.finish_tag = later.start_tag + later.cost / self.weights.get(later.tenant, 1.0)
+        if self._last_finish.get(ticket.tenant) == ticket.finish_tag:
+            self._last_finish[ticket.tenant] = ticket.start_tag
+        else:
+            self._last_finish[ticket.tenant] = max(
+                self._virtual_time, self._last_finish[ticket.tenant] - service
+            )
+        self._dispatch(time.monotonic())
+
+    def release(self, ticket: SchedulerTicket) -> None:
+        """Return a granted slot"""
+        with self._condition:
+            self._running[ticket.tenant] -= 1
+            if self._running[ticket.tenant] <= 0:
+                del self._running[ticket.tenant]
+            self._running_by_lane[ticket.lane] -= 1
+            self._dispatch(time.monotonic())
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, tenant: str, lane: Optional[str] = None, cost: int = CHAPTER_TOKEN_COST,
+             timeout: Optional[float] = None,
+             abandon: Optional[threading.Event] = None) -> Iterator[SchedulerTicket]:
+        """Hold a slot for the duration of the block (see acquire); a block already holding one reuses it"""
+        held = _held.get()
+        if held is not None:
+            yield held
+            return
+
+        ticket = self.acquire(tenant, lane, cost, timeout, abandon)
+        token = _held.set(ticket)
+        try:
+            yield ticket
+        finally:
+            _held.reset(token)
+            self.release(ticket)
+
+    def status(self) -> Dict[str, object]:
+        """Running and waiting work per lane and tenant, and the mean wait per lane"""
+        with self._condition:
+            waiting: Counter = Counter(ticket.lane for ticket in self._waiting)
+            waiting_by_tenant: Counter = Counter(ticket.tenant for ticket in self._waiting)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "interactive_reserved": self.interactive_reserved,
+                "tenant_concurrency": self.tenant_concurrency,
+                "tokens_per_minute": self.tokens_per_minute,
+                "quota_path": self.quota_path,
+                "running": {lane: self._running_by_lane[lane] for lane in LANES},
+                "waiting": {lane: waiting[lane] for lane in LANES},
+                "running_by_tenant": dict(self._running),
+                "waiting_by_tenant": dict(waiting_by_tenant),
+                "mean_wait_seconds": {
+                    lane: round(self._wait_seconds[lane] / self._granted[lane], 2) if self._granted[lane] else 0.0
+                    for lane in LANES
+                },
+            }
+
+
+def get_scheduler() -> FairScheduler:
+    """Get the shared scheduler, creating it on first use"""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+            logger.info(
+                f"Started fair scheduler ({_scheduler.max_concurrency} slots, "
+                f"{_scheduler.interactive_reserved} reserved for interactive work)"
+            )
+        return _scheduler
+
+
+def get_scheduler_status() -> str:
+    """
+    Show how model work is currently shared between tenants and lanes.
+
+    Returns:
+        JSON string with the running and waiting work per lane and tenant and the mean wait per lane
+    """
+    return json.dumps(get_scheduler().status(), indent=2)
@@ -6,12 +6,24 @@ import datetime
 import logging
 from pathlib import Path
 import re
-from typing import Dict, Optional, Any
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, DuplicateKeyError
+import atexit
+import base64
+import hashlib
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from google import genai
 
+from .mongo_outbox import MongoSyncOutbox
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -23,6 +35,53 @@ client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
 MONGODB_CONNECTION_STRING = os.getenv('MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017/')
 DB_NAME = "BooksMeta"
 COLLECTION_NAME = "Books"
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '20'))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+# Seconds between health-check pings on the shared client
+MONGODB_HEALTH_CHECK_INTERVAL = float(os.getenv('MONGODB_HEALTH_CHECK_INTERVAL', '30'))
+# Number of books sent per bulk_write call when syncing
+MONGODB_SYNC_BATCH_SIZE = int(os.getenv('MONGODB_SYNC_BATCH_SIZE', '500'))
+# Metadata writes are queued in a local outbox and synced to MongoDB in the background
+MONGODB_OUTBOX_ENABLED = os.getenv('MONGODB_OUTBOX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+MONGODB_OUTBOX_PATH = os.getenv('MONGODB_OUTBOX_PATH', os.path.join('books', '.mongodb_outbox.sqlite3'))
+# Failed syncs of one book before the outbox stops retrying it (until it is written again)
+MONGODB_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MONGODB_OUTBOX_MAX_ATTEMPTS', '20'))
+# Page sizes for book queries
+MONGODB_DEFAULT_PAGE_SIZE = 20
+MONGODB_MAX_PAGE_SIZE = 100
+
+# Sortable fields exposed to the query tools, mapped to their document paths
+BOOK_SORT_FIELDS = {
+    "last_synced": "last_synced",
+    "last_updated": "metadata.book_info.last_updated",
+    "creation_date": "metadata.book_info.creation_date",
+    "title": "book_title",
+}
+
+# Compact per-book projection returned by the query tools
+BOOK_SUMMARY_PROJECTION = {
+    "book_title": 1,
+    "last_synced": 1,
+    "metadata.book_info.status": 1,
+    "metadata.book_info.topic": 1,
+    "metadata.book_info.creation_date": 1,
+    "metadata.book_info.last_updated": 1,
+    "metadata.book_info.total_chapters": 1,
+    "metadata.book_info.completed_chapters": 1,
+    "metadata.book_info.estimated_word_count": 1,
+}
+EMPTY_BOOK_PAGE = json.dumps({"books": [], "count": 0, "next_cursor": None})
+# Stored sync state read back before each sync to find unchanged books
+BOOK_SYNC_STATE_PROJECTION = {"book_title": 1, "content_hash": 1, "section_hashes": 1, "topic_key": 1}
+
+# Process-wide MongoDB client shared by all Mongo tools (created lazily)
+_mongo_client: Optional[MongoClient] = None
+_mongo_client_lock = threading.Lock()
+_mongo_last_health_check = 0.0
+
+_mongo_outbox: Optional[MongoSyncOutbox] = None
+_mongo_outbox_lock = threading.Lock()
+_mongo_indexes_ready = False
 
 
 def book_planner_agent(topic: str, num_chapters: int = 5) -> str:
@@ -155,6 +214,106 @@ def book_cover_description_agent(book_plan: str) -> str:
         logger.error(f"Error generating book cover description: {e}")
         return "A generic book cover with elegant typography and appealing imagery."
 
+class _MetadataLock:
+    """
+    Lock guarding the read-modify-write updates of one book's metadata file.
+    
+    Re-entrant within a thread. The outermost acquisition also holds an
+    exclusive lock on a lock file next to the metadata, so updates from other
+    worker processes, or other machines sharing ``books/`` over a filesystem
+    with POSIX locks, cannot overwrite each other.
+    """
+    
+    def __init__(self, lock_file: Path):
+        self.lock_file = lock_file
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+    
+    def _lock_file(self, handle, lock: bool) -> None:
+        if fcntl is not None:
+            fcntl.lockf(handle, fcntl.LOCK_EX if lock else fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if lock else msvcrt.LK_UNLCK, 1)
+    
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                handle = open(self.lock_file, "a+b")
+                try:
+                    self._lock_file(handle, True)
+                except BaseException:
+                    handle.close()
+                    raise
+                self._handle = handle
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+    
+    def __exit__(self, *exc_info):
+        try:
+            self._depth -= 1
+            if self._depth == 0:
+                handle, self._handle = self._handle, None
+                try:
+                    self._lock_file(handle, False)
+                finally:
+                    handle.close()
+        finally:
+            self._thread_lock.release()
+
+
+_metadata_locks: Dict[str, _MetadataLock] = {}
+_metadata_locks_guard = threading.Lock()
+
+
+def _metadata_lock(metadata_file: Path) -> _MetadataLock:
+    """Get the lock guarding updates to one book's metadata file"""
+    key = str(metadata_file.resolve())
+    with _metadata_locks_guard:
+        if key not in _metadata_locks:
+            _metadata_locks[key] = _MetadataLock(metadata_file.with_name(f".{metadata_file.name}.lock"))
+        return _metadata_locks[key]
+
+
+def create_safe_title(title: str) -> str:
+    """
+    Create the filesystem-safe title used for a book's directory and Mongo id.
+    
+    Args:
+        title: Original book title
+    
+    Returns:
+        Safe, shortened title for filesystem use
+    """
+    # Remove special characters and replace spaces
+    safe = re.sub(r'[^\w\s-]', '', title.lower())
+    safe = re.sub(r'[-\s]+', '_', safe)
+    
+    # Truncate to a reasonable length (50 characters max)
+    # This ensures the full path stays under Windows limits
+    if len(safe) > 50:
+        # Try to truncate at word boundary
+        words = safe.split('_')
+        truncated = ''
+        for word in words:
+            if len(truncated + '_' + word) <= 47:  # Leave room for 'book_about_'
+                if truncated:
+                    truncated += '_' + word
+                else:
+                    truncated = word
+            else:
+                break
+        safe = truncated if truncated else safe[:47]
+    
+    # Add prefix to make it descriptive
+    return f"book_{safe}"
+
+
 class BookMetadata:
     """Class to manage book metadata tracking"""
     
@@ -169,6 +328,9 @@ class BookMetadata:
         # Create directories if they don't exist
         self.book_dir.mkdir(exist_ok=True)
         self.chapters_dir.mkdir(exist_ok=True)
+        
+        # Serializes read-modify-write updates from background threads and other worker processes
+        self._lock = _metadata_lock(self.metadata_file)
     
     def _create_safe_title(self, title: str) -> str:
         """
@@ -180,28 +342,7 @@ class BookMetadata:
         Returns:
             Safe, shortened title for filesystem use
         """
-        # Remove special characters and replace spaces
-        safe = re.sub(r'[^\w\s-]', '', title.lower())
-        safe = re.sub(r'[-\s]+', '_', safe)
-        
-        # Truncate to a reasonable length (50 characters max)
-        # This ensures the full path stays under Windows limits
-        if len(safe) > 50:
-            # Try to truncate at word boundary
-            words = safe.split('_')
-            truncated = ''
-            for word in words:
-                if len(truncated + '_' + word) <= 47:  # Leave room for 'book_about_'
-                    if truncated:
-                        truncated += '_' + word
-                    else:
-                        truncated = word
-                else:
-                    break
-            safe = truncated if truncated else safe[:47]
-        
-        # Add prefix to make it descriptive
-        return f"book_{safe}"
+        return create_safe_title(title)
     
     def initialize(self, book_plan, cover_description, toc, topic):
         """Initialize a new book's metadata"""
@@ -243,11 +384,21 @@ class BookMetadata:
             })
         
         # Save metadata
-        with open(self.metadata_file, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2)
+        self._save(metadata)
         
         return metadata
     
+    def _save(self, metadata):
+        """Atomically write metadata to disk and queue it for background MongoDB sync"""
+        temp_file = self.metadata_file.with_name(
+            f".{self.metadata_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(temp_file, self.metadata_file)
+        
+        _enqueue_mongodb_sync(self.safe_title, self.metadata_file)
+    
     def load(self):
         """Load existing book metadata"""
         try:
@@ -258,43 +409,82 @@ class BookMetadata:
     
     def update_chapter(self, chapter_index, filename, content):
         """Update a chapter's metadata after writing/editing"""
-        metadata = self.load()
-        if not metadata:
-            raise FileNotFoundError(f"Book metadata not found for {self.safe_title}")
-        
-        # Calculate metrics
-        word_count = len(content.split())
-        # Estimate page count (250 words per page is a common estimate)
-        page_count = round(word_count / 250, 1)
-        
-        # Update chapter info
-        chapter = metadata["chapters"][chapter_index]
-        chapter["status"] = "published"
-        chapter["last_edited"] = datetime.datetime.now().strftime("%Y-%m-%d")
-        chapter["publication_date"] = datetime.datetime.now().strftime("%Y-%m-%d")
-        chapter["word_count"] = word_count
-        chapter["page_count"] = page_count
-        chapter["filename"] = str(filename)
-        
-        # Update book level info
-        metadata["book_info"]["last_updated"] = datetime.datetime.now().strftime("%Y-%m-%d")
-        metadata["book_info"]["completed_chapters"] = sum(1 for chapter in metadata["chapters"] if chapter["status"] == "published")
-        
-        if metadata["book_info"]["completed_chapters"] < metadata["book_info"]["total_chapters"]:
-            metadata["book_info"]["status"] = "in-progress"
-        else:
-            metadata["book_info"]["status"] = "complete"
-        
-        # Recalculate total word and page count
-        total_word_count = sum(chapter["word_count"] for chapter in metadata["chapters"] if chapter["word_count"] > 0)
-        metadata["book_info"]["estimated_word_count"] = total_word_count
-        metadata["book_info"]["estimated_page_count"] = round(total_word_count / 250, 1)
+        with self._lock:
+            metadata = self.load()
+            if not metadata:
+                raise FileNotFoundError(f"Book metadata not found for {self.safe_title}")
+            
+            # Calculate metrics
+            word_count = len(content.split())
+            # Estimate page count (250 words per page is a common estimate)
+            page_count = round(word_count / 250, 1)
+            
+            # Update chapter info
+            chapter = metadata["chapters"][chapter_index]
+            chapter["status"] = "published"
+            chapter["last_edited"] = datetime.datetime.now().strftime("%Y-%m-%d")
+            chapter["publication_date"] = datetime.datetime.now().strftime("%Y-%m-%d")
+            chapter["word_count"] = word_count
+            chapter["page_count"] = page_count
+            chapter["filename"] = str(filename)
+            
+            # Update book level info
+            metadata["book_info"]["last_updated"] = datetime.datetime.now().strftime("%Y-%m-%d")
+            metadata["book_info"]["completed_chapters"] = sum(1 for chapter in metadata["chapters"] if chapter["status"] == "published")
+            
+            if metadata["book_info"]["completed_chapters"] < metadata["book_info"]["total_chapters"]:
+                metadata["book_info"]["status"] = "in-progress"
+            else:
+                metadata["book_info"]["status"] = "complete"
+            
+            # Recalculate total word and page count
+            total_word_count = sum(chapter["word_count"] for chapter in metadata["chapters"] if chapter["word_count"] > 0)
+            metadata["book_info"]["estimated_word_count"] = total_word_count
+            metadata["book_info"]["estimated_page_count"] = round(total_word_count / 250, 1)
+            
+            # Save updated metadata
+            self._save(metadata)
+            
+            return metadata
+    
+    def update_chapter_illustration(self, chapter_index, expected_token=None, **fields):
+        """
+        Update the illustration tracking info of a chapter (status, path, token, ...).
         
-        # Save updated metadata
-        with open(self.metadata_file, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2)
+        With expected_token the update is only made while the chapter's
+        illustration still has that token, so a render started for an older
+        version of the chapter cannot overwrite the record of a newer one.
         
-        return metadata
+        Returns:
+            The updated metadata, or None if the token no longer matches
+        """
+        with self._lock:
+            metadata = self.load()
+            if not metadata:
+                raise FileNotFoundError(f"Book metadata not found for {self.safe_title}")
+            
+            chapter = metadata["chapters"][chapter_index]
+            illustration = chapter.get("illustration") or {}
+            if expected_token is not None and illustration.get("token") != expected_token:
+                return None
+            illustration.update(fields)
+            chapter["illustration"] = illustration
+            
+            self._save(metadata)
+            
+            return metadata
+    
+    def update_book_info(self, **fields):
+        """Update fields of the book info section (e.g. the tenant the book belongs to)"""
+        with self._lock:
+            metadata = self.load()
+            if not metadata:
+                raise FileNotFoundError(f"Book metadata not found for {self.safe_title}")
+            
+            metadata["book_info"].update(fields)
+            self._save(metadata)
+            
+            return metadata
     
     def get_next_chapter_index(self):
         """Get the index of the next chapter to write"""
@@ -327,6 +517,62 @@ class BookMetadata:
         return self.load()
 
 
+def _get_mongodb_client() -> Optional[MongoClient]:
+    """
+    Get the shared MongoDB client, creating its connection pool on first use.
+    
+    The client is health-checked with a ``ping`` at most once every
+    MONGODB_HEALTH_CHECK_INTERVAL seconds; a failed check discards the client
+    so the next call reconnects.
+    
+    Returns:
+        MongoClient instance or None if connection fails
+    """
+    global _mongo_client, _mongo_last_health_check
+    
+    with _mongo_client_lock:
+        try:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(
+                    MONGODB_CONNECTION_STRING,
+                    maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                    serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                )
+                _mongo_last_health_check = 0.0
+                logger.info(f"Created MongoDB client (pool size {MONGODB_MAX_POOL_SIZE})")
+            
+            now = time.monotonic()
+            if now - _mongo_last_health_check >= MONGODB_HEALTH_CHECK_INTERVAL:
+                _mongo_client.admin.command('ping')
+                _mongo_last_health_check = now
+            
+            return _mongo_client
+        except PyMongoError as e:
+            logger.error(f"Failed to connect to MongoDB: {e}")
+        except Exception as e:
+            logger.error(f"MongoDB connection error: {e}")
+        
+        # Drop the broken client so the next call starts with a fresh pool
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+        return None
+
+
+def close_mongodb_client() -> None:
+    """Close the shared MongoDB client and release its connection pool."""
+    global _mongo_client
+    
+    with _mongo_client_lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+            logger.info("MongoDB client closed")
+
+
+atexit.register(close_mongodb_client)
+
+
 def _get_mongodb_collection():
     """
     Get MongoDB collection for book metadata.
@@ -334,26 +580,244 @@ def _get_mongodb_collection():
     Returns:
         MongoDB collection object or None if connection fails
     """
-    try:
-        mongo_client = MongoClient(MONGODB_CONNECTION_STRING)
-        # Test the connection
-        mongo_client.admin.command('ping')
-        db = mongo_client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        logger.info(f"Connected to MongoDB: {DB_NAME}.{COLLECTION_NAME}")
-        return collection
-    except ConnectionFailure as e:
-        logger.error(f"Failed to connect to MongoDB: {e}")
+    mongo_client = _get_mongodb_client()
+    if mongo_client is None:
         return None
+    return mongo_client[DB_NAME][COLLECTION_NAME]
+
+
+def _hash_json(value: Any) -> str:
+    """Stable SHA-256 of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _section_hashes(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Hash each top-level metadata section and each chapter separately.
+    
+    Args:
+        metadata: Parsed book metadata
+        
+    Returns:
+        Dictionary of section name to hash, with "chapters" as a list of per-chapter hashes
+    """
+    hashes = {key: _hash_json(value) for key, value in metadata.items() if key != "chapters"}
+    hashes["chapters"] = [_hash_json(chapter) for chapter in metadata.get("chapters", [])]
+    return hashes
+
+
+def _topic_key(topic: Optional[str]) -> str:
+    """Normalized topic stored next to each book so topic filters can use an index"""
+    return " ".join((topic or "").split()).lower()
+
+
+def _build_sync_operation(safe_title: str, raw: bytes, existing: Optional[Dict[str, Any]]) -> Tuple[str, Optional[Any]]:
+    """
+    Build the bulk write operation needed to bring one book's Mongo document up to date.
+    
+    Args:
+        safe_title: The book's safe title (document _id)
+        raw: Raw bytes of the book's metadata JSON file
+        existing: The stored document's sync fields, or None if the book is not in MongoDB yet
+        
+    Returns:
+        Tuple of (book title, operation), where operation is None if nothing changed
+    """
+    content_hash = hashlib.sha256(raw).hexdigest()
+    # Documents synced before topic_key existed are rewritten once to add it
+    if existing and existing.get("content_hash") == content_hash and "topic_key" in existing:
+        return existing.get("book_title", safe_title), None
+    
+    metadata = json.loads(raw)
+    book_title = metadata["book_info"]["title"]
+    hashes = _section_hashes(metadata)
+    sync_fields = {
+        "book_title": book_title,
+        "topic_key": _topic_key(metadata["book_info"].get("topic")),
+        "content_hash": content_hash,
+        "section_hashes": hashes,
+        "last_synced": datetime.datetime.now().isoformat(),
+        "sync_source": "thinker_agent"
+    }
+    
+    # Without comparable section hashes, fall back to replacing the whole document
+    previous = (existing or {}).get("section_hashes")
+    if (not previous
+            or set(previous) != set(hashes)
+            or len(previous["chapters"]) != len(hashes["chapters"])):
+        document = {
+            "_id": safe_title,
+            "safe_title": safe_title,
+            "metadata": metadata,
+            **sync_fields
+        }
+        return book_title, ReplaceOne({"_id": safe_title}, document, upsert=True)
+    
+    # Only $set the sections and chapter sub-documents that actually changed
+    changes = dict(sync_fields)
+    for section, section_hash in hashes.items():
+        if section != "chapters" and previous[section] != section_hash:
+            changes[f"metadata.{section}"] = metadata[section]
+    for i, chapter_hash in enumerate(hashes["chapters"]):
+        if previous["chapters"][i] != chapter_hash:
+            changes[f"metadata.chapters.{i}"] = metadata["chapters"][i]
+    
+    return book_title, UpdateOne({"_id": safe_title}, {"$set": changes})
+
+
+def _sync_metadata_files(collection, metadata_files: List[Tuple[str, Path]], batch_size: int = MONGODB_SYNC_BATCH_SIZE) -> Dict[str, Tuple[str, bool]]:
+    """
+    Sync metadata files to MongoDB, sending only changed books in batched unordered bulk writes.
+    
+    Args:
+        collection: MongoDB collection to sync into
+        metadata_files: List of (safe title, metadata file path) pairs
+        batch_size: Number of books per bulk_write call
+        
+    Returns:
+        Dictionary mapping each safe title to a (book title, success status) pair
+    """
+    results = {}
+    
+    for start in range(0, len(metadata_files), batch_size):
+        batch = metadata_files[start:start + batch_size]
+        
+        # Fetch the stored hashes for the whole batch in a single round-trip
+        existing = {
+            document["_id"]: document
+            for document in collection.find(
+                {"_id": {"$in": [safe_title for safe_title, _ in batch]}},
+                BOOK_SYNC_STATE_PROJECTION
+            )
+        }
+        
+        operations = []
+        operation_ids = []
+        unchanged = 0
+        for safe_title, metadata_file in batch:
+            try:
+                raw = metadata_file.read_bytes()
+                book_title, operation = _build_sync_operation(safe_title, raw, existing.get(safe_title))
+            except Exception as e:
+                logger.error(f"Error processing book metadata for {safe_title}: {e}")
+                results[safe_title] = (safe_title, False)
+                continue
+            
+            results[safe_title] = (book_title, True)
+            if operation is None:
+                unchanged += 1
+            else:
+                operations.append(operation)
+                operation_ids.append(safe_title)
+        
+        if not operations:
+            logger.info(f"{unchanged} books already up to date in MongoDB")
+            continue
+        
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            logger.info(
+                f"MongoDB sync batch: {result.upserted_count} inserted, {result.modified_count} updated, "
+                f"{unchanged} unchanged"
+            )
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                safe_title = operation_ids[error["index"]]
+                book_title = results[safe_title][0]
+                logger.error(f"Error syncing book metadata for '{book_title}': {error.get('errmsg')}")
+                results[safe_title] = (book_title, False)
+        except PyMongoError as e:
+            logger.error(f"Error during bulk sync to MongoDB: {e}")
+            for safe_title in operation_ids:
+                results[safe_title] = (results[safe_title][0], False)
+    
+    return results
+
+
+def _sync_outbox_batch(metadata_files: List[Tuple[str, Path]]) -> Dict[str, bool]:
+    """Sync callback used by the MongoDB outbox worker"""
+    collection = _get_mongodb_collection()
+    if collection is None:
+        raise ConnectionError("Cannot connect to MongoDB")
+    
+    return {
+        safe_title: success
+        for safe_title, (_, success) in _sync_metadata_files(collection, metadata_files).items()
+    }
+
+
+def _get_mongodb_outbox() -> MongoSyncOutbox:
+    """Get the process-wide MongoDB sync outbox, starting its worker on first use"""
+    global _mongo_outbox
+    
+    with _mongo_outbox_lock:
+        if _mongo_outbox is None:
+            _mongo_outbox = MongoSyncOutbox(
+                MONGODB_OUTBOX_PATH,
+                _sync_outbox_batch,
+                batch_size=MONGODB_SYNC_BATCH_SIZE,
+                max_attempts=MONGODB_OUTBOX_MAX_ATTEMPTS
+            )
+            # Drain anything left over from a previous run
+            _mongo_outbox.start()
+            atexit.register(_mongo_outbox.stop, 5.0)
+        return _mongo_outbox
+
+
+def _enqueue_mongodb_sync(safe_title: str, metadata_file: Path) -> None:
+    """
+    Queue a book's metadata for background sync to MongoDB.
+    
+    Args:
+        safe_title: The book's safe title (Mongo document id)
+        metadata_file: Path of the book's metadata JSON file
+    """
+    if not MONGODB_OUTBOX_ENABLED:
+        return
+    
+    try:
+        _get_mongodb_outbox().enqueue(safe_title, metadata_file)
     except Exception as e:
-        logger.error(f"MongoDB connection error: {e}")
-        return None
+        logger.error(f"Failed to queue MongoDB sync for '{safe_title}': {e}")
+
+
+def get_mongodb_sync_status() -> str:
+    """
+    Report the state of the background MongoDB sync queue.
+    
+    Returns:
+        JSON string with the number of pending and retrying book syncs and the last error
+    """
+    try:
+        return json.dumps(_get_mongodb_outbox().status())
+    except Exception as e:
+        logger.error(f"Error reading MongoDB sync queue status: {e}")
+        return json.dumps({"error": str(e)})
+
+
+def flush_mongodb_sync_queue(timeout: float = 30.0) -> bool:
+    """
+    Push all pending metadata updates to MongoDB now instead of waiting for the background worker.
+    
+    Args:
+        timeout: Maximum number of seconds to wait (default: 30)
+        
+    Returns:
+        True if the sync queue is empty afterwards, False otherwise
+    """
+    try:
+        return _get_mongodb_outbox().flush(timeout)
+    except Exception as e:
+        logger.error(f"Error flushing MongoDB sync queue: {e}")
+        return False
 
 
 def store_book_metadata_to_mongodb(book_title: str) -> bool:
     """
     Store or update book metadata in MongoDB database instead of JSON file.
     
+    Only the parts of the metadata that changed since the last sync are written.
+    
     Args:
         book_title: The title of the book to store metadata for
         
@@ -367,43 +831,16 @@ def store_book_metadata_to_mongodb(book_title: str) -> bool:
             logger.error("Cannot connect to MongoDB")
             return False
         
-        # Load metadata from the existing JSON file
-        book_metadata = BookMetadata("books", book_title)
-        metadata = book_metadata.load()
+        safe_title = create_safe_title(book_title)
+        metadata_file = Path("books") / safe_title / "book_metadata.json"
         
-        if not metadata:
+        if not metadata_file.exists():
             logger.error(f"No metadata found for book '{book_title}'")
             return False
         
-        # Prepare document for MongoDB
-        document = {
-            "_id": book_metadata.safe_title,  # Use safe title as unique identifier
-            "book_title": book_metadata.original_title,  # Store original title
-            "safe_title": book_metadata.safe_title,
-            "metadata": metadata,
-            "last_synced": datetime.datetime.now().isoformat(),
-            "sync_source": "thinker_agent"
-        }
-        
-        # Try to update existing document or insert new one
-        result = collection.replace_one(
-            {"_id": book_metadata.safe_title},
-            document,
-            upsert=True
-        )
-        
-        if result.upserted_id:
-            logger.info(f"Book metadata for '{book_metadata.original_title}' inserted into MongoDB")
-        elif result.modified_count > 0:
-            logger.info(f"Book metadata for '{book_metadata.original_title}' updated in MongoDB")
-        else:
-            logger.info(f"Book metadata for '{book_metadata.original_title}' already up to date in MongoDB")
-        
-        return True
+        results = _sync_metadata_files(collection, [(safe_title, metadata_file)])
+        return all(success for _, success in results.values())
         
-    except DuplicateKeyError:
-        logger.error(f"Duplicate book title in MongoDB: {book_title}")
-        return False
     except Exception as e:
         logger.error(f"Error storing book metadata to MongoDB: {e}")
         return False
@@ -427,8 +864,7 @@ def load_book_metadata_from_mongodb(book_title: str) -> str:
             return None
         
         # Create safe title for lookup
-        book_metadata = BookMetadata("books", book_title)
-        safe_title = book_metadata.safe_title
+        safe_title = create_safe_title(book_title)
         
         # Find the document
         document = collection.find_one({"_id": safe_title})
@@ -449,6 +885,9 @@ def sync_all_books_to_mongodb() -> str:
     """
     Sync all book metadata from JSON files to MongoDB.
     
+    Books whose metadata file hash matches the hash stored in MongoDB are skipped;
+    the rest are sent in batched, unordered bulk writes.
+    
     Returns:
         Dictionary with book titles as keys and success status as values
     """
@@ -457,32 +896,24 @@ def sync_all_books_to_mongodb() -> str:
     
     if not book_dir.exists():
         logger.info("No books directory found")
-        return results
+        return json.dumps(results)
     
     try:
         # Get the collection
         collection = _get_mongodb_collection()
         if collection is None:
             logger.error("Cannot connect to MongoDB")
-            return results
-        
-        # Process each book directory
-        for item in book_dir.iterdir():
-            if item.is_dir():
-                metadata_file = item / "book_metadata.json"
-                if metadata_file.exists():
-                    try:
-                        with open(metadata_file, "r", encoding="utf-8") as f:
-                            metadata = json.load(f)
-                            book_title = metadata["book_info"]["title"]
-                            
-                        # Store to MongoDB
-                        success = store_book_metadata_to_mongodb(book_title)
-                        results[book_title] = success
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing book metadata for {item.name}: {e}")
-                        results[item.name] = False
+            return json.dumps(results)
+        
+        metadata_files = [
+            (item.name, item / "book_metadata.json")
+            for item in book_dir.iterdir()
+            if item.is_dir() and (item / "book_metadata.json").exists()
+        ]
+        results = {
+            book_title: success
+            for book_title, success in _sync_metadata_files(collection, metadata_files).values()
+        }
         
         logger.info(f"Synced {len(results)} books to MongoDB")
         successful_syncs = sum(1 for success in results.values() if success)
@@ -495,26 +926,183 @@ def sync_all_books_to_mongodb() -> str:
         return json.dumps(results)
 
 
-def get_all_books_from_mongodb() -> str:
+def _book_index_specs() -> List[List[Tuple[str, int]]]:
+    """Index key lists backing the book query filters and sort orders"""
+    specs = []
+    for path in BOOK_SORT_FIELDS.values():
+        specs.append([(path, DESCENDING), ("_id", DESCENDING)])
+        specs.append([("metadata.book_info.status", ASCENDING), (path, DESCENDING), ("_id", DESCENDING)])
+    specs.append([("topic_key", ASCENDING)])
+    return specs
+
+
+def _ensure_mongodb_indexes(collection) -> None:
+    """Create the indexes backing the book query filters and sort orders (once per process)"""
+    global _mongo_indexes_ready
+    
+    if _mongo_indexes_ready:
+        return
+    
+    for keys in _book_index_specs():
+        collection.create_index(keys)
+    
+    _mongo_indexes_ready = True
+
+
+def _encode_cursor(sort_value: Any, document_id: str) -> str:
+    """Encode the position after the last returned book as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, document_id]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by _encode_cursor"""
+    sort_value, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return sort_value, document_id
+
+
+def _summarize_book_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a projected book document into a compact summary"""
+    book_info = document.get("metadata", {}).get("book_info", {})
+    return {
+        "id": document["_id"],
+        "title": document.get("book_title"),
+        "status": book_info.get("status"),
+        "topic": book_info.get("topic"),
+        "completed": f"{book_info.get('completed_chapters', 0)}/{book_info.get('total_chapters', 0)}",
+        "word_count": book_info.get("estimated_word_count", 0),
+        "creation_date": book_info.get("creation_date"),
+        "last_updated": book_info.get("last_updated"),
+        "last_synced": document.get("last_synced"),
+    }
+
+
+def _build_book_query(
+    status: Optional[str],
+    topic: Optional[str],
+    created_after: Optional[str],
+    created_before: Optional[str],
+    sort_by: str,
+    descending: bool,
+    cursor: Optional[str],
+) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
     """
-    Retrieve all book metadata from MongoDB.
+    Build the filter and sort specification for a page of book summaries.
     
     Returns:
-        List of all book metadata documents, or None if error
+        Tuple of (MongoDB filter, sort specification)
     """
+    sort_path = BOOK_SORT_FIELDS[sort_by]
+    direction = DESCENDING if descending else ASCENDING
+    
+    # Books without the sort field cannot be positioned by a cursor, so they are left out
+    conditions = [{sort_path: {"$ne": None}}]
+    if status:
+        conditions.append({"metadata.book_info.status": status})
+    if topic:
+        # Case-sensitive, anchored prefix on the normalized key, so the topic_key index serves it
+        conditions.append({"topic_key": {"$regex": f"^{re.escape(_topic_key(topic))}"}})
+    if created_after or created_before:
+        date_range = {}
+        if created_after:
+            date_range["$gte"] = created_after
+        if created_before:
+            date_range["$lte"] = created_before
+        conditions.append({"metadata.book_info.creation_date": date_range})
+    if cursor:
+        # Keyset pagination: continue strictly after the last (sort value, _id) seen
+        last_value, last_id = _decode_cursor(cursor)
+        comparison = "$lt" if descending else "$gt"
+        conditions.append({"$or": [
+            {sort_path: {comparison: last_value}},
+            {sort_path: last_value, "_id": {comparison: last_id}},
+        ]})
+    
+    query = {"$and": conditions}
+    return query, [(sort_path, direction), ("_id", direction)]
+
+
+def _build_book_page(documents: List[Dict[str, Any]], limit: int, sort_by: str) -> str:
+    """
+    Turn up to limit + 1 fetched documents into a JSON page with a next cursor.
+    
+    Returns:
+        JSON string with "books", "count" and "next_cursor"
+    """
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        last_value = last
+        for key in BOOK_SORT_FIELDS[sort_by].split("."):
+            last_value = last_value.get(key) if isinstance(last_value, dict) else None
+        next_cursor = _encode_cursor(last_value, last["_id"])
+    
+    books = [_summarize_book_document(document) for document in documents]
+    logger.info(f"Retrieved {len(books)} books from MongoDB")
+    return json.dumps({"books": books, "count": len(books), "next_cursor": next_cursor}, default=str)
+
+
+def query_books_from_mongodb(
+    status: Optional[str] = None,
+    topic: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    sort_by: str = "last_synced",
+    descending: bool = True,
+    limit: int = MONGODB_DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> str:
+    """
+    Query one page of book summaries from MongoDB with server-side filtering and sorting.
+    
+    Args:
+        status: Only return books with this status (planning, in-progress, complete)
+        topic: Only return books whose topic starts with this text (case-insensitive)
+        created_after: Only return books created on or after this date (YYYY-MM-DD)
+        created_before: Only return books created on or before this date (YYYY-MM-DD)
+        sort_by: Field to sort on: last_synced, last_updated, creation_date or title (default: last_synced)
+        descending: Sort newest/highest first (default: True)
+        limit: Maximum number of books to return, up to 100 (default: 20)
+        cursor: The next_cursor value from a previous page to continue from
+        
+    Returns:
+        JSON string with "books" (compact summaries), "count" and "next_cursor" (null on the last page)
+    """
+    if sort_by not in BOOK_SORT_FIELDS:
+        logger.error(f"Unsupported sort field '{sort_by}'. Use one of: {', '.join(BOOK_SORT_FIELDS)}")
+        return EMPTY_BOOK_PAGE
+    
     try:
         # Get the collection
         collection = _get_mongodb_collection()
         if collection is None:
             logger.error("Cannot connect to MongoDB")
-            return "[]"
+            return EMPTY_BOOK_PAGE
+        
+        _ensure_mongodb_indexes(collection)
         
-        # Get all documents
-        documents = list(collection.find({}, {"_id": 1, "book_title": 1, "metadata.book_info": 1, "last_synced": 1}))
+        limit = max(1, min(int(limit), MONGODB_MAX_PAGE_SIZE))
+        query, sort = _build_book_query(status, topic, created_after, created_before, sort_by, descending, cursor)
+        documents = list(collection.find(query, BOOK_SUMMARY_PROJECTION).sort(sort).limit(limit + 1))
         
-        logger.info(f"Retrieved {len(documents)} books from MongoDB")
-        return json.dumps(documents, default=str)  # Use default=str to handle datetime objects
+        return _build_book_page(documents, limit, sort_by)
         
     except Exception as e:
-        logger.error(f"Error retrieving books from MongoDB: {e}")
-        return "[]"
+        logger.error(f"Error querying books from MongoDB: {e}")
+        return EMPTY_BOOK_PAGE
+
+
+def get_all_books_from_mongodb(limit: int = MONGODB_DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> str:
+    """
+    Retrieve book summaries from MongoDB one page at a time, most recently synced first.
+    
+    Use query_books_from_mongodb to filter by status, topic or creation date.
+    
+    Args:
+        limit: Maximum number of books to return, up to 100 (default: 20)
+        cursor: The next_cursor value from a previous page to continue from
+        
+    Returns:
+        JSON string with "books" (compact summaries), "count" and "next_cursor" (null on the last page)
+    """
+    return query_books_from_mongodb(limit=limit, cursor=cursor)
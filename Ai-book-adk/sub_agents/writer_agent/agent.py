@@ -2,7 +2,7 @@ from datetime import datetime
 
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
-from . import tools
+from . import story_memory, tools
 
 # Create the writer agent
 writer_agent = Agent(
@@ -25,5 +25,6 @@ writer_agent = Agent(
         tools.writer_agent,
         tools.chapter_writer_agent,
         tools.story_pipeline,
+        story_memory.get_story_memory,
     ],
 )
@@ -0,0 +1,250 @@
+"""Speculative drafting of the next chapter.
+
+While the user reviews chapter N, chapter N+1 can already be drafted in the
+background. The draft is written to a checkpoint in the book's ``drafts``
+folder together with a hash of everything it was generated from (the book
+plan, the chapter index and the story memory). When the chapter is requested
+the checkpoint is used only if that hash still matches; otherwise it is
+discarded and the chapter is written as usual.
+
+A prefetch runs in the bulk scheduling lane. If the chapter is requested
+while its prefetch is still queued for a scheduler slot, the prefetch is
+withdrawn and the caller drafts the chapter in its own lane, so an
+interactive request never waits behind bulk work.
+
+Prefetching costs one chapter of LLM calls that may be thrown away, so it is
+off unless ``SPECULATIVE_PREFETCH_ENABLED`` is set.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from ..thinker_agent.scheduler import (
+    CHAPTER_TOKEN_COST, SlotAbandoned, book_tenant, get_scheduler, scheduling_lane
+)
+from ..thinker_agent.tools import BookMetadata, create_safe_title
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Draft the next chapter in the background as soon as a chapter is saved
+SPECULATIVE_PREFETCH_ENABLED = os.getenv('SPECULATIVE_PREFETCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+# Drafts one chapter: (book plan, chapter index, story memory text) -> chapter text
+ChapterDrafter = Callable[[dict, int, str], str]
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def draft_fingerprint(book_plan: dict, chapter_index: int, story_so_far: str) -> str:
+    """
+    Hash the inputs a chapter draft is generated from.
+
+    Args:
+        book_plan: The book plan
+        chapter_index: Index of the chapter
+        story_so_far: Story memory text passed to the writer
+
+    Returns:
+        Hex digest identifying the draft inputs
+    """
+    payload = json.dumps(
+        {"plan": book_plan, "chapter_index": chapter_index, "story_so_far": story_so_far},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Prefetch:
+    """A draft submitted to the background worker"""
+    fingerprint: str
+    future: Optional[Future] = None
+    # Set to withdraw the draft while it waits for a scheduler slot
+    abandon: threading.Event = field(default_factory=threading.Event)
+    # Set once the draft holds its slot and is being generated
+    started: threading.Event = field(default_factory=threading.Event)
+
+
+class DraftPrefetcher:
+    """Single background worker drafting the next chapter of a book"""
+
+    def __init__(self, base_dir: str = "books"):
+        """
+        Args:
+            base_dir: Folder containing the books (default: books)
+        """
+        self.base_dir = base_dir
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="draft-prefetch")
+        self._in_flight: Dict[str, _Prefetch] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, book_title: str, chapter_index: int) -> str:
+        return f"{create_safe_title(book_title)}:{chapter_index}"
+
+    def _checkpoint_file(self, book_title: str, chapter_index: int) -> Path:
+        drafts_dir = BookMetadata(self.base_dir, book_title).chapters_dir / "drafts"
+        drafts_dir.mkdir(exist_ok=True)
+        return drafts_dir / f"chapter_{chapter_index:03d}.json"
+
+    def schedule(self, book_title: str, chapter_index: int, book_plan: dict, story_so_far: str,
+                 drafter: ChapterDrafter) -> Future:
+        """
+        Start drafting a chapter in the background.
+
+        Scheduling a chapter that is already being drafted from the same inputs
+        returns the existing job.
+
+        Args:
+            book_title: The title of the book
+            chapter_index: Index of the chapter to draft
+            book_plan: The book plan
+            story_so_far: Story memory text for the writer (must already include the previous chapter)
+            drafter: Callable writing the chapter
+
+        Returns:
+            Future resolving to True once the checkpoint is written
+        """
+        key = self._key(book_title, chapter_index)
+        fingerprint = draft_fingerprint(book_plan, chapter_index, story_so_far)
+        with self._lock:
+            current = self._in_flight.get(key)
+            if current is not None and current.fingerprint == fingerprint and not current.future.done():
+                return current.future
+            if current is not None:
+                # Superseded; if it is already generating it finishes and fails the fingerprint check
+                current.abandon.set()
+                current.future.cancel()
+
+            prefetch = _Prefetch(fingerprint)
+            prefetch.future = self._executor.submit(
+                self._draft, book_title, chapter_index, book_plan, story_so_far, drafter, prefetch
+            )
+            self._in_flight[key] = prefetch
+            logger.info(f"Prefetching a draft of chapter index {chapter_index} of '{book_title}'")
+            return prefetch.future
+
+    def _draft(self, book_title: str, chapter_index: int, book_plan: dict, story_so_far: str,
+               drafter: ChapterDrafter, prefetch: _Prefetch) -> bool:
+        try:
+            # Speculative work must not delay anyone's interactive chapter. The
+            # slot is taken here, so that take() can withdraw the draft while
+            # it is queued; the drafter's own model calls reuse it.
+            with scheduling_lane("bulk"), get_scheduler().slot(
+                book_tenant(book_title), cost=CHAPTER_TOKEN_COST, abandon=prefetch.abandon
+            ):
+                prefetch.started.set()
+                draft = drafter(book_plan, chapter_index, story_so_far)
+        except SlotAbandoned:
+            logger.info(f"Prefetch of chapter index {chapter_index} of '{book_title}' was withdrawn before it started")
+            return False
+        except Exception as e:
+            logger.error(f"Prefetching chapter index {chapter_index} of '{book_title}' failed: {e}")
+            return False
+        if not draft or not draft.strip():
+            return False
+
+        checkpoint_file = self._checkpoint_file(book_title, chapter_index)
+        checkpoint = {
+            "chapter_index": chapter_index,
+            "fingerprint": prefetch.fingerprint,
+            "draft": draft,
+            "created_at": datetime.datetime.now().isoformat(),
+        }
+        temp_file = checkpoint_file.with_name(f".{checkpoint_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f, indent=2)
+            os.replace(temp_file, checkpoint_file)
+        except OSError as e:
+            logger.error(f"Could not save draft checkpoint '{checkpoint_file}': {e}")
+            return False
+        logger.info(f"Draft of chapter index {chapter_index} of '{book_title}' is ready")
+        return True
+
+    def take(self, book_title: str, chapter_index: int, book_plan: dict, story_so_far: str) -> Optional[str]:
+        """
+        Claim the prefetched draft of a chapter if it is still valid.
+
+        A draft already being generated from the same inputs is waited for. A
+        prefetch that has not started yet (still queued in the executor or
+        waiting for a bulk scheduler slot) is withdrawn instead and None is
+        returned, so the caller drafts the chapter in its own lane. The
+        checkpoint is removed whether it is used or discarded.
+
+        Args:
+            book_title: The title of the book
+            chapter_index: Index of the chapter requested
+            book_plan: The current book plan
+            story_so_far: The current story memory text
+
+        Returns:
+            The drafted chapter text, or None if there is no valid draft
+        """
+        key = self._key(book_title, chapter_index)
+        fingerprint = draft_fingerprint(book_plan, chapter_index, story_so_far)
+
+        with self._lock:
+            in_flight = self._in_flight.pop(key, None)
+        if in_flight is not None and self._withdraw(in_flight) and in_flight.fingerprint == fingerprint:
+            logger.info(f"Waiting for the prefetched draft of chapter index {chapter_index} of '{book_title}'")
+            in_flight.future.result()
+        # A stale draft that keeps running fails the fingerprint check below
+
+        checkpoint_file = self._checkpoint_file(book_title, chapter_index)
+        try:
+            with open(checkpoint_file, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            logger.warning(f"Discarding unreadable draft checkpoint '{checkpoint_file}': {e}")
+            checkpoint = {}
+
+        checkpoint_file.unlink(missing_ok=True)
+        if checkpoint.get("fingerprint") != fingerprint:
+            logger.info(f"Discarding prefetched draft of chapter index {chapter_index} of '{book_title}': the plan or story changed")
+            return None
+
+        logger.info(f"Using prefetched draft of chapter index {chapter_index} of '{book_title}'")
+        return checkpoint["draft"]
+
+    @staticmethod
+    def _withdraw(prefetch: _Prefetch) -> bool:
+        """
+        Withdraw a prefetch unless it is already being generated.
+
+        Returns:
+            True if the draft holds its scheduler slot and keeps running
+        """
+        if prefetch.future.cancel():
+            return False
+        prefetch.abandon.set()
+        # Settles within one scheduler poll: the slot request is withdrawn or was granted first
+        while not prefetch.future.done():
+            if prefetch.started.wait(0.05):
+                return True
+        return prefetch.started.is_set()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting drafts; optionally wait for the running one"""
+        self._executor.shutdown(wait=wait)
+
+
+def get_draft_prefetcher() -> DraftPrefetcher:
+    """Get the shared draft prefetcher, creating it on first use"""
+    global _prefetcher
+
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = DraftPrefetcher()
+        return _prefetcher
@@ -0,0 +1,272 @@
+"""Rolling story memory for chapter continuity.
+
+Each book keeps a compact memory next to its metadata (``story_memory.json``):
+a running summary of the story so far plus a registry of characters and
+places. It is updated after every chapter from the previous memory and the new
+chapter only, and trimmed to a fixed token budget, so the writer gets
+continuity while its prompt size stays constant however long the book grows.
+Updates can run in the background; reading the memory waits for them.
+"""
+
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+from google import genai
+from google.genai import types
+
+from ..thinker_agent.tools import BookMetadata
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
+
+# Maximum size of the memory injected into the writer prompt, in estimated tokens
+STORY_MEMORY_TOKEN_BUDGET = int(os.getenv('STORY_MEMORY_TOKEN_BUDGET', '1200'))
+# Maximum length of one registry description, in characters
+_MAX_ENTRY_CHARS = 240
+
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+# Background updates, so saving a chapter does not wait for the extra model call
+_update_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="story-memory")
+_pending_updates: Dict[str, Future] = {}
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count for English prose (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _empty_memory() -> dict:
+    return {"summary": "", "characters": {}, "places": {}, "chapters_covered": [], "updated_at": None}
+
+
+def format_story_memory(memory: dict) -> str:
+    """
+    Render a story memory as the text block injected into the writer prompt.
+
+    Args:
+        memory: Story memory dictionary
+
+    Returns:
+        The memory as plain text, or "" if nothing has been recorded yet
+    """
+    if not memory.get("summary") and not memory.get("characters") and not memory.get("places"):
+        return ""
+
+    lines = []
+    if memory.get("summary"):
+        lines += ["Story so far:", memory["summary"], ""]
+    if memory.get("characters"):
+        lines.append("Characters:")
+        lines += [f"- {name}: {entry['description']}" for name, entry in memory["characters"].items()]
+        lines.append("")
+    if memory.get("places"):
+        lines.append("Places:")
+        lines += [f"- {name}: {entry['description']}" for name, entry in memory["places"].items()]
+    return "\n".join(lines).strip()
+
+
+def fit_to_budget(memory: dict, budget: int = STORY_MEMORY_TOKEN_BUDGET) -> dict:
+    """
+    Trim a story memory until its prompt text fits the token budget.
+
+    Registry descriptions are shortened first; then the entries last mentioned
+    longest ago are dropped; finally the oldest sentences of the summary go.
+
+    Args:
+        memory: Story memory dictionary (modified in place)
+        budget: Token budget
+
+    Returns:
+        The trimmed memory
+    """
+    for registry in ("characters", "places"):
+        for entry in memory[registry].values():
+            if len(entry["description"]) > _MAX_ENTRY_CHARS:
+                entry["description"] = entry["description"][:_MAX_ENTRY_CHARS - 3].rstrip() + "..."
+
+    while _estimate_tokens(format_story_memory(memory)) > budget:
+        entries = [
+            (entry.get("last_seen", 0), registry, name)
+            for registry in ("characters", "places")
+            for name, entry in memory[registry].items()
+        ]
+        # Keep at least the summary and a handful of the most recent entries
+        if len(entries) > 8:
+            _, registry, name = min(entries)
+            del memory[registry][name]
+            continue
+
+        sentences = re.split(r'(?<=[.!?])\s+', memory["summary"])
+        if len(sentences) <= 1:
+            memory["summary"] = memory["summary"][:budget * 2]
+            break
+        memory["summary"] = " ".join(sentences[1:])
+
+    return memory
+
+
+class StoryMemory:
+    """Rolling summary and character/place registry of one book"""
+
+    def __init__(self, book_title: str, base_dir: str = "books"):
+        """
+        Args:
+            book_title: The title of the book
+            base_dir: Folder containing the books (default: books)
+        """
+        self.book_title = book_title
+        # The book's own folder, next to book_metadata.json
+        self.memory_file = BookMetadata(base_dir, book_title).chapters_dir / "story_memory.json"
+
+        self._key = str(self.memory_file.resolve())
+        with _file_locks_guard:
+            self._lock = _file_locks.setdefault(self._key, threading.Lock())
+
+    def load(self) -> dict:
+        """Load the memory, or an empty one if none has been recorded"""
+        try:
+            with open(self.memory_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return _empty_memory()
+        except json.JSONDecodeError as e:
+            logger.error(f"Story memory for '{self.book_title}' is corrupt, starting over: {e}")
+            return _empty_memory()
+
+    def _save(self, memory: dict) -> None:
+        temp_file = self.memory_file.with_name(f".{self.memory_file.name}.{os.getpid()}.tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(memory, f, indent=2)
+        os.replace(temp_file, self.memory_file)
+
+    def prompt_text(self) -> str:
+        """The memory as text for the writer prompt, after any pending background update"""
+        self.wait_for_update()
+        return format_story_memory(self.load())
+
+    def update_in_background(self, chapter_number: int, chapter_text: str) -> Future:
+        """
+        Fold a chapter into the memory on a background thread.
+
+        prompt_text and wait_for_update wait for it, so the next chapter still
+        sees the memory including this one.
+
+        Args:
+            chapter_number: Number of the chapter that was written
+            chapter_text: The chapter text
+
+        Returns:
+            Future resolving to the result of update
+        """
+        with _file_locks_guard:
+            future = _update_executor.submit(self.update, chapter_number, chapter_text)
+            _pending_updates[self._key] = future
+        future.add_done_callback(self._forget_update)
+        return future
+
+    def _forget_update(self, future: Future) -> None:
+        with _file_locks_guard:
+            if _pending_updates.get(self._key) is future:
+                del _pending_updates[self._key]
+
+    def wait_for_update(self, timeout: Optional[float] = None) -> None:
+        """Wait until the latest background update of this memory has finished"""
+        with _file_locks_guard:
+            future = _pending_updates.get(self._key)
+        if future is not None:
+            wait([future], timeout=timeout)
+
+    def update(self, chapter_number: int, chapter_text: str) -> bool:
+        """
+        Fold a newly written chapter into the memory.
+
+        Only the current memory and the new chapter are sent to the model, so
+        the cost of an update does not grow with the length of the book. A
+        chapter that is already covered was rewritten; its new version
+        replaces the old one in the summary.
+
+        Args:
+            chapter_number: Number of the chapter that was written
+            chapter_text: The chapter text
+
+        Returns:
+            True if the memory was updated, False otherwise (the old memory is kept)
+        """
+        with self._lock:
+            memory = self.load()
+            rewritten = chapter_number in memory["chapters_covered"]
+            if rewritten:
+                task = (f"Chapter {chapter_number} has been rewritten. The notes describe its previous version; "
+                        f"replace those events with the events of the new version below.")
+            else:
+                task = f"Update the notes with the events of chapter {chapter_number} below."
+
+            prompt = f"""
+    You maintain the continuity notes for the book "{self.book_title}".
+    {task}
+
+    Return JSON with exactly these keys:
+    - "summary": the plot so far in at most {STORY_MEMORY_TOKEN_BUDGET * 2} characters, oldest events most condensed
+    - "characters": object mapping each named character to a one-sentence description (role, traits, current situation)
+    - "places": object mapping each named place to a one-sentence description
+
+    Current notes:
+    {format_story_memory(memory) or "(none yet)"}
+
+    Chapter {chapter_number}:
+    {chapter_text}
+    """
+            try:
+                response = client.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=prompt,
+                    config=types.GenerateContentConfig(response_mime_type="application/json")
+                )
+                update = json.loads(response.text)
+                summary = str(update.get("summary", "")).strip()
+                characters = update.get("characters") or {}
+                places = update.get("places") or {}
+                if not isinstance(characters, dict) or not isinstance(places, dict):
+                    raise ValueError("characters and places must be objects")
+            except Exception as e:
+                logger.error(f"Could not update story memory for '{self.book_title}': {e}")
+                return False
+
+            memory["summary"] = summary or memory["summary"]
+            for registry, entries in (("characters", characters), ("places", places)):
+                for name, description in entries.items():
+                    memory[registry][str(name)] = {"description": str(description), "last_seen": chapter_number}
+            if not rewritten:
+                memory["chapters_covered"].append(chapter_number)
+            memory["updated_at"] = datetime.datetime.now().isoformat()
+
+            self._save(fit_to_budget(memory))
+            logger.info(
+                f"Story memory for '{self.book_title}' updated with chapter {chapter_number}"
+                f"{' (rewritten)' if rewritten else ''} "
+                f"(~{_estimate_tokens(format_story_memory(memory))} tokens)"
+            )
+            return True
+
+
+def get_story_memory(book_title: str) -> str:
+    """
+    Show the continuity notes (story summary, characters and places) kept for a book.
+
+    Args:
+        book_title: The title of the book
+
+    Returns:
+        The notes as text, or a message if none have been recorded yet
+    """
+    return StoryMemory(book_title).prompt_text() or f"No story memory recorded for '{book_title}' yet."
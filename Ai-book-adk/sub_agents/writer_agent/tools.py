@@ -53,13 +53,14 @@ def writer_agent(title: str) -> str:
     return response.text.strip()
 
 
-def chapter_writer_agent(book_plan: str, chapter_index: int) -> str:
+def chapter_writer_agent(book_plan: str, chapter_index: int, story_so_far: str = "") -> str:
     """
     Write a full chapter based on the book plan and chapter specifications.
     
     Args:
         book_plan: JSON string containing the complete book plan with chapters
         chapter_index: Index of the chapter to write (0-based)
+        story_so_far: Continuity notes on the previous chapters (summary, characters, places)
         
     Returns:
         A complete chapter of approximately 1500-2000 words
@@ -87,6 +88,12 @@ def chapter_writer_agent(book_plan: str, chapter_index: int) -> str:
     
     If this is chapter 1, introduce the main characters and setting.
     If this is the final chapter, provide appropriate closure while leaving room for reader interpretation.
+    """
+        
+        if story_so_far:
+            prompt += f"""
+    Stay consistent with these notes on the previous chapters (names, relationships, places and events):
+    {story_so_far}
     """
     
         response = client.models.generate_content(
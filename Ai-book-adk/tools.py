@@ -6,15 +6,19 @@ import datetime
 import logging
 from pathlib import Path
 import re
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 from google import genai
 
 # Import functions from sub-agents
 from .sub_agents.thinker_agent.tools import book_planner_agent, table_of_contents_generator, book_cover_description_agent, BookMetadata
+from .sub_agents.thinker_agent.progress import emit
+from .sub_agents.thinker_agent.scheduler import CHAPTER_TOKEN_COST, book_tenant, get_scheduler, get_scheduler_status
 from .sub_agents.writer_agent.tools import chapter_writer_agent
-from .sub_agents.editor_agent.tools import chapter_editor_agent
-from .sub_agents.illustrator_agent.illustrator import generate_illustration
+from .sub_agents.writer_agent.story_memory import StoryMemory
+from .sub_agents.writer_agent.draft_prefetch import SPECULATIVE_PREFETCH_ENABLED, get_draft_prefetcher
+from .sub_agents.editor_agent.tools import edit_chapter_if_needed
+from .sub_agents.illustrator_agent.render_queue import backfill_illustrations, get_render_queue, record_pending_illustration
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -71,6 +75,7 @@ def book_pipeline(topic: str, num_chapters: int = 5) -> str:
     # Initialize metadata manager and create initial metadata
     book_metadata = BookMetadata("books", book_plan["book_title"])
     book_metadata.initialize(book_plan, cover_description, toc, topic)
+    emit(book_plan["book_title"], "planned", topic=topic, total_chapters=len(book_plan["chapters"]))
     
     logger.info(f"Book structure planned and saved. You can now generate chapters one by one.")
     logger.info(f"To generate a chapter, use: write_next_chapter('{book_plan['book_title']}')")
@@ -78,6 +83,30 @@ def book_pipeline(topic: str, num_chapters: int = 5) -> str:
     # Return the book title for reference
     return book_plan['book_title']
 
+def _draft_chapter(book_plan: dict, chapter_index: int, story_so_far: str) -> str:
+    """
+    Write and edit one chapter, without saving it.
+    
+    Args:
+        book_plan: The book plan
+        chapter_index: Index of the chapter to draft
+        story_so_far: Story memory text for the writer
+        
+    Returns:
+        The edited chapter text
+    """
+    chapter = book_plan["chapters"][chapter_index]
+    
+    # Wait for a fair share of the model quota (interactive unless the caller runs in the bulk lane)
+    with get_scheduler().slot(book_tenant(book_plan["book_title"]), cost=CHAPTER_TOKEN_COST):
+        raw_chapter = chapter_writer_agent(json.dumps(book_plan), chapter_index, story_so_far)
+        emit(book_plan["book_title"], "chapter_drafted", chapter_number=chapter["chapter_number"])
+        
+        logger.info(f"Editing chapter {chapter['chapter_number']}...")
+        edited_chapter = edit_chapter_if_needed(raw_chapter, chapter['chapter_title'])
+        emit(book_plan["book_title"], "chapter_edited", chapter_number=chapter["chapter_number"])
+    return edited_chapter
+
 def write_next_chapter(book_title: str) -> Optional[str]:
     """
     Write the next chapter in the book sequence.
@@ -88,6 +117,22 @@ def write_next_chapter(book_title: str) -> Optional[str]:
     Returns:
         The filename of the written chapter if successful, None if book not found or complete
     """
+    return _write_next_chapter(book_title)
+
+def _write_next_chapter(book_title: str, may_save: Optional[Callable[[], bool]] = None) -> Optional[str]:
+    """
+    Write the next chapter, optionally on behalf of work that can be taken away.
+    
+    Args:
+        book_title: The title of the book to continue writing
+        may_save: Checked before drafting and again right before anything is
+            saved; when it returns False the chapter is dropped (e.g. a
+            distributed worker lost its lease on the chapter)
+        
+    Returns:
+        The filename of the written chapter, None if the book was not found or
+        complete or the chapter was dropped
+    """
     # Initialize the metadata manager
     book_metadata = BookMetadata("books", book_title)
     metadata = book_metadata.load()
@@ -104,6 +149,10 @@ def write_next_chapter(book_title: str) -> Optional[str]:
         logger.info(f"To compile the book, use: compile_book('{book_title}')")
         return
     
+    if may_save is not None and not may_save():
+        logger.warning(f"Not writing chapter index {chapter_index} of '{book_title}': it was taken away")
+        return
+    
     chapter = metadata["chapters"][chapter_index]
     book_plan_data = metadata["generation_info"]["book_plan"]
     
@@ -117,52 +166,66 @@ def write_next_chapter(book_title: str) -> Optional[str]:
     else:
         book_plan = book_plan_data
     
-    logger.info(f"Writing chapter {chapter['chapter_number']}: {chapter['chapter_title']}...")
-    raw_chapter = chapter_writer_agent(json.dumps(book_plan), chapter_index)
+    story_memory = StoryMemory(book_title)
+    story_so_far = story_memory.prompt_text()
     
-    logger.info(f"Editing chapter {chapter['chapter_number']}...")
-    edited_chapter = chapter_editor_agent(raw_chapter, chapter['chapter_title'])
+    # A draft prefetched while the previous chapter was being reviewed is used if the plan is unchanged
+    edited_chapter = get_draft_prefetcher().take(book_title, chapter_index, book_plan, story_so_far)
+    emit(book_title, "chapter_started", chapter_number=chapter["chapter_number"],
+         chapter_title=chapter["chapter_title"], prefetched=edited_chapter is not None)
+    if edited_chapter is None:
+        logger.info(f"Writing chapter {chapter['chapter_number']}: {chapter['chapter_title']}...")
+        edited_chapter = _draft_chapter(book_plan, chapter_index, story_so_far)
     
-    # Generate illustration for the chapter
-    logger.info(f"Generating illustration for chapter {chapter['chapter_number']}...")
+    # Illustrations render in the background so they don't hold up the chapter
     illustration_prompt = f"Based on chapter {chapter['chapter_number']} titled '{chapter['chapter_title']}' from the book '{book_plan['book_title']}', create a detailed description for an illustration that captures a key scene or theme."
     
     # Create a shorter prefix for the illustration filename to avoid path length issues
     chapter_num = f"{chapter['chapter_number']:02d}"
     illustration_prefix = f"ch{chapter_num}_{chapter['chapter_title'][:20].replace(' ', '_').lower()}"
     
-    # Get the book directory for saving illustrations
-    book_dir = str(book_metadata.chapters_dir)
-    
-    # Generate the illustration
-    illustration_path = generate_illustration(illustration_prompt, illustration_prefix, book_dir)
-    
-    if illustration_path:
-        # Create markdown for the illustration
-        relative_path = os.path.relpath(illustration_path, book_metadata.chapters_dir)
-        illustration_markdown = f"![Chapter {chapter['chapter_number']} Illustration: {chapter['chapter_title']}]({relative_path})"
-    else:
-        illustration_markdown = f"*[Illustration for Chapter {chapter['chapter_number']} could not be generated]*"
-    
     # Use the edited chapter as the final formatted content
     formatted_chapter = edited_chapter
     
-    # Save the chapter
+    if may_save is not None and not may_save():
+        logger.warning(f"Dropping chapter {chapter['chapter_number']} of '{book_title}': it was taken away while being written")
+        return
+    
+    # Save the chapter with a placeholder that the render queue swaps for the image link
     chapter_short_title = chapter['chapter_title'][:20].replace(' ', '_').replace(':', '').replace('/', '').replace('\\', '').lower()
     chapter_filename = book_metadata.chapters_dir / f"ch{chapter['chapter_number']:02d}_{chapter_short_title}.md"
+    illustration_placeholder = record_pending_illustration(book_metadata, chapter_index, illustration_prompt, illustration_prefix)
     with open(chapter_filename, "w", encoding="utf-8") as f:
         f.write(f"# Chapter {chapter['chapter_number']}: {chapter['chapter_title']}\n\n")
-        f.write(illustration_markdown + "\n\n")
+        f.write(illustration_placeholder + "\n\n")
         f.write(formatted_chapter)
     
     # Update metadata with chapter details
     book_metadata.update_chapter(chapter_index, chapter_filename, formatted_chapter)
     
+    # Queue the illustration only once the chapter file and metadata are in place
+    logger.info(f"Queued illustration for chapter {chapter['chapter_number']}")
+    get_render_queue().submit(book_title, chapter_index)
+    
+    emit(book_title, "chapter_saved", chapter_number=chapter["chapter_number"], filename=str(chapter_filename))
+    
+    # Fold the chapter into the rolling story memory in the background; the next
+    # chapter waits for it when it reads the memory
+    memory_update = story_memory.update_in_background(chapter['chapter_number'], formatted_chapter)
+    
+    # Start drafting the next chapter while this one is reviewed, once the memory includes this chapter
+    next_chapter_index = book_metadata.get_next_chapter_index()
+    if SPECULATIVE_PREFETCH_ENABLED and next_chapter_index is not None:
+        memory_update.add_done_callback(lambda _: get_draft_prefetcher().schedule(
+            book_title, next_chapter_index, book_plan, story_memory.prompt_text(), _draft_chapter
+        ))
+    
     # Get updated information
     book_info = book_metadata.get_book_info()
     
     logger.info(f"Chapter {chapter['chapter_number']} completed and saved as '{chapter_filename}'")
     logger.info(f"Book Progress: {book_info['completed']} chapters | {book_info['word_count']} words | ~{book_info['page_count']} pages")
+    emit(book_title, "chapter_done", chapter_number=chapter["chapter_number"], **book_info)
     
     if book_info['status'] != 'complete':
         logger.info(f"To continue with the next chapter, use: write_next_chapter('{book_title}')")
@@ -0,0 +1,192 @@
+"""Deterministic book workflow.
+
+Runs the whole book production as a fixed DAG of steps instead of letting the
+conversational agent pick each tool call in an LLM turn:
+
+    plan -> chapters -> illustrations -> compile
+                     \\-> sync
+
+Steps whose dependencies are done run straight away, independent steps run in
+parallel, and a finished step is never repeated, so an interrupted book is
+resumed by running the workflow again with its title. LLM calls happen only
+inside the steps (planning, writing, editing, illustrating).
+"""
+
+import datetime
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .sub_agents.thinker_agent.scheduler import scheduling_lane
+from .sub_agents.thinker_agent.tools import BookMetadata, store_book_metadata_to_mongodb
+from .sub_agents.publisher_agent.tools import compile_book
+from .tools import backfill_illustrations, book_pipeline, write_next_chapter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WorkflowStep:
+    """One step of a workflow DAG"""
+    name: str
+    # Runs the step with the shared workflow context and returns its result
+    run: Callable[[Dict[str, Any]], Any]
+    depends_on: List[str] = field(default_factory=list)
+    # A failed optional step is reported but does not stop the steps depending on it
+    required: bool = True
+
+
+def run_workflow(steps: List[WorkflowStep], context: Dict[str, Any], max_workers: int = 4) -> Dict[str, Dict[str, Any]]:
+    """
+    Run a DAG of steps, each as soon as all of its dependencies have finished.
+
+    A step that raises fails; if it is required, every step depending on it is
+    skipped. Results are stored in the context under the step name.
+
+    Args:
+        steps: The workflow steps
+        context: Shared state passed to every step
+        max_workers: Maximum number of steps running at the same time
+
+    Returns:
+        Dictionary mapping each step name to its status, duration and error
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        for dependency in step.depends_on:
+            if dependency not in by_name:
+                raise ValueError(f"Step '{step.name}' depends on unknown step '{dependency}'")
+
+    report: Dict[str, Dict[str, Any]] = {}
+    running: Dict[Future, WorkflowStep] = {}
+    started: Dict[str, float] = {}
+
+    def settled(name: str) -> bool:
+        return name in report
+
+    def usable(name: str) -> bool:
+        status = report[name]["status"]
+        return status == "done" or (status == "failed" and not by_name[name].required)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="workflow") as executor:
+        while len(report) < len(steps):
+            for step in steps:
+                if settled(step.name) or step in running.values():
+                    continue
+                if not all(settled(dependency) for dependency in step.depends_on):
+                    continue
+                if not all(usable(dependency) for dependency in step.depends_on):
+                    report[step.name] = {"status": "skipped", "seconds": 0.0, "error": None}
+                    logger.warning(f"Workflow step '{step.name}' skipped: a dependency failed")
+                    continue
+                logger.info(f"Workflow step '{step.name}' started")
+                started[step.name] = time.perf_counter()
+                running[executor.submit(step.run, context)] = step
+
+            if not running:
+                if len(report) < len(steps):
+                    raise ValueError("Workflow has a dependency cycle")
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                seconds = round(time.perf_counter() - started[step.name], 2)
+                try:
+                    context[step.name] = future.result()
+                    report[step.name] = {"status": "done", "seconds": seconds, "error": None}
+                    logger.info(f"Workflow step '{step.name}' finished in {seconds}s")
+                except Exception as e:
+                    report[step.name] = {"status": "failed", "seconds": seconds, "error": str(e)}
+                    logger.error(f"Workflow step '{step.name}' failed after {seconds}s: {e}")
+
+    return report
+
+
+def _plan_step(context: Dict[str, Any]) -> str:
+    if context.get("book_title") and BookMetadata("books", context["book_title"]).load():
+        logger.info(f"Book '{context['book_title']}' is already planned")
+        return context["book_title"]
+
+    if not context.get("topic"):
+        raise ValueError("A topic is needed to plan a new book")
+    context["book_title"] = book_pipeline(context["topic"], context["num_chapters"])
+    return context["book_title"]
+
+
+def _chapters_step(context: Dict[str, Any]) -> List[str]:
+    book_title = context["book_title"]
+    book_metadata = BookMetadata("books", book_title)
+    written = []
+
+    while book_metadata.get_next_chapter_index() is not None:
+        with scheduling_lane("bulk"):
+            chapter_file = write_next_chapter(book_title)
+        if not chapter_file:
+            raise RuntimeError(f"Writing chapter {len(written) + 1} of this run failed")
+        written.append(chapter_file)
+
+    return written
+
+
+def _illustrations_step(context: Dict[str, Any]) -> dict:
+    result = json.loads(backfill_illustrations(context["book_title"], wait=True))
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def _sync_step(context: Dict[str, Any]) -> bool:
+    if not store_book_metadata_to_mongodb(context["book_title"]):
+        raise RuntimeError("Book metadata could not be synced to MongoDB")
+    return True
+
+
+def _compile_step(context: Dict[str, Any]) -> str:
+    book_filename = compile_book(context["book_title"])
+    if not book_filename:
+        raise RuntimeError("Book compilation failed")
+    return book_filename
+
+
+def book_workflow_steps() -> List[WorkflowStep]:
+    """The steps producing a complete book, from plan to compiled manuscript"""
+    return [
+        WorkflowStep("plan", _plan_step),
+        WorkflowStep("chapters", _chapters_step, depends_on=["plan"]),
+        WorkflowStep("illustrations", _illustrations_step, depends_on=["chapters"], required=False),
+        WorkflowStep("sync", _sync_step, depends_on=["chapters"], required=False),
+        WorkflowStep("compile", _compile_step, depends_on=["chapters", "illustrations"]),
+    ]
+
+
+def run_book_workflow(topic: str = "", num_chapters: int = 5, book_title: Optional[str] = None) -> str:
+    """
+    Produce a complete book in one call: plan, write every chapter, render illustrations, sync and compile.
+
+    Runs without further decisions from the agent. Pass the title of an existing
+    book instead of a topic to finish it from where it stopped.
+
+    Args:
+        topic: The main topic or theme for a new book
+        num_chapters: Number of chapters to plan for a new book (default: 5)
+        book_title: Title of an existing book to resume (optional)
+
+    Returns:
+        JSON string with the book title, the compiled book file and the status of every step
+    """
+    context: Dict[str, Any] = {"topic": topic, "num_chapters": num_chapters, "book_title": book_title}
+    started_at = datetime.datetime.now().isoformat()
+    report = run_workflow(book_workflow_steps(), context)
+
+    return json.dumps({
+        "book_title": context.get("book_title"),
+        "book_file": context.get("compile"),
+        "chapters_written": len(context.get("chapters") or []),
+        "started_at": started_at,
+        "steps": report,
+    }, indent=2)
@@ -1,9 +1,20 @@
-"""Script to clean up editor agent meta-commentary from chapter files."""
+"""Script to clean up editor agent meta-commentary from chapter files.
 
-import os
-import re
+New chapters are cleaned in memory by the editor agent before they are saved;
+this script runs the same cleanup engine over chapters already in the library.
+"""
+
+import importlib.util
+import json
 from pathlib import Path
 
+# Load the cleanup engine directly so the agent package (and its API clients) isn't imported
+_CLEANUP_PATH = Path(__file__).resolve().parent.parent / "Ai-book-adk" / "sub_agents" / "editor_agent" / "cleanup.py"
+_spec = importlib.util.spec_from_file_location("chapter_cleanup", _CLEANUP_PATH)
+cleanup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cleanup)
+
+
 def clean_chapter_files():
     """Remove editor agent meta-commentary from chapter files."""
     print("Cleaning Chapter Files...")
@@ -14,62 +25,18 @@ def clean_chapter_files():
         print("❌ Books directory not found")
         return
     
-    # Patterns to remove
-    intro_patterns = [
-        r"Okay, here's an edited version of your chapter[^.]*\.",
-        r"Here's an edited version of your chapter[^.]*\.",
-        r"I've edited your chapter[^.]*\.",
-        r"Here's the edited chapter[^.]*\.",
-    ]
-    
-    # Pattern for the rationale section at the end
-    rationale_pattern = r"\*\*Key Changes and Rationale:\*\*.*?(?=\n\n|$)"
-    closing_pattern = r"I hope these edits are helpful.*?(?=\n\n|$)"
-    
-    cleaned_files = []
+    result = json.loads(cleanup.clean_library(str(books_dir)))
     
-    for book_dir in books_dir.iterdir():
-        if book_dir.is_dir():
-            for chapter_file in book_dir.glob("ch*.md"):
-                print(f"🔍 Checking: {chapter_file}")
-                
-                try:
-                    with open(chapter_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    original_content = content
-                    
-                    # Remove intro patterns
-                    for pattern in intro_patterns:
-                        content = re.sub(pattern, "", content, flags=re.DOTALL | re.IGNORECASE)
-                    
-                    # Remove rationale section
-                    content = re.sub(rationale_pattern, "", content, flags=re.DOTALL)
-                    content = re.sub(closing_pattern, "", content, flags=re.DOTALL)
-                    
-                    # Clean up extra newlines
-                    content = re.sub(r'\n\n\n+', '\n\n', content)
-                    content = content.strip()
-                    
-                    # Check if changes were made
-                    if content != original_content:
-                        with open(chapter_file, 'w', encoding='utf-8') as f:
-                            f.write(content)
-                        print(f"✅ Cleaned: {chapter_file}")
-                        cleaned_files.append(chapter_file)
-                    else:
-                        print(f"✓ Already clean: {chapter_file}")
-                        
-                except Exception as e:
-                    print(f"❌ Error processing {chapter_file}: {e}")
+    for chapter_file, error in result["failed"].items():
+        print(f"❌ Error processing {chapter_file}: {error}")
     
-    print(f"\n🎉 Cleaned {len(cleaned_files)} chapter files")
-    if cleaned_files:
+    print(f"\n🎉 Cleaned {len(result['cleaned'])} of {result['checked']} chapter files")
+    if result["cleaned"]:
         print("\nCleaned files:")
-        for file in cleaned_files:
+        for file in result["cleaned"]:
             print(f"  📄 {file}")
     
-    return len(cleaned_files)
+    return len(result["cleaned"])
 
 if __name__ == "__main__":
     print("Chapter File Cleanup Script")
@@ -1,9 +1,16 @@
 import re
 import os
 import json
+import importlib.util
 from pathlib import Path
 from google import genai
 
+# Load the cleanup engine directly so the agent package (and its API clients) isn't imported
+_CLEANUP_PATH = Path(__file__).resolve().parent.parent / "Ai-book-adk" / "sub_agents" / "editor_agent" / "cleanup.py"
+_spec = importlib.util.spec_from_file_location("chapter_cleanup", _CLEANUP_PATH)
+cleanup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cleanup)
+
 # Load the API key from environment variables
 client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
 
@@ -74,42 +81,12 @@ class FormatAgent:
     
     def _apply_rule_based_formatting(self, content):
         """Apply consistent rule-based formatting"""
-        # Ensure dialogue is properly formatted with italics
-        # Find text in quotes that isn't already italicized
-        content = re.sub(r'(?<!\*)"([^"]*)"(?!\*)', r'*"\1"*', content)
-        
-        # Ensure headers are properly formatted
-        content = re.sub(r'^(?!#)(.+?)\n={3,}$', r'# \1', content, flags=re.MULTILINE)
-        content = re.sub(r'^(?!##)(.+?)\n-{3,}$', r'## \1', content, flags=re.MULTILINE)
-        
-        # Ensure proper spacing between paragraphs
-        content = re.sub(r'([^\n])\n([^\n])', r'\1\n\n\2', content)
-        
-        # Fix inconsistent formatting in markdown
-        content = re.sub(r'\*\*\*\*(.*?)\*\*\*\*', r'**\1**', content)  # Fix over-emphasized text
-        
-        return content
+        # Dialogue italics, heading and paragraph spacing rules share the precompiled cleanup engine
+        return cleanup.normalize_markdown(content)
     
     def _remove_undesirable_text(self, content):
         """Remove common undesirable text patterns from the content"""
-        # Remove common conclusion formulas that might be generated
-        patterns_to_remove = [
-            r'(?i)The End\.?\s*$',
-            r'(?i)To be continued\.?\s*$',
-            r'(?i)Thanks for reading\.?\s*$',
-            r'(?i)I hope you enjoyed .*?\s*$',
-            r'(?i)Stay tuned for the next chapter.*?\s*$',
-            r'(?i)This concludes chapter \d+\.?\s*$',
-            r'(?i)Author\'s Note:.*?$'
-        ]
-        
-        for pattern in patterns_to_remove:
-            content = re.sub(pattern, '', content, flags=re.MULTILINE)
-        
-        # Remove trailing whitespace at the end of the content
-        content = content.rstrip()
-        
-        return content
+        return cleanup.clean_chapter_text(content)
 
 def enhance_chapter_formatting(chapter_filepath):
     """
@@ -0,0 +1,149 @@
+"""Shared fixtures for the Ai-book-adk tests.
+
+MongoDB is replaced by in-memory stand-ins built on mongomock, so the tests
+need neither a mongod nor network access.
+"""
+
+import functools
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import mongomock
+import pytest
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.results import BulkWriteResult
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ["MONGODB_OUTBOX_ENABLED"] = "false"
+
+
+def load(module: str):
+    """Import a module of the Ai-book-adk package (its folder name is not a valid identifier)"""
+    return importlib.import_module(f"Ai-book-adk.{module}")
+
+
+def _bulk_write(collection, operations, ordered=True):
+    """bulk_write for mongomock, which does not accept the operations of current PyMongo releases"""
+    upserted = modified = 0
+    for operation in operations:
+        if isinstance(operation, ReplaceOne):
+            result = collection.replace_one(operation._filter, operation._doc, upsert=operation._upsert)
+        elif isinstance(operation, UpdateOne):
+            result = collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+        else:
+            raise NotImplementedError(type(operation).__name__)
+        upserted += result.upserted_id is not None
+        modified += result.modified_count
+    return BulkWriteResult({"nUpserted": upserted, "nModified": modified, "upserted": []}, True)
+
+
+@pytest.fixture
+def mongo_collection():
+    """An empty in-memory collection"""
+    collection = mongomock.MongoClient()["BooksMeta"]["Books"]
+    collection.bulk_write = functools.partial(_bulk_write, collection)
+    return collection
+
+
+BOOK_PLAN = {
+    "book_title": "Owl Book",
+    "book_description": "Owls at night.",
+    "chapters": [
+        {"chapter_number": n, "chapter_title": title, "synopsis": f"{title}.", "key_points": []}
+        for n, title in ((1, "Rain"), (2, "Gate"), (3, "Dawn"))
+    ],
+}
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    """Metadata manager of a planned three-chapter book in a temporary books folder"""
+    monkeypatch.chdir(tmp_path)
+    book_metadata = load("sub_agents.thinker_agent.tools").BookMetadata("books", BOOK_PLAN["book_title"])
+    book_metadata.initialize(BOOK_PLAN, "An owl on a gate.", "# Owl Book\n\n1. Rain\n2. Gate\n3. Dawn", "Owls")
+    return book_metadata
+
+
+def save_chapter(book_metadata, chapter_index: int, text: str, image_line: str) -> Path:
+    """Save a chapter the way write_next_chapter does: heading, illustration line, text"""
+    chapter = book_metadata.load()["chapters"][chapter_index]
+    chapter_file = book_metadata.chapters_dir / f"ch{chapter['chapter_number']:02d}_{chapter['chapter_title'].lower()}.md"
+    chapter_file.write_text(
+        f"# Chapter {chapter['chapter_number']}: {chapter['chapter_title']}\n\n{image_line}\n\n{text}",
+        encoding="utf-8"
+    )
+    book_metadata.update_chapter(chapter_index, chapter_file, text)
+    return chapter_file
+
+
+class AsyncCursorStandIn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit):
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)
+
+
+class AsyncCollectionStandIn:
+    """The subset of AsyncCollection used by the async tools, over a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        return AsyncCursorStandIn(self.collection.find(*args, **kwargs))
+
+    async def bulk_write(self, operations, ordered=True):
+        return _bulk_write(self.collection, operations, ordered)
+
+    async def create_index(self, keys, **kwargs):
+        return self.collection.create_index(keys, **kwargs)
+
+
+class AsyncClientStandIn:
+    """Stands in for AsyncMongoClient; every instance shares one in-memory collection"""
+
+    def __init__(self, collection):
+        self._collection = AsyncCollectionStandIn(collection)
+        self.closed = False
+        self.admin = self
+
+    async def command(self, name):
+        return {"ok": 1.0}
+
+    async def close(self):
+        self.closed = True
+
+    def __getitem__(self, name):
+        return {"Books": self._collection}
+
+
+@pytest.fixture
+def async_mongo(monkeypatch, mongo_collection):
+    """Point the async Mongo tools at an in-memory collection; yields the created clients"""
+    async_tools = load("sub_agents.thinker_agent.async_tools")
+    clients = []
+
+    def make_client(*args, **kwargs):
+        clients.append(AsyncClientStandIn(mongo_collection))
+        return clients[-1]
+
+    monkeypatch.setattr(async_tools, "AsyncMongoClient", make_client)
+    monkeypatch.setattr(async_tools, "_async_clients", {})
+    monkeypatch.setattr(async_tools, "_async_last_health_checks", {})
+    monkeypatch.setattr(async_tools, "_async_indexes_ready", False)
+    yield clients
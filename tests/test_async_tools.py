@@ -0,0 +1,109 @@
+"""Tests for the async MongoDB tools against an in-memory stand-in."""
+
+import asyncio
+import json
+
+import pytest
+
+from conftest import load
+
+async_tools = load("sub_agents.thinker_agent.async_tools")
+
+
+def write_book(title, topic, status="planning", day=1):
+    safe_title = async_tools.create_safe_title(title)
+    book_dir = async_tools.Path("books") / safe_title
+    book_dir.mkdir(parents=True, exist_ok=True)
+    metadata = {
+        "book_info": {
+            "title": title,
+            "topic": topic,
+            "status": status,
+            "creation_date": f"2026-01-{day:02d}",
+            "last_updated": f"2026-01-{day:02d}",
+            "total_chapters": 3,
+            "completed_chapters": 0,
+        },
+        "chapters": [{"chapter_number": 1, "status": "planned"}],
+    }
+    (book_dir / "book_metadata.json").write_text(json.dumps(metadata), encoding="utf-8")
+    return safe_title, metadata
+
+
+@pytest.fixture
+def books(tmp_path, monkeypatch, async_mongo):
+    monkeypatch.chdir(tmp_path)
+    return [
+        write_book("Stars Above", "Space travel", day=1),
+        write_book("Moon Garden", "Space farming", status="complete", day=2),
+        write_book("Bread", "Baking", day=3),
+    ]
+
+
+def test_sync_then_load_round_trip(books):
+    async def run():
+        assert await async_tools.store_book_metadata_to_mongodb_async("Stars Above")
+        return json.loads(await async_tools.load_book_metadata_from_mongodb_async("Stars Above"))
+
+    assert asyncio.run(run()) == books[0][1]
+
+
+def test_sync_sends_only_changed_chapters(books, mongo_collection):
+    async def run():
+        await async_tools.store_book_metadata_to_mongodb_async("Stars Above")
+        metadata = books[0][1]
+        metadata["chapters"][0]["status"] = "written"
+        (async_tools.Path("books") / books[0][0] / "book_metadata.json").write_text(json.dumps(metadata))
+        return await async_tools.store_book_metadata_to_mongodb_async("Stars Above")
+
+    assert asyncio.run(run())
+    document = mongo_collection.find_one({"_id": books[0][0]})
+    assert document["metadata"]["chapters"][0]["status"] == "written"
+
+
+def test_load_missing_book_returns_empty(books):
+    assert asyncio.run(async_tools.load_book_metadata_from_mongodb_async("Nothing Here")) == "{}"
+
+
+def test_query_filters_by_status_and_topic_prefix(books):
+    async def run():
+        for title in ("Stars Above", "Moon Garden", "Bread"):
+            await async_tools.store_book_metadata_to_mongodb_async(title)
+        by_topic = json.loads(await async_tools.query_books_from_mongodb_async(topic="SPACE"))
+        by_status = json.loads(await async_tools.query_books_from_mongodb_async(status="complete"))
+        return by_topic, by_status
+
+    by_topic, by_status = asyncio.run(run())
+    assert sorted(book["title"] for book in by_topic["books"]) == ["Moon Garden", "Stars Above"]
+    assert [book["title"] for book in by_status["books"]] == ["Moon Garden"]
+
+
+def test_query_pages_through_every_book_once(books):
+    async def run():
+        for title in ("Stars Above", "Moon Garden", "Bread"):
+            await async_tools.store_book_metadata_to_mongodb_async(title)
+        pages, cursor = [], None
+        while True:
+            page = json.loads(await async_tools.query_books_from_mongodb_async(
+                sort_by="creation_date", descending=False, limit=2, cursor=cursor
+            ))
+            pages.append([book["title"] for book in page["books"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(run()) == [["Stars Above", "Moon Garden"], ["Bread"]]
+
+
+def test_query_rejects_unknown_sort_field(books):
+    page = json.loads(asyncio.run(async_tools.query_books_from_mongodb_async(sort_by="colour")))
+    assert page == {"books": [], "count": 0, "next_cursor": None}
+
+
+def test_client_of_a_closed_loop_is_closed(books, async_mongo):
+    asyncio.run(async_tools.load_book_metadata_from_mongodb_async("Bread"))
+    asyncio.run(async_tools.load_book_metadata_from_mongodb_async("Bread"))
+
+    assert len(async_mongo) == 2
+    assert async_mongo[0].closed and not async_mongo[1].closed
+    assert len(async_tools._async_clients) == 1
@@ -0,0 +1,158 @@
+"""Tests for the MongoDB chapter task board against an in-memory stand-in."""
+
+import threading
+import time
+
+import pytest
+
+from conftest import load
+
+chapter_workers = load("chapter_workers")
+
+
+@pytest.fixture
+def board(mongo_collection):
+    return chapter_workers.ChapterTaskBoard(mongo_collection, lease_seconds=60, retry_base=0)
+
+
+def expire_lease(board, task):
+    board.collection.update_one(
+        {"_id": task["_id"]},
+        {"$set": {"lease_expires_at": chapter_workers._now() - chapter_workers.datetime.timedelta(seconds=1)}}
+    )
+
+
+def test_enqueue_is_idempotent(board):
+    assert board.enqueue_book("Owl Book", [0, 1, 2]) == 3
+    assert board.enqueue_book("Owl Book", [0, 1, 2]) == 0
+
+
+def test_claim_is_exclusive(board):
+    board.enqueue_book("Owl Book", [0, 1])
+    board.enqueue_book("Fox Book", [0])
+
+    first = board.claim("worker-a")
+    second = board.claim("worker-b")
+
+    assert {first["_id"], second["_id"]} == {"book_owl_book:000", "book_fox_book:000"}
+    assert first["lease_token"] != second["lease_token"]
+    # Chapter 1 of the owl book waits for chapter 0, so nothing else is claimable
+    assert board.claim("worker-c") is None
+
+
+def test_lost_lease_is_reclaimed_after_expiry(board):
+    board.enqueue_book("Owl Book", [0])
+    crashed = board.claim("worker-a")
+    assert board.claim("worker-b") is None
+
+    expire_lease(board, crashed)
+    reclaimed = board.claim("worker-b")
+
+    assert reclaimed["_id"] == crashed["_id"]
+    assert reclaimed["lease_owner"] == "worker-b"
+    assert reclaimed["attempts"] == 2
+    # The crashed worker's late result is discarded
+    assert not board.complete(crashed)
+    assert not board.heartbeat(crashed)
+
+
+def test_heartbeat_keeps_the_lease_alive(mongo_collection):
+    board = chapter_workers.ChapterTaskBoard(mongo_collection, lease_seconds=0.5)
+    board.enqueue_book("Owl Book", [0])
+    task = board.claim("worker-a")
+
+    for _ in range(3):
+        time.sleep(0.3)
+        assert board.heartbeat(task)
+        assert board.claim("worker-b") is None
+
+    time.sleep(0.6)
+    assert board.claim("worker-b")["lease_owner"] == "worker-b"
+
+
+def test_complete_makes_the_next_chapter_ready(board):
+    board.enqueue_book("Owl Book", [0, 1, 2])
+    task = board.claim("worker-a")
+
+    assert board.complete(task)
+    next_task = board.claim("worker-a")
+
+    assert next_task["chapter_index"] == 1
+    assert board.collection.find_one({"_id": "book_owl_book:002"})["ready"] is False
+    assert board.status()["tasks"] == {"queued": 1, "leased": 1, "done": 1, "failed": 0}
+
+
+def test_failed_attempts_are_retried_then_fail(board):
+    board.enqueue_book("Owl Book", [0], max_attempts=2)
+
+    board.fail(board.claim("worker-a"), "model error")
+    assert board.collection.find_one({"_id": "book_owl_book:000"})["status"] == "queued"
+
+    board.fail(board.claim("worker-a"), "model error")
+    task = board.collection.find_one({"_id": "book_owl_book:000"})
+    assert task["status"] == "failed"
+    assert task["last_error"] == "model error"
+
+
+def test_reclaim_after_the_final_attempt_fails_the_task(board):
+    board.enqueue_book("Owl Book", [0], max_attempts=1)
+    expire_lease(board, board.claim("worker-a"))
+
+    stop = threading.Event()
+    worker = threading.Thread(target=chapter_workers.chapter_worker_loop, args=(board, "worker-b", stop, 0.05))
+    worker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while board.collection.find_one({"_id": "book_owl_book:000"})["status"] != "failed":
+            assert time.monotonic() < deadline, "the task was not failed"
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert "last attempt" in board.collection.find_one({"_id": "book_owl_book:000"})["last_error"]
+
+
+def test_retry_failed_revives_a_stuck_book(board):
+    board.enqueue_book("Owl Book", [0, 1], max_attempts=1)
+    board.enqueue_book("Fox Book", [0], max_attempts=1)
+    board.fail(board.claim("worker-a"), "model error")
+    board.fail(board.claim("worker-a"), "model error")
+
+    assert board.retry_failed("Owl Book") == 1
+    task = board.claim("worker-a")
+    assert task["_id"] == "book_owl_book:000"
+    assert task["attempts"] == 1
+
+    assert board.complete(task)
+    assert board.claim("worker-a")["chapter_index"] == 1
+    assert board.retry_failed() == 1
+
+
+def test_chapter_is_dropped_once_the_lease_is_lost(board, book, monkeypatch):
+    board.enqueue_book("Owl Book", [0])
+    stale = board.claim("worker-a")
+    expire_lease(board, stale)
+    board.claim("worker-b")
+    saves = []
+
+    def write(book_title, may_save):
+        if may_save():
+            saves.append(book_title)
+            return "ch01_rain.md"
+
+    monkeypatch.setattr(chapter_workers, "_write_next_chapter", write)
+
+    assert not chapter_workers.run_chapter_task(board, stale, "worker-a", heartbeat_seconds=60)
+    assert saves == []
+    task = board.collection.find_one({"_id": stale["_id"]})
+    assert task["status"] == "leased" and task["lease_owner"] == "worker-b"
+
+
+def test_chapter_is_saved_and_completed_while_the_lease_is_held(board, book, monkeypatch):
+    board.enqueue_book("Owl Book", [0])
+    task = board.claim("worker-a")
+    monkeypatch.setattr(chapter_workers, "_write_next_chapter", lambda book_title, may_save: may_save() and "ch01.md")
+
+    assert chapter_workers.run_chapter_task(board, task, "worker-a", heartbeat_seconds=60)
+    assert board.collection.find_one({"_id": task["_id"]})["status"] == "done"
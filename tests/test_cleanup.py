@@ -0,0 +1,86 @@
+"""Tests for the editor output cleanup engine."""
+
+import json
+
+from conftest import load
+
+cleanup = load("sub_agents.editor_agent.cleanup")
+
+
+def test_dialogue_resembling_meta_commentary_is_kept():
+    text = (
+        "The rain fell.\n\n"
+        "Here is the revised plan, she said, sliding the map across the table.\n\n"
+        "Sure, here's the version of events the police will hear.\n\n"
+        "He walked on.\n\n"
+        "The end."
+    )
+
+    assert cleanup.clean_chapter_text(text) == (
+        "The rain fell.\n\n"
+        "Here is the revised plan, she said, sliding the map across the table.\n\n"
+        "Sure, here's the version of events the police will hear.\n\n"
+        "He walked on."
+    )
+
+
+def test_closing_phrases_inside_the_chapter_are_kept():
+    text = (
+        "I hope this helps, Mara said, handing him the lantern.\n\n"
+        "The End. The words were carved over the gate.\n\n"
+        "They went through."
+    )
+
+    assert cleanup.clean_chapter_text(text) == text
+
+
+def test_introduction_is_removed():
+    text = "Okay, here's an edited version of your chapter:\n\n# Chapter 1\n\nThe rain fell."
+
+    assert cleanup.clean_chapter_text(text) == "# Chapter 1\n\nThe rain fell."
+
+
+def test_introduction_after_the_chapter_file_header_is_removed():
+    header = "# Chapter 2: The Gate\n\n![Chapter 2 Illustration: The Gate](images/ch02_the_gate.png)\n\n"
+    text = header + "Okay, here's an edited version of your chapter, with tighter pacing:\n\nThe rain fell."
+
+    assert cleanup.clean_chapter_text(text) == header + "The rain fell."
+
+
+def test_prose_opening_after_the_chapter_file_header_is_kept():
+    text = "# Chapter 2: The Gate\n\n*[Illustration pending: 0123abcd]*\n\nHere is the revised plan, she said."
+
+    assert cleanup.clean_chapter_text(text) == text
+
+
+def test_clean_library_cleans_saved_chapters_and_keeps_the_final_newline(tmp_path):
+    book_dir = tmp_path / "book_owl_book"
+    book_dir.mkdir()
+    header = "# Chapter 1: Rain\n\n![Chapter 1 Illustration: Rain](images/ch01_rain.png)\n\n"
+    dirty = book_dir / "ch01_rain.md"
+    dirty.write_text(header + "Here's the edited chapter:\n\nThe rain fell.\n\nI hope these edits are helpful!\n", encoding="utf-8")
+    clean = book_dir / "ch02_sun.md"
+    clean.write_text("# Chapter 2: Sun\n\nThe sun rose.\n", encoding="utf-8")
+
+    result = json.loads(cleanup.clean_library(str(tmp_path)))
+
+    assert result["checked"] == 2
+    assert result["cleaned"] == [str(dirty)]
+    assert dirty.read_text(encoding="utf-8") == header + "The rain fell.\n"
+    assert clean.read_text(encoding="utf-8") == "# Chapter 2: Sun\n\nThe sun rose.\n"
+
+
+def test_closing_remarks_and_rationale_are_removed():
+    text = (
+        "# Chapter 1\n\nThe rain fell.\n\n"
+        "I hope these edits are helpful!\n\n"
+        "---\n\n**Key Changes and Rationale:**\n\n* Tightened the opening.\n* Fixed tense."
+    )
+
+    assert cleanup.clean_chapter_text(text) == "# Chapter 1\n\nThe rain fell."
+
+
+def test_emphasis_and_blank_lines_are_normalized():
+    text = "****Run!****\n\n\n\nShe ran."
+
+    assert cleanup.clean_chapter_text(text) == "**Run!**\n\nShe ran."
@@ -0,0 +1,78 @@
+"""Tests for speculative chapter drafting."""
+
+import threading
+import time
+
+import pytest
+
+from conftest import load
+
+draft_prefetch = load("sub_agents.writer_agent.draft_prefetch")
+scheduler = load("sub_agents.thinker_agent.scheduler")
+
+BOOK_PLAN = {"book_title": "Owl Book", "chapters": [{"chapter_number": 1}, {"chapter_number": 2}]}
+
+
+@pytest.fixture
+def fair_scheduler(monkeypatch):
+    # One slot for bulk work, one reserved for interactive work
+    fair_scheduler = scheduler.FairScheduler(max_concurrency=2, interactive_reserved=1, weights={})
+    monkeypatch.setattr(draft_prefetch, "get_scheduler", lambda: fair_scheduler)
+    return fair_scheduler
+
+
+@pytest.fixture
+def prefetcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    draft_prefetch.BookMetadata("books", "Owl Book")
+    prefetcher = draft_prefetch.DraftPrefetcher()
+    yield prefetcher
+    prefetcher.shutdown()
+
+
+def test_queued_prefetch_is_withdrawn_instead_of_waited_for(prefetcher, fair_scheduler):
+    drafted = []
+    bulk = fair_scheduler.acquire("someone else", "bulk")
+    try:
+        future = prefetcher.schedule("Owl Book", 1, BOOK_PLAN, "story", lambda *args: drafted.append(args) or "draft")
+        while fair_scheduler.status()["waiting"]["bulk"] == 0:
+            time.sleep(0.01)
+
+        started = time.monotonic()
+        assert prefetcher.take("Owl Book", 1, BOOK_PLAN, "story") is None
+        assert time.monotonic() - started < 1
+    finally:
+        fair_scheduler.release(bulk)
+
+    assert future.result(timeout=5) is False
+    assert drafted == []
+    assert fair_scheduler.status()["waiting"]["bulk"] == 0
+
+
+def test_running_prefetch_is_waited_for(prefetcher, fair_scheduler):
+    release = threading.Event()
+
+    def drafter(book_plan, chapter_index, story_so_far):
+        release.wait()
+        return "draft"
+
+    prefetcher.schedule("Owl Book", 1, BOOK_PLAN, "story", drafter)
+    while fair_scheduler.status()["running"]["bulk"] == 0:
+        time.sleep(0.01)
+    threading.Timer(0.2, release.set).start()
+
+    assert prefetcher.take("Owl Book", 1, BOOK_PLAN, "story") == "draft"
+
+
+def test_draft_from_other_inputs_is_discarded(prefetcher, fair_scheduler):
+    prefetcher.schedule("Owl Book", 1, BOOK_PLAN, "story", lambda *args: "draft").result(timeout=5)
+
+    assert prefetcher.take("Owl Book", 1, BOOK_PLAN, "a different story") is None
+    assert prefetcher.take("Owl Book", 1, BOOK_PLAN, "story") is None
+
+
+def test_nested_slot_reuses_the_held_slot(fair_scheduler):
+    with fair_scheduler.slot("Owl Book", "bulk") as outer:
+        with fair_scheduler.slot("Owl Book", "bulk", timeout=0.1) as inner:
+            assert inner is outer
+    assert fair_scheduler.status()["running"]["bulk"] == 0
@@ -0,0 +1,65 @@
+"""Tests for structured edit lists and the local edit applier."""
+
+from conftest import load
+
+edit_patches = load("sub_agents.editor_agent.edit_patches")
+
+TEXT = (
+    "The rain fell on the old gate.\n\n"
+    '"Run," she said. The owl watched from the oak.\n\n'
+    'He did not move. "Run," she said.'
+)
+
+
+def test_parse_edits_accepts_a_fenced_list_or_an_edits_key():
+    fenced = '```json\n[{"anchor": "old gate", "replacement": "iron gate"}]\n```'
+    keyed = '{"edits": [{"anchor": "old gate"}]}'
+
+    assert edit_patches.parse_edits(fenced) == [{"anchor": "old gate", "replacement": "iron gate"}]
+    assert edit_patches.parse_edits(keyed) == [{"anchor": "old gate", "replacement": ""}]
+    assert edit_patches.parse_edits("The rain fell.") is None
+    assert edit_patches.parse_edits('[{"anchor": ""}]') is None
+
+
+def test_exact_and_whitespace_insensitive_anchors_are_found():
+    start, end = edit_patches.find_anchor(TEXT, "the old gate")
+    assert TEXT[start:end] == "the old gate"
+
+    start, end = edit_patches.find_anchor(TEXT, "THE OWL  watched\nfrom the oak")
+    assert TEXT[start:end] == "The owl watched from the oak"
+
+
+def test_fuzzy_anchor_is_found_on_word_boundaries():
+    start, end = edit_patches.find_anchor(TEXT, "The owl watchd from the oak.")
+
+    assert TEXT[start:end] == "The owl watched from the oak."
+
+
+def test_unrelated_anchor_is_not_placed():
+    assert edit_patches.find_anchor(TEXT, "A ship sailed into the harbour at dawn.") is None
+
+
+def test_repeated_anchor_is_rejected():
+    assert edit_patches.find_anchor(TEXT, '"Run," she said.') is None
+    assert edit_patches.find_anchor(TEXT, '"run,"   SHE said.') is None
+    assert edit_patches.apply_edits(TEXT, [{"anchor": '"Run," she said.', "replacement": '"Go!"'}]) is None
+
+
+def test_edits_are_applied_against_the_original_text():
+    edited = edit_patches.apply_edits(TEXT, [
+        {"anchor": "He did not move.", "replacement": "He froze."},
+        {"anchor": "The rain fell on the old gate.", "replacement": "Rain hammered the gate."},
+    ])
+
+    assert edited == (
+        "Rain hammered the gate.\n\n"
+        '"Run," she said. The owl watched from the oak.\n\n'
+        'He froze. "Run," she said.'
+    )
+
+
+def test_overlapping_edits_are_rejected():
+    assert edit_patches.apply_edits(TEXT, [
+        {"anchor": "The rain fell", "replacement": "Rain fell"},
+        {"anchor": "fell on the old gate", "replacement": "hit the gate"},
+    ]) is None
@@ -0,0 +1,145 @@
+"""Tests for the durable book job queue: leases, retries, priorities and tenants."""
+
+import pytest
+
+from conftest import load
+
+job_queue = load("job_queue")
+
+
+class Clock:
+    """Stands in for the time module so leases and backoff can expire without waiting"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return job_queue.JobQueue(tmp_path / "jobs.sqlite3", visibility_timeout=60, retry_base=5, retry_max=300)
+
+
+def test_claim_takes_the_highest_priority_first(queue):
+    low = queue.enqueue("plan", {"topic": "low"}, priority=0)
+    high = queue.enqueue("plan", {"topic": "high"}, priority=10)
+
+    assert queue.claim("w1")["id"] == high
+    assert queue.claim("w1")["id"] == low
+    assert queue.claim("w1") is None
+
+
+def test_leased_job_is_reclaimed_once_its_lease_expires(queue, clock):
+    job_id = queue.enqueue("plan", {"topic": "owls"})
+    first = queue.claim("w1")
+    assert queue.claim("w2") is None
+
+    clock.sleep(61)
+    second = queue.claim("w2")
+
+    assert second["id"] == job_id
+    assert second["attempts"] == 2
+    # The first worker's lease is gone: it can neither renew nor complete
+    assert not queue.renew(first)
+    assert not queue.complete(first)
+    assert queue.complete(second, [("chapter", {"book_title": "Owls"})])
+
+
+def test_renewed_lease_keeps_the_job(queue, clock):
+    queue.enqueue("plan", {"topic": "owls"})
+    job = queue.claim("w1")
+
+    clock.sleep(50)
+    assert queue.renew(job)
+    clock.sleep(50)
+
+    assert queue.claim("w2") is None
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(queue, clock):
+    queue.enqueue("plan", {"topic": "owls"}, max_attempts=1)
+    queue.claim("w1")
+
+    clock.sleep(61)
+
+    assert queue.claim("w2") is None
+    assert queue.stats()["jobs"]["failed"] == 1
+
+
+def test_failed_attempts_back_off_exponentially(queue, clock):
+    queue.enqueue("plan", {"topic": "owls"}, max_attempts=3)
+
+    job = queue.claim("w1")
+    queue.fail(job, "model timed out")
+    clock.sleep(4)
+    assert queue.claim("w1") is None
+    clock.sleep(1)
+    job = queue.claim("w1")
+    assert job["attempts"] == 2
+
+    queue.fail(job, "model timed out")
+    clock.sleep(9)
+    assert queue.claim("w1") is None
+    clock.sleep(1)
+    job = queue.claim("w1")
+    assert job["attempts"] == 3
+
+    queue.fail(job, "model timed out")
+    stats = queue.stats()
+    assert stats["jobs"]["failed"] == 1
+    assert stats["last_error"]["last_error"] == "model timed out"
+
+
+def test_retry_failed_requeues_with_fresh_attempts(queue):
+    job_id = queue.enqueue("plan", {"topic": "owls"}, max_attempts=1)
+    queue.fail(queue.claim("w1"), "boom")
+    assert queue.claim("w1") is None
+
+    assert queue.retry_failed() == 1
+
+    job = queue.claim("w1")
+    assert job["id"] == job_id
+    assert job["attempts"] == 1
+
+
+def test_checkpoint_is_kept_for_the_retry(queue, clock):
+    queue.enqueue("plan", {"topic": "owls"}, max_attempts=2)
+    job = queue.claim("w1")
+    assert queue.checkpoint(job, {"book_title": "Owl Book"})
+    queue.fail(job, "boom")
+    clock.sleep(5)
+
+    assert queue.claim("w1")["payload"] == {"topic": "owls", "book_title": "Owl Book"}
+
+
+def test_follow_ups_inherit_priority_and_tenant(queue):
+    queue.enqueue("plan", {"topic": "owls"}, priority=7, tenant="acme")
+    assert queue.complete(queue.claim("w1"), [("chapter", {"book_title": "Owl Book"})])
+
+    follow_up = queue.claim("w1")
+    assert (follow_up["kind"], follow_up["priority"], follow_up["tenant"]) == ("chapter", 7, "acme")
+
+
+def test_tenants_share_workers_fairly(tmp_path, clock):
+    queue = job_queue.JobQueue(tmp_path / "jobs.sqlite3", tenant_concurrency=2)
+    for index in range(4):
+        queue.enqueue("chapter", {"index": index}, tenant="big")
+    queue.enqueue("chapter", {"index": 0}, tenant="small")
+
+    claimed = [queue.claim("w")["tenant"] for _ in range(3)]
+
+    # The small tenant goes ahead of the big one's backlog, which is capped at two running jobs
+    assert sorted(claimed) == ["big", "big", "small"]
+    assert queue.claim("w") is None
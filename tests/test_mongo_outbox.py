@@ -0,0 +1,79 @@
+"""Tests for the MongoDB write-behind outbox."""
+
+import pytest
+
+from conftest import load
+
+mongo_outbox = load("sub_agents.thinker_agent.mongo_outbox")
+
+
+@pytest.fixture
+def metadata_file(tmp_path):
+    path = tmp_path / "owl_book.json"
+    path.write_text("{}", encoding="utf-8")
+    return path
+
+
+def make_outbox(tmp_path, monkeypatch, sync_fn, **kwargs):
+    outbox = mongo_outbox.MongoSyncOutbox(tmp_path / "outbox.sqlite3", sync_fn, retry_base=0, **kwargs)
+    # Drain by hand instead of on the background worker
+    monkeypatch.setattr(outbox, "start", lambda: None)
+    return outbox
+
+
+def test_synced_book_leaves_the_outbox(tmp_path, monkeypatch, metadata_file):
+    synced = []
+    outbox = make_outbox(tmp_path, monkeypatch, lambda batch: {title: not synced.append(title) for title, _ in batch})
+    outbox.enqueue("owl_book", metadata_file)
+
+    assert outbox.drain_once() == 1
+    assert synced == ["owl_book"]
+    assert outbox.pending_count() == 0
+
+
+def test_failing_book_is_marked_dead_after_max_attempts(tmp_path, monkeypatch, metadata_file):
+    calls = []
+    outbox = make_outbox(
+        tmp_path, monkeypatch, lambda batch: {title: calls.append(title) or False for title, _ in batch}, max_attempts=3
+    )
+    outbox.enqueue("owl_book", metadata_file)
+
+    while outbox.drain_once():
+        pass
+
+    assert len(calls) == 3
+    assert outbox.pending_count() == 0
+    assert outbox.status()["dead"] == 1
+
+    # Writing the book again gives it a fresh set of attempts
+    outbox.enqueue("owl_book", metadata_file)
+    assert outbox.pending_count() == 1
+    assert outbox.status()["dead"] == 0
+
+
+def test_unreachable_database_does_not_kill_rows(tmp_path, monkeypatch, metadata_file):
+    def unreachable(batch):
+        raise ConnectionError("MongoDB is down")
+
+    outbox = make_outbox(tmp_path, monkeypatch, unreachable, max_attempts=2)
+    outbox.enqueue("owl_book", metadata_file)
+
+    for _ in range(5):
+        assert outbox.drain_once() == 1
+
+    status = outbox.status()
+    assert status["pending"] == 1
+    assert status["dead"] == 0
+    assert status["last_error"] == "MongoDB is down"
+
+
+def test_deleted_book_is_dropped_without_syncing(tmp_path, monkeypatch, metadata_file):
+    calls = []
+    outbox = make_outbox(tmp_path, monkeypatch, lambda batch: calls.extend(batch) or {})
+    outbox.enqueue("owl_book", metadata_file)
+    metadata_file.unlink()
+
+    assert outbox.drain_once() == 1
+    assert calls == []
+    assert outbox.pending_count() == 0
+    assert outbox.status()["dead"] == 0
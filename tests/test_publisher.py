@@ -0,0 +1,97 @@
+"""Tests for compiling books to Markdown."""
+
+import os
+
+from conftest import load, save_chapter
+
+publisher = load("sub_agents.publisher_agent.tools")
+render_queue = load("sub_agents.illustrator_agent.render_queue")
+
+
+def test_unrendered_illustrations_are_left_out_of_the_book(book):
+    for chapter_index, text in enumerate(("The rain fell.", "The gate opened.", "The sun rose.")):
+        placeholder = render_queue.record_pending_illustration(book, chapter_index, "An owl", f"ch{chapter_index}")
+        save_chapter(book, chapter_index, text, placeholder)
+
+    compiled = open(publisher.compile_book("Owl Book"), encoding="utf-8").read()
+
+    assert "Illustration pending" not in compiled
+    assert "## Chapter 2: Gate\n\nThe gate opened.\n\n---" in compiled
+
+
+def write_book(book, texts=("The rain fell.", "The gate opened.", "The sun rose.")):
+    return [save_chapter(book, chapter_index, text, "") for chapter_index, text in enumerate(texts)]
+
+
+def compile_and_count_reused(monkeypatch, **kwargs):
+    """Compile the book, returning its text and the number of chapters spliced from the previous build"""
+    events = []
+    monkeypatch.setattr(publisher, "emit", lambda book_title, event, **fields: events.append(fields))
+    filename = publisher.compile_book("Owl Book", **kwargs)
+    return open(filename, encoding="utf-8").read(), events[-1]["reused_chapters"]
+
+
+def test_unchanged_book_is_spliced_from_the_previous_build(book, monkeypatch):
+    write_book(book)
+    first, reused = compile_and_count_reused(monkeypatch)
+    assert reused == 0
+
+    second, reused = compile_and_count_reused(monkeypatch)
+
+    assert reused == 3
+    assert second == first
+
+
+def test_changed_chapter_is_rendered_again(book, monkeypatch):
+    write_book(book)
+    compile_and_count_reused(monkeypatch)
+
+    save_chapter(book, 1, "The gate creaked open at midnight.", "")
+    compiled, reused = compile_and_count_reused(monkeypatch)
+
+    assert reused == 2
+    assert "The gate creaked open at midnight." in compiled
+    assert "The gate opened." not in compiled
+    assert compiled == compile_and_count_reused(monkeypatch, rebuild=True)[0]
+
+
+def test_same_size_edit_is_caught_by_the_content_hash(book, monkeypatch):
+    chapter_files = write_book(book)
+    compile_and_count_reused(monkeypatch)
+    stat = chapter_files[0].stat()
+
+    # Touched but unchanged: reused
+    os.utime(chapter_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert compile_and_count_reused(monkeypatch)[1] == 3
+
+    # Same size, different words: rendered again
+    chapter_files[0].write_text(chapter_files[0].read_text(encoding="utf-8").replace("rain", "hail"), encoding="utf-8")
+    os.utime(chapter_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+    compiled, reused = compile_and_count_reused(monkeypatch)
+
+    assert reused == 2
+    assert "The hail fell." in compiled
+
+
+def test_edited_output_invalidates_the_manifest(book, monkeypatch):
+    write_book(book)
+    compile_and_count_reused(monkeypatch)
+    book_file = book.book_dir / f"{book.safe_title}.md"
+    book_file.write_text(book_file.read_text(encoding="utf-8") + "\nNotes.\n", encoding="utf-8")
+
+    compiled, reused = compile_and_count_reused(monkeypatch)
+
+    assert reused == 0
+    assert "Notes." not in compiled
+
+
+def test_forced_placeholder_is_replaced_once_the_chapter_is_written(book, monkeypatch):
+    write_book(book, texts=("The rain fell.", "The gate opened."))
+    compile_and_count_reused(monkeypatch, force=True)
+
+    save_chapter(book, 2, "The sun rose.", "")
+    compiled, reused = compile_and_count_reused(monkeypatch, force=True)
+
+    assert reused == 2
+    assert "The sun rose." in compiled
+    assert compiled == compile_and_count_reused(monkeypatch, rebuild=True)[0]
@@ -0,0 +1,53 @@
+"""Tests for the background illustration render queue."""
+
+from conftest import load, save_chapter
+
+render_queue = load("sub_agents.illustrator_agent.render_queue")
+
+
+def pending_chapter(book, chapter_index=0):
+    placeholder = render_queue.record_pending_illustration(book, chapter_index, "An owl in the rain", "ch01_rain")
+    return save_chapter(book, chapter_index, "The rain fell.", placeholder)
+
+
+def test_render_replaces_the_placeholder(book, monkeypatch):
+    chapter_file = pending_chapter(book)
+    image = book.chapters_dir / "ch01_rain.png"
+    monkeypatch.setattr(render_queue, "generate_illustration", lambda prompt, prefix, folder: str(image))
+
+    assert render_queue.render_chapter_illustration("Owl Book", 0)
+
+    assert "![Chapter 1 Illustration: Rain](ch01_rain.png)" in chapter_file.read_text(encoding="utf-8")
+    illustration = book.load()["chapters"][0]["illustration"]
+    assert illustration["status"] == "done"
+    assert illustration["path"] == "ch01_rain.png"
+
+
+def test_render_of_a_rewritten_chapter_leaves_the_new_record_alone(book, monkeypatch):
+    pending_chapter(book)
+
+    def rewrite_while_rendering(prompt, prefix, folder):
+        # The chapter is rewritten (with a new placeholder token) while the old render runs
+        pending_chapter(book)
+        return str(book.chapters_dir / "ch01_rain.png")
+
+    monkeypatch.setattr(render_queue, "generate_illustration", rewrite_while_rendering)
+
+    assert not render_queue.render_chapter_illustration("Owl Book", 0)
+
+    illustration = book.load()["chapters"][0]["illustration"]
+    assert illustration["status"] == "pending"
+    assert render_queue.illustration_placeholder(illustration["token"]) in (
+        book.chapters_dir / "ch01_rain.md"
+    ).read_text(encoding="utf-8")
+
+
+def test_failed_render_is_recorded(book, monkeypatch):
+    pending_chapter(book)
+    monkeypatch.setattr(render_queue, "generate_illustration", lambda prompt, prefix, folder: None)
+
+    assert not render_queue.render_chapter_illustration("Owl Book", 0)
+
+    illustration = book.load()["chapters"][0]["illustration"]
+    assert illustration["status"] == "failed"
+    assert illustration["attempts"] == 1
@@ -0,0 +1,119 @@
+"""Tests for fair scheduling of model work across tenants."""
+
+import threading
+import time
+
+import pytest
+
+from conftest import load
+
+scheduler = load("sub_agents.thinker_agent.scheduler")
+
+
+def make_scheduler(**kwargs):
+    options = {"max_concurrency": 1, "interactive_reserved": 0, "weights": {}, "quota_path": None}
+    options.update(kwargs)
+    return scheduler.FairScheduler(**options)
+
+
+def queue_request(fair_scheduler, tenant, lane, order):
+    """Start a request in a thread and return once it is waiting; it records its tenant when granted"""
+    waiting = sum(fair_scheduler.status()["waiting"].values())
+
+    def run():
+        with fair_scheduler.slot(tenant, lane):
+            order.append(tenant)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    while sum(fair_scheduler.status()["waiting"].values()) == waiting:
+        time.sleep(0.005)
+    return thread
+
+
+def run_queued(fair_scheduler, holder, requests):
+    """Queue (tenant, lane) requests behind a held slot, release it and return the grant order"""
+    order = []
+    threads = [queue_request(fair_scheduler, tenant, lane, order) for tenant, lane in requests]
+    fair_scheduler.release(holder)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def test_new_tenant_is_served_before_a_backlog():
+    fair_scheduler = make_scheduler()
+    holder = fair_scheduler.acquire("big", "bulk")
+
+    order = run_queued(fair_scheduler, holder, [("big", "bulk")] * 3 + [("small", "bulk")])
+
+    assert order == ["small", "big", "big", "big"]
+
+
+def test_weights_share_slots_in_proportion():
+    fair_scheduler = make_scheduler(weights={"gold": 2})
+    holder = fair_scheduler.acquire("holder", "bulk")
+
+    order = run_queued(fair_scheduler, holder, [("gold", "bulk")] * 4 + [("free", "bulk")] * 2)
+
+    assert order[:3].count("gold") == 2
+
+
+def test_interactive_work_goes_first():
+    fair_scheduler = make_scheduler()
+    holder = fair_scheduler.acquire("c", "bulk")
+
+    assert run_queued(fair_scheduler, holder, [("a", "bulk"), ("b", "interactive")]) == ["b", "a"]
+
+
+def test_bulk_work_never_takes_the_reserved_slot():
+    fair_scheduler = make_scheduler(max_concurrency=2, interactive_reserved=1)
+    fair_scheduler.acquire("a", "bulk")
+
+    with pytest.raises(TimeoutError):
+        fair_scheduler.acquire("b", "bulk", timeout=0.05)
+    assert fair_scheduler.acquire("b", "interactive", timeout=1).granted
+
+
+def test_tenant_concurrency_is_capped():
+    fair_scheduler = make_scheduler(max_concurrency=3, tenant_concurrency=1)
+    fair_scheduler.acquire("a", "bulk")
+
+    with pytest.raises(TimeoutError):
+        fair_scheduler.acquire("a", "bulk", timeout=0.05)
+    assert fair_scheduler.acquire("b", "bulk", timeout=1).granted
+
+
+@pytest.mark.parametrize("leave", ["timeout", "abandon"])
+def test_request_leaving_without_a_slot_is_not_charged(leave):
+    fair_scheduler = make_scheduler()
+    for tenant in ("a", "b"):
+        fair_scheduler.release(fair_scheduler.acquire(tenant, "bulk"))
+    holder = fair_scheduler.acquire("holder", "bulk")
+
+    if leave == "timeout":
+        with pytest.raises(TimeoutError):
+            fair_scheduler.acquire("a", "bulk", timeout=0.05)
+    else:
+        abandon = threading.Event()
+        abandon.set()
+        with pytest.raises(scheduler.SlotAbandoned):
+            fair_scheduler.acquire("a", "bulk", abandon=abandon)
+
+    # a and b have had the same service, so a (queued first) goes first
+    assert run_queued(fair_scheduler, holder, [("a", "bulk"), ("b", "bulk")]) == ["a", "b"]
+    assert fair_scheduler.status()["waiting"] == {"interactive": 0, "bulk": 0}
+
+
+def test_token_quota_is_shared_between_processes(tmp_path):
+    quota_path = str(tmp_path / "quota.sqlite3")
+    # Two schedulers on one quota file stand in for two worker processes
+    first = make_scheduler(tokens_per_minute=1000, quota_path=quota_path)
+    second = make_scheduler(tokens_per_minute=1000, quota_path=quota_path)
+
+    first.release(first.acquire("a", "bulk", cost=1000))
+
+    with pytest.raises(TimeoutError):
+        second.acquire("a", "bulk", cost=1000, timeout=0.2)
+    assert second.acquire("b", "bulk", cost=1000, timeout=1).granted
+    assert second.status()["quota_path"] == quota_path
@@ -0,0 +1,73 @@
+"""Tests for the book service's download endpoint."""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load, save_chapter
+
+service = load("service")
+publisher = load("sub_agents.publisher_agent.tools")
+BOOK_ID = load("sub_agents.thinker_agent.tools").create_safe_title("Owl Book")
+
+
+@pytest.fixture
+def client(book):
+    for chapter_index, text in enumerate(("The rain fell.", "The gate opened.", "The sun rose.")):
+        save_chapter(book, chapter_index, text, "")
+    return TestClient(service.app)
+
+
+def download(client, **headers):
+    return client.get(f"/books/{BOOK_ID}/download", headers=headers)
+
+
+def test_download_before_compiling_is_not_found(client):
+    assert download(client).status_code == 404
+
+
+def test_download_sends_an_etag(client):
+    publisher.compile_book("Owl Book")
+
+    response = download(client)
+
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+    assert "## Chapter 3: Dawn" in response.text
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"stale", {etag}', "*"])
+def test_matching_etag_is_not_modified(client, if_none_match):
+    publisher.compile_book("Owl Book")
+    etag = download(client).headers["etag"]
+
+    response = download(client, **{"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_recompiled_book_gets_a_new_etag(client, book):
+    publisher.compile_book("Owl Book")
+    etag = download(client).headers["etag"]
+
+    save_chapter(book, 2, "The sun rose over the owls.", "")
+    publisher.compile_book("Owl Book")
+    response = download(client, **{"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "The sun rose over the owls." in response.text
+
+
+def test_range_request_returns_part_of_the_book(client):
+    book_file = publisher.compile_book("Owl Book")
+
+    response = download(client, Range="bytes=0-9")
+
+    assert response.status_code == 206
+    assert response.content == open(book_file, "rb").read()[:10]
+    assert response.headers["content-range"] == f"bytes 0-9/{os.path.getsize(book_file)}"